@@ -1,6 +1,7 @@
 """主应用程序窗口"""
 import json
-import os
+import time
+from contextlib import contextmanager
 from PyQt6.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -22,8 +23,10 @@ from PyQt6.QtWidgets import (
     QFileDialog,
     QSizePolicy,
     QDialog,
+    QLineEdit,
+    QSpinBox,
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QUrl
+from PyQt6.QtCore import Qt, pyqtSignal, QUrl, QTimer
 from PyQt6.QtGui import QFont, QAction, QPixmap, QIcon, QImage, QCursor, QDesktopServices
 
 try:
@@ -34,15 +37,31 @@ except ImportError:
 
 from components.combo_input import ComboInput
 from components.field_group import FieldGroup
-from components.aspect_ratio_selector import AspectRatioSelector
 from components.multi_select import MultiSelectInput
 from utils.yaml_handler import YamlHandler
 from utils.preset_manager import PresetManager
 from utils.resource_path import get_images_dir
 from components.ai_dialog import AIGenerateDialog
-from components.ai_image_dialog import GeminiImageThread
+from components.image_job_queue import (
+    ImageJobQueue,
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_RUNNING,
+)
+from components.image_save import ImageSaveThread, default_save_name, save_file_filter
 from components.gemini_client import ASPECT_RATIO_LIST, IMAGE_SIZE_LIST
-from utils.ai_config import AIConfigManager
+from utils.ai_config import get_ai_config_manager
+from utils.startup_profiler import get_startup_profiler
+from utils.prompt_builder import (
+    FIELD_PATHS,
+    NEGATIVE_FIELDS,
+    build_prompt_data,
+    build_prompt_text,
+    field_json_value,
+    form_values_from_preset,
+    negative_enabled_from_preset,
+)
 from styles import LIGHT_THEME
 
 
@@ -155,12 +174,27 @@ class ImagePreviewDialog(QDialog):
 class PromptGeneratorApp(QMainWindow):
     """提示词生成器主窗口"""
 
+    # JSON 预览防抖间隔（毫秒）：连续输入只在停顿后刷新一次
+    PREVIEW_DEBOUNCE_MS = 150
+    # 预设搜索防抖间隔（毫秒）
+    PRESET_SEARCH_DEBOUNCE_MS = 250
+    # 单次点击“生成图片”最多提交的任务数
+    MAX_JOBS_PER_SUBMIT = 8
+
     def __init__(self):
         super().__init__()
-        self.yaml_handler = YamlHandler()
-        self.preset_manager = PresetManager()
-        self.config_manager = AIConfigManager()
-        self.field_widgets = {}  # 存储所有字段的widget引用
+        profiler = get_startup_profiler()
+        with profiler.section("YamlHandler", "init"):
+            self.yaml_handler = YamlHandler()
+        with profiler.section("PresetManager", "init"):
+            self.preset_manager = PresetManager()
+        with profiler.section("AIConfigManager", "init"):
+            self.config_manager = get_ai_config_manager()
+        self.field_widgets = {}  # 存储已构建字段的widget引用
+        # 表单数据模型：字段名 -> 值，包含尚未构建控件的字段，预览/保存/加载预设都基于它
+        self._form_values = {}
+        # 默认隐藏、首次展开时才构建内容的分组：FieldGroup -> 构建函数
+        self._lazy_groups = {}
         self.current_preset_name = None
         
         # 生图相关
@@ -168,17 +202,45 @@ class PromptGeneratorApp(QMainWindow):
         self.image_buttons = []  # 存储图片按钮的列表
         self.generated_image_bytes = None
         self.generated_pixmap = None
-        self.worker_thread = None
+        self.save_thread = None
+
+        # 生图任务队列：多个任务在线程池中并发执行
+        queue_config = self.config_manager.get_image_queue_config()
+        self.image_queue = ImageJobQueue(
+            max_workers=queue_config["image_max_workers"],
+            max_per_endpoint=queue_config["image_max_per_endpoint"],
+            parent=self,
+        )
+        self.image_queue.job_added.connect(self._on_job_added)
+        self.image_queue.job_updated.connect(self._on_job_updated)
+        self.image_queue.job_removed.connect(self._remove_job_item)
+        self._job_items = {}  # job_id -> QListWidgetItem
+
+        # JSON 预览缓存：只对变化的字段打补丁，避免每次按键都整体重建
+        self._preview_doc = None
+        self._preview_text = ""
+        self._preview_dirty_fields = set()
+        self._preview_needs_rebuild = True
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(self.PREVIEW_DEBOUNCE_MS)
+        self._preview_timer.timeout.connect(self._flush_preview)
+        # 批量更新嵌套层数：大于 0 时推迟预览刷新，退出时只重建一次
+        self._batch_depth = 0
+        # 预览刷新统计，用于确认批量更新只触发一次重建
+        self.preview_stats = {"rebuilds": 0, "patches": 0, "total_ms": 0.0}
 
         self._setup_window()
         self._setup_ui()
-        self._load_presets_to_selector()
+        with profiler.section("_load_presets_to_selector"):
+            self._load_presets_to_selector()
 
     def _setup_window(self):
         self.setWindowTitle("Nano Banana 生图工具")
         self.setMinimumSize(1200, 800)
         self.resize(1400, 900)
-        self.setStyleSheet(LIGHT_THEME)
+        with get_startup_profiler().section("LIGHT_THEME 样式表", "style"):
+            self.setStyleSheet(LIGHT_THEME)
         
         # 设置窗口图标
         icon_path = get_images_dir() / "logo.png"
@@ -186,6 +248,7 @@ class PromptGeneratorApp(QMainWindow):
             self.setWindowIcon(QIcon(str(icon_path)))
 
     def _setup_ui(self):
+        profiler = get_startup_profiler()
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         main_layout = QVBoxLayout(central_widget)
@@ -193,11 +256,13 @@ class PromptGeneratorApp(QMainWindow):
         main_layout.setSpacing(16)
 
         # 标题区域（含预设选择器）
-        header = self._create_header()
+        with profiler.section("_create_header"):
+            header = self._create_header()
         main_layout.addWidget(header)
 
         # 预设工具栏
-        preset_bar = self._create_preset_bar()
+        with profiler.section("_create_preset_bar"):
+            preset_bar = self._create_preset_bar()
         main_layout.addWidget(preset_bar)
 
         # 主内容区域 - 使用分割器（三列布局）
@@ -205,15 +270,18 @@ class PromptGeneratorApp(QMainWindow):
         self.main_splitter.setHandleWidth(8)
 
         # 左侧：表单区域
-        form_area = self._create_form_area()
+        with profiler.section("_create_form_area"):
+            form_area = self._create_form_area()
         self.main_splitter.addWidget(form_area)
 
         # 中间：JSON预览区域（可折叠）
-        self.json_preview_area = self._create_json_preview_area()
+        with profiler.section("_create_json_preview_area"):
+            self.json_preview_area = self._create_json_preview_area()
         self.main_splitter.addWidget(self.json_preview_area)
 
         # 右侧：生图区域
-        image_generate_area = self._create_image_generate_area()
+        with profiler.section("_create_image_generate_area"):
+            image_generate_area = self._create_image_generate_area()
         self.main_splitter.addWidget(image_generate_area)
 
         # 设置分割比例，默认隐藏中间列
@@ -224,7 +292,8 @@ class PromptGeneratorApp(QMainWindow):
         main_layout.addWidget(self.main_splitter, 1)
 
         # 底部按钮区域
-        button_bar = self._create_button_bar()
+        with profiler.section("_create_button_bar"):
+            button_bar = self._create_button_bar()
         main_layout.addWidget(button_bar)
 
     def _create_header(self) -> QWidget:
@@ -297,11 +366,25 @@ class PromptGeneratorApp(QMainWindow):
         self.preset_selector.currentTextChanged.connect(self._on_preset_selected)
         layout.addWidget(self.preset_selector)
 
+        # 预设搜索框：按任意字段内容过滤预设列表
+        self.preset_search_input = QLineEdit()
+        self.preset_search_input.setObjectName("presetSearchInput")
+        self.preset_search_input.setPlaceholderText("搜索预设内容...")
+        self.preset_search_input.setClearButtonEnabled(True)
+        self.preset_search_input.setMinimumWidth(180)
+        self.preset_search_input.setToolTip("按字段内容搜索预设，如“海边”")
+        self.preset_search_timer = QTimer(self)
+        self.preset_search_timer.setSingleShot(True)
+        self.preset_search_timer.setInterval(self.PRESET_SEARCH_DEBOUNCE_MS)
+        self.preset_search_timer.timeout.connect(self._load_presets_to_selector)
+        self.preset_search_input.textChanged.connect(lambda _text: self.preset_search_timer.start())
+        layout.addWidget(self.preset_search_input)
+
         # 刷新按钮
         refresh_btn = QPushButton("刷新")
         refresh_btn.setObjectName("secondaryButton")
         refresh_btn.setToolTip("刷新预设列表")
-        refresh_btn.clicked.connect(self._load_presets_to_selector)
+        refresh_btn.clicked.connect(lambda: self._load_presets_to_selector(refresh=True))
         layout.addWidget(refresh_btn)
 
         # AI提示词生成按钮
@@ -419,25 +502,10 @@ class PromptGeneratorApp(QMainWindow):
         self.special_requirement_enabled.stateChanged.connect(self._on_special_requirement_toggle_changed)
         special_layout.addWidget(self.special_requirement_enabled)
 
-        # 特别要求分组
+        # 特别要求分组（内容在首次展开时构建）
         self.special_requirement_group = FieldGroup("特别要求", color_class="special")
-        self.special_requirement_input = QTextEdit()
-        self.special_requirement_input.setPlaceholderText("请输入额外的特别要求，这些内容不会纳入AI提示词生成和修改，只在生成图片时补充...")
-        self.special_requirement_input.setMaximumHeight(100)
-        self.special_requirement_input.setStyleSheet("""
-            QTextEdit {
-                padding: 8px;
-                border: 1px solid #d9d9d9;
-                border-radius: 4px;
-                background-color: white;
-                font-size: 12px;
-            }
-            QTextEdit:focus {
-                border-color: #40a9ff;
-            }
-        """)
-        self.special_requirement_group.add_widget(self.special_requirement_input)
-        self.special_requirement_group.setVisible(False)  # 默认隐藏
+        self.special_requirement_input = None
+        self._add_lazy_group(self.special_requirement_group, self._build_special_requirement_group)
         special_layout.addWidget(self.special_requirement_group)
 
         layout.addWidget(special_container)
@@ -461,41 +529,10 @@ class PromptGeneratorApp(QMainWindow):
         self.line_art_hint.setStyleSheet("color: #999999; font-size: 12px; margin-left: 24px; margin-bottom: 4px;")
         line_art_layout.addWidget(self.line_art_hint)
 
-        # 线稿提示词分组
+        # 线稿提示词分组（内容在首次展开时构建）
         self.line_art_group = FieldGroup("线稿提示词", color_class="special")
-        
-        # 提示词编辑框
-        self.line_art_prompt_input = QTextEdit()
-        self.line_art_prompt_input.setPlaceholderText("请输入角色线稿生成的提示词...")
-        self.line_art_prompt_input.setMinimumHeight(120)
-        self.line_art_prompt_input.setMaximumHeight(200)
-        self.line_art_prompt_input.setStyleSheet("""
-            QTextEdit {
-                padding: 8px;
-                border: 1px solid #d9d9d9;
-                border-radius: 4px;
-                background-color: white;
-                font-size: 12px;
-            }
-            QTextEdit:focus {
-                border-color: #40a9ff;
-            }
-        """)
-        self.line_art_group.add_widget(self.line_art_prompt_input)
-        
-        # 保存按钮容器
-        save_btn_container = QWidget()
-        save_btn_layout = QHBoxLayout(save_btn_container)
-        save_btn_layout.setContentsMargins(0, 8, 0, 0)
-        save_btn_layout.addStretch()
-        
-        self.save_line_art_prompt_btn = QPushButton("保存提示词")
-        self.save_line_art_prompt_btn.setObjectName("secondaryButton")
-        self.save_line_art_prompt_btn.clicked.connect(self._save_line_art_prompt)
-        save_btn_layout.addWidget(self.save_line_art_prompt_btn)
-        
-        self.line_art_group.add_widget(save_btn_container)
-        self.line_art_group.setVisible(False)  # 默认隐藏
+        self.line_art_prompt_input = None
+        self._add_lazy_group(self.line_art_group, self._build_line_art_group)
         line_art_layout.addWidget(self.line_art_group)
 
         layout.addWidget(line_art_container)
@@ -513,11 +550,11 @@ class PromptGeneratorApp(QMainWindow):
         self.negative_prompt_enabled.stateChanged.connect(self._on_negative_toggle_changed)
         negative_layout.addWidget(self.negative_prompt_enabled)
 
-        # 反向提示词分组
+        # 反向提示词分组（多选项在首次展开时构建，之前的值保存在 _form_values 中）
         self.negative_group = FieldGroup("反向提示词", color_class="negative")
-        self._add_multi_select_field(self.negative_group, "禁止元素", "禁止元素")
-        self._add_multi_select_field(self.negative_group, "禁止风格", "禁止风格")
-        self.negative_group.setVisible(False)  # 默认隐藏
+        for field_name in NEGATIVE_FIELDS:
+            self._form_values[field_name] = []
+        self._add_lazy_group(self.negative_group, self._build_negative_group)
         negative_layout.addWidget(self.negative_group)
 
         layout.addWidget(negative_container)
@@ -532,9 +569,7 @@ class PromptGeneratorApp(QMainWindow):
         widget = ComboInput(
             field_name=field_name, options=options, yaml_handler=self.yaml_handler
         )
-        widget.value_changed.connect(self._on_field_changed)
-        group.add_field(label, widget)
-        self.field_widgets[field_name] = widget
+        self._bind_field_widget(group, label, field_name, widget)
 
     def _add_multi_select_field(self, group: FieldGroup, label: str, field_name: str):
         """添加一个多选字段到分组"""
@@ -542,10 +577,90 @@ class PromptGeneratorApp(QMainWindow):
         widget = MultiSelectInput(
             field_name=field_name, options=options, yaml_handler=self.yaml_handler
         )
-        widget.value_changed.connect(self._on_field_changed)
+        self._bind_field_widget(group, label, field_name, widget)
+
+    def _bind_field_widget(self, group: FieldGroup, label: str, field_name: str, widget):
+        """把字段控件加入分组；延迟构建的字段先写入 _form_values 中已有的值"""
+        if field_name in self._form_values:
+            widget.set_value(self._form_values[field_name])
+        self._form_values[field_name] = widget.get_value()
+        widget.value_changed.connect(lambda _value, name=field_name: self._on_field_changed(name))
         group.add_field(label, widget)
         self.field_widgets[field_name] = widget
 
+    # ========== 延迟构建的可选分组 ==========
+
+    def _add_lazy_group(self, group: FieldGroup, builder):
+        """登记一个默认隐藏的分组，内容由 builder 在首次显示时构建"""
+        group.setVisible(False)
+        self._lazy_groups[group] = builder
+
+    def _set_group_visible(self, group: FieldGroup, visible: bool):
+        """显示/隐藏可选分组，首次显示时先构建其内容"""
+        if visible:
+            builder = self._lazy_groups.pop(group, None)
+            if builder:
+                builder()
+        group.setVisible(visible)
+
+    def _build_special_requirement_group(self):
+        """构建特别要求分组的输入框"""
+        self.special_requirement_input = QTextEdit()
+        self.special_requirement_input.setPlaceholderText("请输入额外的特别要求，这些内容不会纳入AI提示词生成和修改，只在生成图片时补充...")
+        self.special_requirement_input.setMaximumHeight(100)
+        self.special_requirement_input.setStyleSheet("""
+            QTextEdit {
+                padding: 8px;
+                border: 1px solid #d9d9d9;
+                border-radius: 4px;
+                background-color: white;
+                font-size: 12px;
+            }
+            QTextEdit:focus {
+                border-color: #40a9ff;
+            }
+        """)
+        self.special_requirement_group.add_widget(self.special_requirement_input)
+
+    def _build_line_art_group(self):
+        """构建线稿提示词分组：提示词编辑框和保存按钮"""
+        # 提示词编辑框
+        self.line_art_prompt_input = QTextEdit()
+        self.line_art_prompt_input.setPlaceholderText("请输入角色线稿生成的提示词...")
+        self.line_art_prompt_input.setMinimumHeight(120)
+        self.line_art_prompt_input.setMaximumHeight(200)
+        self.line_art_prompt_input.setStyleSheet("""
+            QTextEdit {
+                padding: 8px;
+                border: 1px solid #d9d9d9;
+                border-radius: 4px;
+                background-color: white;
+                font-size: 12px;
+            }
+            QTextEdit:focus {
+                border-color: #40a9ff;
+            }
+        """)
+        self.line_art_group.add_widget(self.line_art_prompt_input)
+        
+        # 保存按钮容器
+        save_btn_container = QWidget()
+        save_btn_layout = QHBoxLayout(save_btn_container)
+        save_btn_layout.setContentsMargins(0, 8, 0, 0)
+        save_btn_layout.addStretch()
+        
+        self.save_line_art_prompt_btn = QPushButton("保存提示词")
+        self.save_line_art_prompt_btn.setObjectName("secondaryButton")
+        self.save_line_art_prompt_btn.clicked.connect(self._save_line_art_prompt)
+        save_btn_layout.addWidget(self.save_line_art_prompt_btn)
+        
+        self.line_art_group.add_widget(save_btn_container)
+
+    def _build_negative_group(self):
+        """构建反向提示词分组的多选项"""
+        self._add_multi_select_field(self.negative_group, "禁止元素", "禁止元素")
+        self._add_multi_select_field(self.negative_group, "禁止风格", "禁止风格")
+
     def _create_json_preview_area(self) -> QWidget:
         """创建JSON预览区域（可折叠）"""
         container = QWidget()
@@ -588,6 +703,10 @@ class PromptGeneratorApp(QMainWindow):
             # 隐藏时，左右两列平分
             self.main_splitter.setSizes([600, 0, 600])
 
+        # 隐藏期间积累的修改在显示时一次性刷新
+        if self.json_preview_visible:
+            self._flush_preview()
+
     def _create_image_generate_area(self) -> QWidget:
         """创建生图区域"""
         container = QWidget()
@@ -701,6 +820,9 @@ class PromptGeneratorApp(QMainWindow):
         preview_layout.addWidget(preview_canvas, 1)
         layout.addWidget(preview_frame, 1)
 
+        # 任务队列面板
+        layout.addWidget(self._create_job_queue_panel())
+
         # 状态标签
         self.image_status_label = QLabel("准备就绪")
         self.image_status_label.setStyleSheet("color: #595959; font-size: 12px;")
@@ -708,6 +830,53 @@ class PromptGeneratorApp(QMainWindow):
 
         return container
 
+    def _create_job_queue_panel(self) -> QWidget:
+        """创建生图任务队列面板"""
+        queue_frame = QFrame()
+        queue_frame.setObjectName("queueFrame")
+        queue_frame.setStyleSheet("""
+            QFrame#queueFrame {
+                background-color: #ffffff;
+                border: 1px solid #e8e8e8;
+                border-radius: 8px;
+            }
+        """)
+        queue_layout = QVBoxLayout(queue_frame)
+        queue_layout.setContentsMargins(16, 12, 16, 12)
+        queue_layout.setSpacing(8)
+
+        header = QWidget()
+        header_layout = QHBoxLayout(header)
+        header_layout.setContentsMargins(0, 0, 0, 0)
+        header_layout.setSpacing(8)
+
+        queue_title = QLabel("任务队列")
+        queue_title.setStyleSheet("font-size: 14px; font-weight: 600; color: #262626;")
+        header_layout.addWidget(queue_title)
+        header_layout.addStretch()
+
+        cancel_btn = QPushButton("取消排队")
+        cancel_btn.setObjectName("secondaryButton")
+        cancel_btn.setToolTip("取消所有尚未开始的任务")
+        cancel_btn.clicked.connect(self.image_queue.cancel_pending)
+        header_layout.addWidget(cancel_btn)
+
+        clear_btn = QPushButton("清除已结束")
+        clear_btn.setObjectName("secondaryButton")
+        clear_btn.clicked.connect(self._clear_finished_jobs)
+        header_layout.addWidget(clear_btn)
+
+        queue_layout.addWidget(header)
+
+        self.job_list = QListWidget()
+        self.job_list.setMaximumHeight(140)
+        self.job_list.setStyleSheet("font-size: 12px;")
+        self.job_list.setToolTip("点击已完成的任务可查看对应图片，点击排队中或生成中的任务可取消")
+        self.job_list.itemClicked.connect(self._on_job_item_clicked)
+        queue_layout.addWidget(self.job_list)
+
+        return queue_frame
+
     def _create_param_row(self, label_text: str, items: list, default: str = None) -> QWidget:
         """创建参数行"""
         container = QWidget()
@@ -774,27 +943,59 @@ class PromptGeneratorApp(QMainWindow):
         self.save_image_btn.clicked.connect(self._save_image)
         layout.addWidget(self.save_image_btn)
 
+        # 每次点击提交的任务数（同一提示词生成多张变体）
+        count_label = QLabel("数量")
+        count_label.setStyleSheet("font-size: 12px; color: #595959;")
+        layout.addWidget(count_label)
+        self.job_count_spin = QSpinBox()
+        self.job_count_spin.setRange(1, self.MAX_JOBS_PER_SUBMIT)
+        self.job_count_spin.setValue(1)
+        self.job_count_spin.setToolTip("一次提交的生图任务数")
+        layout.addWidget(self.job_count_spin)
+
         self.generate_image_btn = QPushButton("生成图片")
         self.generate_image_btn.setObjectName("primaryButton")
-        self.generate_image_btn.clicked.connect(self._on_generate_image_clicked)
+        self.generate_image_btn.clicked.connect(lambda: self._on_generate_image_clicked())
         layout.addWidget(self.generate_image_btn)
 
+        # 生图缓存：相同请求直接使用上次的结果；“重新生成”跳过缓存并覆盖
+        self.image_cache_checkbox = QCheckBox("缓存")
+        self.image_cache_checkbox.setToolTip("相同的提示词、参考图和参数直接使用上次生成的图片，不再调用接口")
+        self.image_cache_checkbox.setChecked(self.config_manager.is_image_cache_enabled())
+        self.image_cache_checkbox.toggled.connect(self.config_manager.set_image_cache_enabled)
+        layout.addWidget(self.image_cache_checkbox)
+
+        self.regenerate_image_btn = QPushButton("重新生成")
+        self.regenerate_image_btn.setObjectName("secondaryButton")
+        self.regenerate_image_btn.setToolTip("忽略缓存，重新调用接口生成")
+        self.regenerate_image_btn.clicked.connect(lambda: self._on_generate_image_clicked(refresh_cache=True))
+        layout.addWidget(self.regenerate_image_btn)
+
         return bar
 
-    def _on_field_changed(self, value: str = None):
-        """字段值改变时自动更新预览"""
-        self._generate_json()
+    def _on_field_changed(self, field_name: str = None):
+        """字段值改变时同步数据模型并标记待刷新，由定时器合并后更新预览"""
+        widget = self.field_widgets.get(field_name)
+        if widget is not None:
+            self._form_values[field_name] = widget.get_value()
+        if field_name in FIELD_PATHS:
+            self._preview_dirty_fields.add(field_name)
+        else:
+            self._preview_needs_rebuild = True
+        # 批量更新中或预览隐藏时只记录变化，等结束/显示时再渲染
+        if self._batch_depth == 0 and self.json_preview_visible:
+            self._preview_timer.start()
 
     def _on_negative_toggle_changed(self, state: int):
         """反向提示词开关切换"""
         enabled = state == 2  # Qt.CheckState.Checked = 2
-        self.negative_group.setVisible(enabled)
+        self._set_group_visible(self.negative_group, enabled)
         self._generate_json()
 
     def _on_special_requirement_toggle_changed(self, state: int):
         """特别要求开关切换"""
         enabled = state == 2  # Qt.CheckState.Checked = 2
-        self.special_requirement_group.setVisible(enabled)
+        self._set_group_visible(self.special_requirement_group, enabled)
         # 特别要求不纳入JSON预览，所以不需要调用 _generate_json()
 
     def _on_line_art_mode_toggle_changed(self, state: int):
@@ -802,7 +1003,7 @@ class PromptGeneratorApp(QMainWindow):
         enabled = state == 2  # Qt.CheckState.Checked = 2
         
         # 显示/隐藏线稿提示词分组
-        self.line_art_group.setVisible(enabled)
+        self._set_group_visible(self.line_art_group, enabled)
         
         # 如果启用，加载当前的线稿提示词到编辑框
         if enabled:
@@ -814,7 +1015,7 @@ class PromptGeneratorApp(QMainWindow):
             self.negative_prompt_enabled,
         ]
         
-        # 表单字段控件
+        # 表单字段控件（之后才构建的反向提示词字段随分组一起禁用）
         for widget in self.field_widgets.values():
             widget.setEnabled(not enabled)
         
@@ -845,105 +1046,105 @@ class PromptGeneratorApp(QMainWindow):
             QMessageBox.critical(self, "错误", f"保存失败: {str(e)}")
 
     def _generate_json(self):
-        """生成JSON提示词"""
-        data = self._collect_form_data()
-        json_str = json.dumps(data, ensure_ascii=False, indent=2)
-        self.json_preview.setText(json_str)
+        """生成JSON提示词（整体重建，预览隐藏时推迟到显示再渲染）"""
+        self._preview_needs_rebuild = True
+        if self._batch_depth == 0 and self.json_preview_visible:
+            self._flush_preview()
+
+    @contextmanager
+    def _batch_update(self):
+        """批量修改表单：期间的字段变化不刷新预览，结束时统一重建一次"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._generate_json()
+
+    def _flush_preview(self):
+        """把积累的字段修改应用到缓存文档并刷新预览"""
+        self._preview_timer.stop()
+        start = time.perf_counter()
+        if self._preview_doc is None or self._preview_needs_rebuild:
+            self._preview_doc = self._collect_form_data()
+            self.preview_stats["rebuilds"] += 1
+        else:
+            for field_name in self._preview_dirty_fields:
+                self._patch_preview_field(field_name)
+            self.preview_stats["patches"] += 1
+        self._preview_dirty_fields.clear()
+        self._preview_needs_rebuild = False
+
+        json_str = json.dumps(self._preview_doc, ensure_ascii=False, indent=2)
+        if json_str != self._preview_text:
+            self._preview_text = json_str
+            self.json_preview.setText(json_str)
+        self.preview_stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+    def _patch_preview_field(self, field_name: str):
+        """只更新缓存文档中单个字段对应的路径"""
+        path = FIELD_PATHS[field_name]
+        # 反向提示词未启用时文档中没有该分支，无需处理
+        if field_name in NEGATIVE_FIELDS and path[0] not in self._preview_doc:
+            return
+        node = self._preview_doc
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = self._get_field_value(field_name)
+
+    def _reset_preview(self):
+        """清空预览及其缓存"""
+        self._preview_timer.stop()
+        self._preview_doc = None
+        self._preview_text = ""
+        self._preview_dirty_fields.clear()
+        self._preview_needs_rebuild = True
+        self.json_preview.clear()
+
+    def _get_field_value(self, field_name: str):
+        """获取单个字段在 JSON 中的值"""
+        return field_json_value(field_name, self._form_values.get(field_name))
 
     def _collect_form_data(self) -> dict:
-        """收集表单数据并组织成目标格式"""
-
-        def get_value(field_name: str) -> str:
-            widget = self.field_widgets.get(field_name)
-            return widget.get_value() if widget else ""
-
-        # 收集材质真实度列表
-        material_value = get_value("材质真实度")
-        materials = [m.strip() for m in material_value.split(",") if m.strip()] if material_value else []
-
-        # 收集禁止元素列表（多选）
-        forbidden_elements = self.field_widgets.get("禁止元素").get_value() if "禁止元素" in self.field_widgets else []
-
-        # 收集禁止风格列表（多选）
-        forbidden_styles = self.field_widgets.get("禁止风格").get_value() if "禁止风格" in self.field_widgets else []
-
-        # 按照新的分类顺序组织数据
-        data = {
-            # 1. 基础设置
-            "风格模式": get_value("风格模式"),
-            "画面气质": get_value("画面气质"),
-            # 2. 场景设置
-            "场景": {
-                "环境": {
-                    "地点设定": get_value("地点设定"),
-                    "光线": get_value("光线"),
-                    "天气氛围": get_value("天气氛围"),
-                },
-                "主体": {
-                    "整体描述": get_value("整体描述"),
-                    "外形特征": {
-                        "身材": get_value("身材"),
-                        "面部": get_value("面部"),
-                        "头发": get_value("头发"),
-                        "眼睛": get_value("眼睛"),
-                    },
-                    "表情与动作": {
-                        "情绪": get_value("情绪"),
-                        "动作": get_value("动作"),
-                    },
-                    "服装": {
-                        "穿着": get_value("穿着"),
-                        "细节": get_value("服装细节"),
-                    },
-                    "配饰": get_value("配饰"),
-                },
-                "背景": {
-                    "描述": get_value("背景描述"),
-                    "景深": get_value("景深"),
-                },
-            },
-            # 3. 相机与构图
-            "相机": {
-                "机位角度": get_value("机位角度"),
-                "构图": get_value("构图"),
-                "镜头特性": get_value("镜头特性"),
-                "传感器画质": get_value("传感器画质"),
-            },
-            # 4. 审美控制
-            "审美控制": {
-                "呈现意图": get_value("呈现意图"),
-                "材质真实度": materials if materials else [get_value("材质真实度")],
-                "色彩风格": {
-                    "整体色调": get_value("整体色调"),
-                    "对比度": get_value("对比度"),
-                    "特殊效果": get_value("特殊效果"),
-                },
-            },
-        }
-
-        # 仅当启用反向提示词时才添加
-        if self.negative_prompt_enabled.isChecked():
-            data["反向提示词"] = {
-                "禁止元素": forbidden_elements,
-                "禁止风格": forbidden_styles,
-            }
+        """收集表单数据并组织成目标格式（基于数据模型，未构建的分组同样包含在内）"""
+        return build_prompt_data(self._form_values, self.negative_prompt_enabled.isChecked())
 
-        return data
+    def _set_field_value(self, field_name: str, value):
+        """修改字段值：更新数据模型，控件已构建时同步到控件"""
+        self._form_values[field_name] = value
+        widget = self.field_widgets.get(field_name)
+        if widget is not None:
+            widget.set_value(value)
 
     # ========== 预设相关方法 ==========
 
-    def _load_presets_to_selector(self):
-        """加载预设到选择器"""
+    def _load_presets_to_selector(self, refresh: bool = False):
+        """加载预设到选择器，搜索框有内容时只显示匹配的预设"""
+        self.preset_search_timer.stop()
         self.preset_selector.blockSignals(True)
         self.preset_selector.clear()
         self.preset_selector.addItem("")  # 空选项
 
-        presets = self.preset_manager.get_all_presets()
+        presets = self.preset_manager.get_all_presets(refresh=refresh)
+        query = self.preset_search_input.text().strip()
+        if query:
+            matched = {r["name"]: r["fields"] for r in self.preset_manager.search_presets(query)}
+            presets = [p for p in presets if p["name"] in matched]
         for preset in presets:
             self.preset_selector.addItem(preset['name'], preset['name'])
+            if query:
+                # 提示命中的字段
+                tip = "\n".join(f"{path}: {value}" for path, value in matched[preset["name"]].items())
+                self.preset_selector.setItemData(
+                    self.preset_selector.count() - 1, tip, Qt.ItemDataRole.ToolTipRole
+                )
 
         self.preset_selector.blockSignals(False)
-        self._show_toast(f"已加载 {len(presets)} 个预设")
+        if query:
+            self._show_toast(f"找到 {len(presets)} 个匹配“{query}”的预设")
+        else:
+            self._show_toast(f"已加载 {len(presets)} 个预设")
 
     def _on_preset_selected(self, text: str):
         """选择预设时加载"""
@@ -971,101 +1172,22 @@ class PromptGeneratorApp(QMainWindow):
 
     def _fill_form_from_data(self, data: dict):
         """从数据填充表单"""
-        _MISSING = object()
-
-        def _get(d, *keys):
-            """按路径取值，缺失则返回 _MISSING 用于“不覆盖”"""
-            cur = d
-            for k in keys:
-                if not isinstance(cur, dict) or k not in cur:
-                    return _MISSING
-                cur = cur[k]
-            return cur
-
-        def _get_list_as_str(d, *keys):
-            val = _get(d, *keys)
-            if val is _MISSING:
-                return _MISSING
-            return self._list_to_str(val)
-
-        # 字段映射: 仅当预设里存在该键时才覆盖
-        field_mapping = {
-            "风格模式": lambda d: _get(d, "风格模式"),
-            "画面气质": lambda d: _get(d, "画面气质"),
-            "机位角度": lambda d: _get(d, "相机", "机位角度"),
-            "构图": lambda d: _get(d, "相机", "构图"),
-            "镜头特性": lambda d: _get(d, "相机", "镜头特性"),
-            "传感器画质": lambda d: _get(d, "相机", "传感器画质"),
-            "地点设定": lambda d: _get(d, "场景", "环境", "地点设定"),
-            "光线": lambda d: _get(d, "场景", "环境", "光线"),
-            "天气氛围": lambda d: _get(d, "场景", "环境", "天气氛围"),
-            "整体描述": lambda d: _get(d, "场景", "主体", "整体描述"),
-            "身材": lambda d: _get(d, "场景", "主体", "外形特征", "身材"),
-            "面部": lambda d: _get(d, "场景", "主体", "外形特征", "面部"),
-            "头发": lambda d: _get(d, "场景", "主体", "外形特征", "头发"),
-            "眼睛": lambda d: _get(d, "场景", "主体", "外形特征", "眼睛"),
-            "情绪": lambda d: _get(d, "场景", "主体", "表情与动作", "情绪"),
-            "动作": lambda d: _get(d, "场景", "主体", "表情与动作", "动作"),
-            "穿着": lambda d: _get(d, "场景", "主体", "服装", "穿着"),
-            "服装细节": lambda d: _get(d, "场景", "主体", "服装", "细节"),
-            "配饰": lambda d: _get(d, "场景", "主体", "配饰"),
-            "背景描述": lambda d: _get(d, "场景", "背景", "描述"),
-            "景深": lambda d: _get(d, "场景", "背景", "景深"),
-            "呈现意图": lambda d: _get(d, "审美控制", "呈现意图"),
-            "材质真实度": lambda d: _get_list_as_str(d, "审美控制", "材质真实度"),
-            "整体色调": lambda d: _get(d, "审美控制", "色彩风格", "整体色调"),
-            "对比度": lambda d: _get(d, "审美控制", "色彩风格", "对比度"),
-            "特殊效果": lambda d: _get(d, "审美控制", "色彩风格", "特殊效果"),
-        }
-
-        for field_name, getter in field_mapping.items():
-            if field_name in self.field_widgets:
-                value = getter(data)
-                if value is not _MISSING:
-                    self.field_widgets[field_name].set_value("" if value is None else value)
-
-        # 多选字段需要传入列表；缺失键不覆盖
-        multi_select_fields = {
-            "禁止元素": lambda d: _get(d, "反向提示词", "禁止元素"),
-            "禁止风格": lambda d: _get(d, "反向提示词", "禁止风格"),
-        }
-        for field_name, getter in multi_select_fields.items():
-            if field_name in self.field_widgets:
-                value = getter(data)
-                if value is not _MISSING:
-                    self.field_widgets[field_name].set_value(value if value else [])
-
-        # 处理画幅设置开关状态；仅当预设提供该块时覆盖
-        aspect_data = data.get("画幅设置", _MISSING)
-        if aspect_data is not _MISSING and isinstance(aspect_data, dict):
-            has_aspect = bool(
-                aspect_data.get("比例") or aspect_data.get("推荐分辨率") or aspect_data.get("用途")
-            )
-            self.aspect_enabled.setChecked(has_aspect)
-            self.aspect_group.setVisible(has_aspect)
-            if has_aspect:
-                self.aspect_selector.set_values(
-                    ratio=aspect_data.get("比例", ""),
-                    resolution=aspect_data.get("推荐分辨率", ""),
-                    usage=aspect_data.get("用途", ""),
-                )
+        with self._batch_update():
+            self._apply_form_data(data)
+
+    def _apply_form_data(self, data: dict):
+        """把数据逐项写入表单控件（由 _fill_form_from_data 在批量模式下调用）"""
+        # 仅当预设里存在该键时才覆盖；多选字段按可选项过滤，与控件勾选结果一致
+        multi_select_options = {name: self.yaml_handler.get_field_options(name) for name in NEGATIVE_FIELDS}
+        for field_name, value in form_values_from_preset(data, multi_select_options).items():
+            if field_name in self._form_values:
+                self._set_field_value(field_name, value)
 
         # 处理反向提示词开关状态；仅当预设提供该块时覆盖
-        negative_data = data.get("反向提示词", _MISSING)
-        if negative_data is not _MISSING and isinstance(negative_data, dict):
-            has_negative = bool(
-                negative_data.get("禁止元素") or negative_data.get("禁止风格")
-            )
+        has_negative = negative_enabled_from_preset(data)
+        if has_negative is not None:
             self.negative_prompt_enabled.setChecked(has_negative)
-            self.negative_group.setVisible(has_negative)
-
-        self._generate_json()
-
-    def _list_to_str(self, lst) -> str:
-        """列表转字符串"""
-        if isinstance(lst, list):
-            return ", ".join(str(item) for item in lst if item)
-        return str(lst) if lst else ""
+            self._set_group_visible(self.negative_group, has_negative)
 
     def _save_as_preset(self):
         """保存当前配置为预设"""
@@ -1272,13 +1394,8 @@ class PromptGeneratorApp(QMainWindow):
         self.image_buttons.clear()
         self.selected_images.clear()
 
-    def _on_generate_image_clicked(self):
-        """生成图片按钮点击"""
-        # 先检查是否有任务进行中，如果有则直接返回（此时按钮应该已被禁用）
-        if self.worker_thread and self.worker_thread.isRunning():
-            QMessageBox.information(self, "提示", "已有任务进行中，请稍候")
-            return
-
+    def _on_generate_image_clicked(self, refresh_cache: bool = False):
+        """生成图片按钮点击：把任务加入队列；refresh_cache 为 True 时跳过缓存重新生成"""
         # 检查是否启用了角色线稿模式
         if self.line_art_mode_enabled.isChecked():
             # 使用UI中的线稿提示词
@@ -1296,17 +1413,15 @@ class PromptGeneratorApp(QMainWindow):
         else:
             # 正常模式：使用表单数据
             prompt_data = self._collect_form_data()
-            prompt_text = json.dumps(prompt_data, ensure_ascii=False, indent=2)
-            
-            if not prompt_text or prompt_text.strip() == "{}":
+            if not prompt_data:
                 QMessageBox.warning(self, "提示", "当前提示词为空，请先填写表单内容")
                 return
 
             # 如果启用了特别要求，追加到prompt后面
+            special_text = ""
             if self.special_requirement_enabled.isChecked():
-                special_text = self.special_requirement_input.toPlainText().strip()
-                if special_text:
-                    prompt_text = prompt_text + "\n\n特别要求：" + special_text
+                special_text = self.special_requirement_input.toPlainText()
+            prompt_text = build_prompt_text(prompt_data, special_text)
 
         if not self.config_manager.get_gemini_api_key():
             reply = QMessageBox.question(
@@ -1320,40 +1435,101 @@ class PromptGeneratorApp(QMainWindow):
                 self._open_image_config_dialog()
             return
 
-        # 验证通过后，立即禁用按钮，防止重复点击
-        self._set_image_generating_state(True)
-        
-        self.generated_image_bytes = None
-        self.generated_pixmap = None
-        self.preview_area.setText("正在生成，请稍候...")
-        self.preview_area.setPixmap(QPixmap())
-        self.save_image_btn.setEnabled(False)
-        
+        count = self.job_count_spin.value()
+        gemini_config = self.config_manager.get_gemini_config()
+        # 多张变体时只有第一张走缓存，其余总是重新生成，否则会得到相同的图片
+        use_cache = self.image_cache_checkbox.isChecked()
+        for index in range(count):
+            self.image_queue.submit(
+                prompt=prompt_text,
+                image_paths=self.selected_images,
+                aspect_ratio=self.aspect_combo.currentText(),
+                image_size=self.size_combo.currentText(),
+                gemini_config=gemini_config,
+                use_cache=use_cache and index == 0,
+                refresh_cache=refresh_cache,
+            )
+
+        if not self.generated_pixmap:
+            self.preview_area.setText("正在生成，请稍候...")
         # 根据模式显示不同的状态信息
-        if self.line_art_mode_enabled.isChecked():
-            self._set_image_status("提交到 Gemini 服务（角色线稿模式）", "#1890ff")
-        else:
-            self._set_image_status("提交到 Gemini 服务", "#1890ff")
-        # 禁用点击预览功能
-        self._enable_image_preview(False)
-
-        self.worker_thread = GeminiImageThread(
-            prompt=prompt_text,
-            image_paths=self.selected_images,
-            aspect_ratio=self.aspect_combo.currentText(),
-            image_size=self.size_combo.currentText(),
-            thinking_level="low",  # 移除思考级别参数，使用默认值
+        mode_hint = "（角色线稿模式）" if self.line_art_mode_enabled.isChecked() else ""
+        self._set_image_status(
+            f"已提交 {count} 个任务{mode_hint}，队列中共 {self.image_queue.active_count} 个",
+            "#1890ff",
         )
-        self.worker_thread.progress.connect(lambda msg: self._set_image_status(f"⏳ {msg}", "#1890ff"))
-        self.worker_thread.image_ready.connect(self._on_image_ready)
-        self.worker_thread.error.connect(self._on_generation_error)
-        self.worker_thread.finished.connect(self._on_thread_finished)
-        self.worker_thread.start()
 
-    def _on_thread_finished(self):
-        """线程完成"""
-        self._set_image_generating_state(False)
-        self.worker_thread = None
+    # ========== 生图任务队列 ==========
+
+    def _format_job_text(self, job) -> str:
+        """任务在队列面板中的显示文本"""
+        text = f"#{job.id}  {job.status}  {job.aspect_ratio} · {job.image_size}"
+        if job.elapsed is not None and job.status != JOB_RUNNING:
+            text += f"  {job.elapsed:.1f}s"
+        if job.status == JOB_DONE and job.from_cache:
+            text += "  (缓存)"
+        if job.status == JOB_RUNNING and job.message:
+            text += f"  {job.message}"
+        if job.status == JOB_FAILED and job.error:
+            text += f"  {job.error}"
+        return text
+
+    def _on_job_added(self, job):
+        item = QListWidgetItem(self._format_job_text(job))
+        item.setData(Qt.ItemDataRole.UserRole, job.id)
+        item.setToolTip(job.prompt[:300])
+        self.job_list.addItem(item)
+        self._job_items[job.id] = item
+
+    def _on_job_updated(self, job):
+        item = self._job_items.get(job.id)
+        if item is not None:
+            item.setText(self._format_job_text(job))
+        if job.status == JOB_DONE:
+            self._show_job_result(job)
+        elif job.status == JOB_FAILED:
+            self._set_image_status(f"任务 #{job.id} 生成失败：{job.error}", "#ff4d4f")
+            if not self.generated_pixmap:
+                self.preview_area.setText("生成失败，请调整参数后重试")
+        elif job.status == JOB_RUNNING and job.message:
+            self._set_image_status(f"⏳ 任务 #{job.id}：{job.message}", "#1890ff")
+
+    def _on_job_item_clicked(self, item: QListWidgetItem):
+        """点击已完成的任务时显示其结果"""
+        job = self.image_queue.jobs.get(item.data(Qt.ItemDataRole.UserRole))
+        if job and job.status == JOB_DONE:
+            self._show_job_result(job)
+        elif job and job.status in (JOB_PENDING, JOB_RUNNING) and not job.cancel_event.is_set():
+            state = "尚未开始" if job.status == JOB_PENDING else "正在生成"
+            reply = QMessageBox.question(
+                self,
+                "取消任务",
+                f"任务 #{job.id} {state}，是否取消？",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                self.image_queue.cancel(job.id)
+
+    def _show_job_result(self, job):
+        """在预览区显示任务结果"""
+        self._on_image_ready(job.image_bytes)
+        remaining = self.image_queue.active_count
+        suffix = f"，还有 {remaining} 个任务" if remaining else ""
+        self._set_image_status(f"任务 #{job.id} 生成完成{suffix}，点击图片可查看大图", "#52c41a")
+        item = self._job_items.get(job.id)
+        if item is not None:
+            self.job_list.setCurrentItem(item)
+
+    def _clear_finished_jobs(self):
+        """从队列面板移除已结束的任务"""
+        for job_id in self.image_queue.remove_finished():
+            self._remove_job_item(job_id)
+
+    def _remove_job_item(self, job_id: int):
+        """从队列面板移除任务对应的条目"""
+        item = self._job_items.pop(job_id, None)
+        if item is not None:
+            self.job_list.takeItem(self.job_list.row(item))
 
     def _on_image_ready(self, image_bytes: bytes):
         """图片生成完成"""
@@ -1361,52 +1537,46 @@ class PromptGeneratorApp(QMainWindow):
         pixmap = QPixmap.fromImage(QImage.fromData(image_bytes))
         self.generated_pixmap = pixmap
         self._refresh_preview_pixmap()
-        self.save_image_btn.setEnabled(True)
+        self.save_image_btn.setEnabled(self.save_thread is None)
         self._set_image_status("生成完成，点击图片可查看大图", "#52c41a")
         # 启用点击预览功能
         self._enable_image_preview(True)
 
-    def _on_generation_error(self, message: str):
-        """生成错误"""
-        self._set_image_status(f"生成失败：{message}", "#ff4d4f")
-        self.preview_area.setText("生成失败，请调整参数后重试")
-        # 禁用点击预览功能
-        self._enable_image_preview(False)
-        # 确保在错误时也恢复按钮状态（虽然 _on_thread_finished 也会调用，但这里明确调用更安全）
-        self._set_image_generating_state(False)
-
-    def _set_image_generating_state(self, generating: bool):
-        """设置生成状态"""
-        self.aspect_combo.setEnabled(not generating)
-        self.size_combo.setEnabled(not generating)
-        self.add_image_btn.setEnabled(not generating)
-        # 禁用所有图片按钮
-        for btn in self.image_buttons:
-            btn.setEnabled(not generating)
-        self.generate_image_btn.setEnabled(not generating)
-
     def _save_image(self):
-        """保存图片"""
+        """保存图片（编码与写入在后台线程完成）"""
         if not self.generated_image_bytes:
             return
+        if self.save_thread and self.save_thread.isRunning():
+            return
 
         file_path, _ = QFileDialog.getSaveFileName(
             self,
             "另存为",
-            "generated.png",
-            "PNG 图片 (*.png);;JPEG 图片 (*.jpg *.jpeg)"
+            default_save_name(self.generated_image_bytes),
+            save_file_filter(self.generated_image_bytes),
         )
         if not file_path:
             return
 
-        import os
-        suffix = os.path.splitext(file_path)[1].lower()
-        format_name = "PNG" if suffix in ("", ".png") else "JPEG"
-        image = QImage.fromData(self.generated_image_bytes)
-        if not image.save(file_path, format_name):
-            QMessageBox.critical(self, "错误", "保存图片失败，请重试")
-        else:
-            self._set_image_status(f"图片已保存到 {file_path}", "#52c41a")
+        self.save_image_btn.setEnabled(False)
+        self.save_thread = ImageSaveThread(self.generated_image_bytes, file_path)
+        self.save_thread.progress.connect(
+            lambda percent: self._set_image_status(f"⏳ 正在保存图片... {percent}%", "#1890ff")
+        )
+        self.save_thread.saved.connect(
+            lambda path: self._set_image_status(f"图片已保存到 {path}", "#52c41a")
+        )
+        self.save_thread.error.connect(self._on_save_error)
+        self.save_thread.finished.connect(self._on_save_thread_finished)
+        self.save_thread.start()
+
+    def _on_save_error(self, message: str):
+        self._set_image_status("保存图片失败", "#ff4d4f")
+        QMessageBox.critical(self, "错误", f"保存图片失败，请重试\n{message}")
+
+    def _on_save_thread_finished(self):
+        self.save_thread = None
+        self.save_image_btn.setEnabled(bool(self.generated_image_bytes))
 
     def _set_image_status(self, text: str, color: str = "#757575"):
         """设置状态文本"""
@@ -1472,6 +1642,15 @@ class PromptGeneratorApp(QMainWindow):
         if hasattr(self, 'preview_area') and self.generated_pixmap:
             self._refresh_preview_pixmap()
 
+    def closeEvent(self, event):
+        """关闭前等待生图任务与图片保存结束，避免留下不完整的文件"""
+        # 先隐藏窗口，等待执行中的任务（最多 SHUTDOWN_WAIT_MS）时界面不会卡在原处
+        self.hide()
+        self.image_queue.shutdown()
+        if self.save_thread and self.save_thread.isRunning():
+            self.save_thread.wait()
+        super().closeEvent(event)
+
     def _on_ai_generated(self, data: dict):
         """AI生成完成后应用到表单"""
         self._fill_form_from_data(data)
@@ -1488,10 +1667,9 @@ class PromptGeneratorApp(QMainWindow):
 
     def _copy_to_clipboard(self):
         """复制JSON到剪贴板"""
-        json_text = self.json_preview.toPlainText()
-        if not json_text:
-            self._generate_json()
-            json_text = self.json_preview.toPlainText()
+        # 预览可能因防抖或隐藏尚未刷新，复制前强制渲染最新内容
+        self._flush_preview()
+        json_text = self._preview_text
 
         if CLIPBOARD_AVAILABLE:
             try:
@@ -1515,22 +1693,21 @@ class PromptGeneratorApp(QMainWindow):
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
         )
         if reply == QMessageBox.StandardButton.Yes:
-            for widget in self.field_widgets.values():
-                widget.clear()
-            self.aspect_selector.clear()
-            self.json_preview.clear()
+            with self._batch_update():
+                for field_name in self._form_values:
+                    self._set_field_value(field_name, [] if field_name in NEGATIVE_FIELDS else "")
+                # 重置反向提示词开关
+                self.negative_prompt_enabled.setChecked(False)
+                self._set_group_visible(self.negative_group, False)
+            # 退出批量更新时会重建一次预览，清空需放在其后，预览才保持为空
+            self._reset_preview()
             self.current_preset_name = None
             self.preset_selector.setCurrentIndex(0)
-            # 重置画幅设置开关
-            self.aspect_enabled.setChecked(False)
-            self.aspect_group.setVisible(False)
-            # 重置反向提示词开关
-            self.negative_prompt_enabled.setChecked(False)
-            self.negative_group.setVisible(False)
             # 重置特别要求开关
             self.special_requirement_enabled.setChecked(False)
-            self.special_requirement_group.setVisible(False)
-            self.special_requirement_input.clear()
+            self._set_group_visible(self.special_requirement_group, False)
+            if self.special_requirement_input is not None:
+                self.special_requirement_input.clear()
             # 清空生图相关
             if hasattr(self, 'selected_images'):
                 self._clear_images()
@@ -0,0 +1,214 @@
+"""
+Nano Banana 批量生图（命令行，无需图形界面）
+
+按预设文件批量生成图片，提示词的构建方式与主界面“加载预设 → 生成图片”一致。
+每个预设的结果写入输出目录，同时在 manifest.jsonl 中逐行记录耗时与状态。
+
+使用方法:
+    python batch_render.py presets/ -o output/
+    python batch_render.py a.json b.json --special "画面中不要出现文字" --workers 4
+
+Gemini 的 Base URL / API Key / 模型默认读取 config/ai_config.yaml，
+也可以通过命令行参数或环境变量 GEMINI_BASE_URL、GEMINI_API_KEY、GEMINI_MODEL 覆盖。
+"""
+import sys
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 确保src目录在路径中
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from components.gemini_client import ASPECT_RATIO_LIST, IMAGE_SIZE_LIST, get_shared_client, close_shared_clients
+from utils.ai_config import get_ai_config_manager
+from utils.image_format import format_from_mime, suffix_for_format
+from utils.prompt_builder import NEGATIVE_FIELDS, build_prompt_from_preset
+from utils.retry import get_retry_scheduler
+from utils.yaml_handler import YamlHandler
+
+
+DEFAULT_IMAGE_MODEL = "gemini-3-pro-image-preview"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="按预设批量生成图片（无界面）")
+    parser.add_argument("presets", nargs="+", help="预设 JSON 文件或包含预设的目录")
+    parser.add_argument("-o", "--output-dir", default="batch_output", help="输出目录（默认 batch_output）")
+    parser.add_argument("--special", default="", help="追加到每个提示词后的特别要求")
+    parser.add_argument("--aspect-ratio", default="1:1", choices=ASPECT_RATIO_LIST, help="宽高比")
+    parser.add_argument("--image-size", default="2K", choices=IMAGE_SIZE_LIST, help="输出尺寸")
+    parser.add_argument("--workers", type=int, default=3, help="并发数（默认 3）")
+    parser.add_argument("--base-url", default=os.environ.get("GEMINI_BASE_URL"), help="Gemini API 地址")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"), help="Gemini API Key")
+    parser.add_argument("--model", default=os.environ.get("GEMINI_MODEL"), help="生图模型")
+    parser.add_argument("--dry-run", action="store_true", help="只构建提示词并写入清单，不调用接口")
+    return parser.parse_args(argv)
+
+
+def collect_preset_files(paths) -> list[Path]:
+    """展开命令行中的文件与目录，目录下按文件名排序取所有 .json，重复指定的文件只保留一次"""
+    files = []
+    seen = set()
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            candidates = sorted(path.glob("*.json"))
+        elif path.is_file():
+            candidates = [path]
+        else:
+            print(f"跳过不存在的路径: {raw}", file=sys.stderr)
+            continue
+        for candidate in candidates:
+            key = candidate.resolve()
+            if key not in seen:
+                seen.add(key)
+                files.append(candidate)
+    return files
+
+
+def assign_output_stems(preset_files: list[Path]) -> list[str]:
+    """为每个预设分配输出文件名；不同目录中的同名预设依次加 _2、_3 后缀，避免互相覆盖"""
+    stems = []
+    used = set()
+    for preset_file in preset_files:
+        stem = preset_file.stem
+        index = 2
+        while stem in used:
+            stem = f"{preset_file.stem}_{index}"
+            index += 1
+        used.add(stem)
+        stems.append(stem)
+    return stems
+
+
+def load_preset_prompt(preset_file: Path, special: str, multi_select_options: dict) -> str:
+    """读取预设并构建提示词，文件无法读取或内容不是 JSON 对象时抛出异常"""
+    with open(preset_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"预设内容应为 JSON 对象，实际为 {type(data).__name__}")
+    return build_prompt_from_preset(data, special, multi_select_options)
+
+
+def resolve_gemini_config(args) -> dict:
+    """命令行参数 / 环境变量优先，其余取自保存的配置"""
+    saved = get_ai_config_manager().get_gemini_config()
+    return {
+        "base_url": (args.base_url or saved.get("base_url") or "").strip(),
+        "api_key": (args.api_key or saved.get("api_key") or "").strip(),
+        "model": (args.model or saved.get("model") or DEFAULT_IMAGE_MODEL).strip(),
+    }
+
+
+def base_record(preset_file: Path, args) -> dict:
+    """清单记录的公共字段"""
+    return {
+        "preset": str(preset_file),
+        "name": preset_file.stem,
+        "aspect_ratio": args.aspect_ratio,
+        "image_size": args.image_size,
+        "started_at": time.time(),
+    }
+
+
+def render_one(preset_file: Path, output_stem: str, prompt: str, args, gemini_config: dict, output_dir: Path) -> dict:
+    """生成单个预设的图片，返回清单记录"""
+    record = base_record(preset_file, args)
+    record["prompt_chars"] = len(prompt)
+    start = time.perf_counter()
+    try:
+        if args.dry_run:
+            record["status"] = "skipped"
+        else:
+            client = get_shared_client(
+                base_url=gemini_config["base_url"],
+                api_key=gemini_config["api_key"],
+                image_model=gemini_config["model"],
+            )
+            result = client.generate_image_bytes(
+                text=prompt,
+                aspect_ratio=args.aspect_ratio,
+                image_size=args.image_size,
+            )
+            if result is None:
+                raise ValueError("未生成图片")
+            image_bytes, mime_type = result
+            # 原始数据直接写盘，扩展名跟随接口返回的格式
+            output = output_dir / (output_stem + suffix_for_format(format_from_mime(mime_type)))
+            output.write_bytes(image_bytes)
+            record.update(status="ok", output=str(output), mime_type=mime_type, bytes=len(image_bytes))
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    record["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    preset_files = collect_preset_files(args.presets)
+    if not preset_files:
+        print("没有找到预设文件", file=sys.stderr)
+        return 2
+
+    gemini_config = resolve_gemini_config(args)
+    if not args.dry_run and (not gemini_config["base_url"] or not gemini_config["api_key"]):
+        print("请先配置 Gemini Base URL 和 API Key（配置文件、命令行参数或环境变量）", file=sys.stderr)
+        return 2
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / "manifest.jsonl"
+
+    # 多选字段按表单的可选项过滤，保证与界面生成的提示词一致
+    yaml_handler = YamlHandler()
+    multi_select_options = {name: yaml_handler.get_field_options(name) for name in NEGATIVE_FIELDS}
+
+    batch_start = time.perf_counter()
+    failures = 0
+    jobs = []
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+
+        def write_record(record: dict):
+            manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+            manifest.flush()
+            print(f"[{record['status']}] {record['name']} {record['elapsed_s']}s {record.get('error', '')}".rstrip())
+
+        # 无法加载的预设同样写入清单并计为失败
+        for preset_file, output_stem in zip(preset_files, assign_output_stems(preset_files)):
+            try:
+                prompt = load_preset_prompt(preset_file, args.special, multi_select_options)
+            except Exception as e:
+                record = base_record(preset_file, args)
+                record.update(status="error", error=f"加载预设失败: {e}", elapsed_s=0.0)
+                failures += 1
+                write_record(record)
+                continue
+            jobs.append((preset_file, output_stem, prompt))
+
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = [
+                executor.submit(render_one, preset_file, output_stem, prompt, args, gemini_config, output_dir)
+                for preset_file, output_stem, prompt in jobs
+            ]
+            for future in as_completed(futures):
+                record = future.result()
+                failures += record["status"] == "error"
+                write_record(record)
+
+    close_shared_clients()
+    total = time.perf_counter() - batch_start
+    print(f"完成 {len(preset_files)} 个预设，失败 {failures} 个，总耗时 {total:.1f}s，清单: {manifest_path}")
+    stats = get_retry_scheduler().metrics.snapshot()["total"]
+    if stats["calls"]:
+        print(
+            f"接口调用 {stats['calls']} 次，重试 {stats['retries']} 次（限流 {stats['rate_limited']} 次），"
+            f"限流/退避等待 {stats['throttled_seconds']:.1f}s"
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
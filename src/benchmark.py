@@ -0,0 +1,427 @@
+"""
+Nano Banana 热点路径基准测试（无界面，使用 offscreen Qt 平台）
+
+覆盖表单收集/预览/填充、预设列表与加载（默认 1 万个预设）、选项读取、
+AI 修改对话框的差异比较与应用，以及生成结果预览的图片解码与缩放。
+结果保存为 JSON，可与之前的结果对比，中位数变慢超过阈值时标记为退化。
+
+使用方法:
+    python benchmark.py                                  # 运行全部，结果写入 cache/benchmarks/
+    python benchmark.py -k presets --repeat 30           # 只运行名称包含 presets 的项
+    python benchmark.py -o after.json --compare before.json
+    python benchmark.py --input after.json --compare before.json   # 只对比两个结果文件
+"""
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# 确保src目录在路径中
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 无显示环境下运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QT_VERSION_STR, QSize
+from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtWidgets import QApplication, QCheckBox
+
+from utils.prompt_builder import FIELD_PATHS, NEGATIVE_FIELDS, build_prompt_data
+from utils.resource_path import get_cache_dir
+
+
+# 结果文件格式版本，字段变化时递增
+RESULT_VERSION = 1
+
+# 每轮计时的最短时长（秒），单次很快的操作会在一轮中重复多次
+MIN_RUN_SECONDS = 0.005
+
+# 每轮最多重复的次数
+MAX_NUMBER = 1000
+
+# 默认的退化阈值：中位数比基准慢 20% 以上
+DEFAULT_THRESHOLD = 0.2
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """登记一个基准测试；被装饰的函数接收 BenchContext，返回要计时的无参函数"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="提示词编辑热点路径基准测试")
+    parser.add_argument("-k", "--filter", default="", help="只运行名称包含该文本的测试")
+    parser.add_argument("--repeat", type=int, default=15, help="每项测试的计时轮数（默认 15）")
+    parser.add_argument("--presets", type=int, default=10000, help="预设测试使用的预设数量（默认 10000）")
+    parser.add_argument("--doc-keys", type=int, default=2000, help="差异比较测试中文档的字段数（默认 2000）")
+    parser.add_argument("--image-edge", type=int, default=2048, help="预览测试中图片的边长（默认 2048）")
+    parser.add_argument("-o", "--output", default="", help="结果 JSON 路径（默认 cache/benchmarks/bench-<时间>.json）")
+    parser.add_argument("--compare", default="", help="作为基准的结果 JSON，对比后有退化时返回 1")
+    parser.add_argument("--input", default="", help="不运行测试，直接用该结果 JSON 与 --compare 对比")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="退化阈值（默认 0.2，即慢 20%%）")
+    parser.add_argument("--list", action="store_true", help="列出所有测试名称")
+    return parser.parse_args(argv)
+
+
+# ========== 测试数据 ==========
+
+def sample_form_values(variant: int, negative_options: dict) -> dict:
+    """构造一份填满所有字段的表单值，variant 不同时各字段的值不同"""
+    values = {}
+    for name in FIELD_PATHS:
+        if name in NEGATIVE_FIELDS:
+            options = negative_options.get(name) or []
+            values[name] = options[variant % 2::2] if options else []
+        else:
+            values[name] = f"{name} 示例 {variant}，细节描述 {variant * 7 % 13}"
+    return values
+
+
+def sample_preset(variant: int, negative_options: dict) -> dict:
+    return build_prompt_data(sample_form_values(variant, negative_options), negative_enabled=True)
+
+
+def large_documents(key_count: int, seed: int = 7) -> tuple:
+    """构造两份嵌套的大文档：约三成字段修改，少量新增和删除"""
+    rng = random.Random(seed)
+    old, new = {}, {}
+    sections = max(1, key_count // 40)
+    for s in range(sections):
+        section = f"分组{s}"
+        old[section], new[section] = {}, {}
+        for k in range(40):
+            key = f"字段{k}"
+            value = f"{section}-{key} 原始描述 " + "细节" * rng.randint(1, 8)
+            roll = rng.random()
+            if roll < 0.05:
+                old[section][key] = value  # 删除
+            elif roll < 0.10:
+                new[section][key] = value  # 新增
+            else:
+                old[section][key] = value
+                new[section][key] = value + " 修改后" if roll < 0.35 else value
+        if s % 5 == 0:
+            nested = {f"子项{i}": [f"值{i}", f"值{i + 1}"] for i in range(10)}
+            old[section]["嵌套"] = nested
+            new[section]["嵌套"] = dict(nested, 子项0=["新值"])
+    return old, new
+
+
+def noise_image_bytes(edge: int) -> bytes:
+    """生成带噪点的 PNG，解码开销接近真实的生成结果"""
+    from io import BytesIO
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize((edge, edge))
+    noise = Image.effect_noise((edge, edge), 48)
+    buffer = BytesIO()
+    Image.merge("RGB", (gradient, noise, gradient)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class BenchContext:
+    """测试共用的对象，首次使用时创建"""
+
+    def __init__(self, args):
+        self.args = args
+        self.app = QApplication.instance() or QApplication(sys.argv[:1])
+        self._tmp = tempfile.TemporaryDirectory(prefix="nano_banana_bench_")
+        self.tmp_dir = Path(self._tmp.name)
+        self._window = None
+        self._preset_manager = None
+        self._modify_dialog = None
+
+    @property
+    def window(self):
+        if self._window is None:
+            from app import PromptGeneratorApp
+            self._window = PromptGeneratorApp()
+        return self._window
+
+    @property
+    def negative_options(self) -> dict:
+        return {name: self.window.yaml_handler.get_field_options(name) for name in NEGATIVE_FIELDS}
+
+    @property
+    def preset_manager(self):
+        """临时目录中的预设管理器，索引也写入临时目录，不影响本地缓存"""
+        if self._preset_manager is None:
+            from utils.preset_index import PresetIndex
+            from utils.preset_manager import PresetManager
+            from utils.preset_search import PresetSearchIndex
+
+            presets_dir = self.tmp_dir / "presets"
+            presets_dir.mkdir()
+            negative_options = self.negative_options
+            for i in range(self.args.presets):
+                with open(presets_dir / f"preset_{i:05d}.json", "w", encoding="utf-8") as f:
+                    json.dump(sample_preset(i, negative_options), f, ensure_ascii=False, indent=2)
+            manager = PresetManager(presets_dir)
+            manager.index = PresetIndex(presets_dir, index_path=self.tmp_dir / "preset_index.json")
+            manager.search_index = PresetSearchIndex(presets_dir, index_path=self.tmp_dir / "preset_search.json")
+            manager.get_all_presets()  # 建立索引
+            self._preset_manager = manager
+        return self._preset_manager
+
+    @property
+    def modify_dialog(self):
+        if self._modify_dialog is None:
+            from components.ai_dialog import AIModifyDialog
+            self._modify_dialog = AIModifyDialog({})
+        return self._modify_dialog
+
+    def close(self):
+        if self._window is not None:
+            self._window.close()
+        if self._modify_dialog is not None:
+            self._modify_dialog.close()
+        self._tmp.cleanup()
+
+
+# ========== 测试项 ==========
+
+@benchmark("form.collect_form_data")
+def bench_collect_form_data(ctx: BenchContext):
+    window = ctx.window
+    window._fill_form_from_data(sample_preset(1, ctx.negative_options))
+    return window._collect_form_data
+
+
+@benchmark("form.generate_json")
+def bench_generate_json(ctx: BenchContext):
+    """预览可见时整体重建 JSON 预览"""
+    window = ctx.window
+    window._fill_form_from_data(sample_preset(1, ctx.negative_options))
+    window.json_preview_visible = True
+    return window._generate_json
+
+
+@benchmark("form.edit_field_preview")
+def bench_edit_field_preview(ctx: BenchContext):
+    """修改单个字段后刷新预览（增量补丁路径）"""
+    window = ctx.window
+    window._fill_form_from_data(sample_preset(1, ctx.negative_options))
+    window.json_preview_visible = True
+    window._flush_preview()
+    widget = window.field_widgets["光线"]
+    state = {"i": 0}
+
+    def run():
+        state["i"] += 1
+        widget.set_value(f"光线 修改 {state['i']}")
+        window._flush_preview()
+    return run
+
+
+@benchmark("form.fill_form_from_data")
+def bench_fill_form_from_data(ctx: BenchContext):
+    window = ctx.window
+    presets = [sample_preset(i, ctx.negative_options) for i in range(2)]
+    state = {"i": 0}
+
+    def run():
+        state["i"] += 1
+        window._fill_form_from_data(presets[state["i"] % 2])
+    return run
+
+
+@benchmark("presets.get_all_presets")
+def bench_get_all_presets(ctx: BenchContext):
+    """目录未变化时直接返回索引中的条目（不 stat 文件）"""
+    return ctx.preset_manager.get_all_presets
+
+
+@benchmark("presets.get_all_presets_refresh")
+def bench_get_all_presets_refresh(ctx: BenchContext):
+    """强制重新遍历目录并逐个 stat 文件（刷新按钮）"""
+    manager = ctx.preset_manager
+    return lambda: manager.get_all_presets(refresh=True)
+
+
+@benchmark("presets.load_preset")
+def bench_load_preset(ctx: BenchContext):
+    manager = ctx.preset_manager
+    names = [f"preset_{i:05d}" for i in range(ctx.args.presets)]
+    rng = random.Random(3)
+    return lambda: manager.load_preset(rng.choice(names))
+
+
+@benchmark("yaml.get_field_options")
+def bench_get_field_options(ctx: BenchContext):
+    handler = ctx.window.yaml_handler
+    names = list(FIELD_PATHS)
+
+    def run():
+        for name in names:
+            handler.get_field_options(name)
+    return run
+
+
+@benchmark("ai_modify.compare_dicts")
+def bench_compare_dicts(ctx: BenchContext):
+    dialog = ctx.modify_dialog
+    old, new = large_documents(ctx.args.doc_keys)
+
+    def run():
+        dialog.diff_items = []
+        dialog._compare_dicts(old, new, [])
+    return run
+
+
+@benchmark("ai_modify.apply_selected_differences")
+def bench_apply_selected_differences(ctx: BenchContext):
+    dialog = ctx.modify_dialog
+    old, new = large_documents(ctx.args.doc_keys)
+    dialog.diff_items = []
+    dialog._compare_dicts(old, new, [])
+    dialog.diff_checkboxes = {}
+    for index, item in enumerate(dialog.diff_items):
+        checkbox = QCheckBox()
+        checkbox.setChecked(index % 4 != 0)  # 约四分之三的差异被选中
+        dialog.diff_checkboxes[item["path"]] = checkbox
+    return lambda: dialog._apply_selected_differences(old, new)
+
+
+@benchmark("preview.decode_image")
+def bench_decode_image(ctx: BenchContext):
+    """生成结果到达时的解码（与 _on_image_ready 相同）"""
+    data = noise_image_bytes(ctx.args.image_edge)
+    return lambda: QPixmap.fromImage(QImage.fromData(data))
+
+
+@benchmark("preview.refresh_pixmap")
+def bench_refresh_pixmap(ctx: BenchContext):
+    """把生成结果缩放到预览区域"""
+    window = ctx.window
+    window.generated_pixmap = QPixmap.fromImage(QImage.fromData(noise_image_bytes(ctx.args.image_edge)))
+    window.preview_area.resize(QSize(600, 600))
+    return window._refresh_preview_pixmap
+
+
+# ========== 运行与对比 ==========
+
+def measure(func, repeat: int) -> dict:
+    """预热后计时 repeat 轮，返回单次调用的耗时统计（毫秒）"""
+    start = time.perf_counter()
+    func()
+    single = time.perf_counter() - start
+    number = max(1, min(MAX_NUMBER, int(MIN_RUN_SECONDS / single) if single > 0 else MAX_NUMBER))
+
+    samples = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "min_ms": round(samples[0], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "repeat": len(samples),
+        "number": number,
+    }
+
+
+def run_benchmarks(args) -> dict:
+    names = [name for name in BENCHMARKS if args.filter in name]
+    ctx = BenchContext(args)
+    results = {}
+    try:
+        for name in names:
+            try:
+                func = BENCHMARKS[name](ctx)
+                results[name] = measure(func, args.repeat)
+                stats = results[name]
+                print(f"  {name:<40} 中位数 {stats['median_ms']:10.3f} ms   p95 {stats['p95_ms']:10.3f} ms")
+            except Exception as e:
+                results[name] = {"error": str(e)}
+                print(f"  {name:<40} 失败: {e}")
+    finally:
+        ctx.close()
+    return {
+        "version": RESULT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "qt": QT_VERSION_STR,
+        "params": {
+            "repeat": args.repeat,
+            "presets": args.presets,
+            "doc_keys": args.doc_keys,
+            "image_edge": args.image_edge,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list:
+    """逐项对比中位数，返回退化的测试名称"""
+    regressions = []
+    print(f"\n与基准对比（{baseline.get('created_at', '?')}，阈值 ±{threshold:.0%}）:")
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "median_ms" not in base or "median_ms" not in stats:
+            print(f"  {name:<40} 无可对比的数据")
+            continue
+        ratio = stats["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        if ratio > 1 + threshold:
+            mark = "退化"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            mark = "提升"
+        else:
+            mark = "持平"
+        print(f"  {name:<40} {base['median_ms']:10.3f} → {stats['median_ms']:10.3f} ms  ×{ratio:.2f}  {mark}")
+    if baseline.get("params") != current.get("params"):
+        print("  注意: 两次运行的参数不同，对比结果仅供参考")
+    return regressions
+
+
+def load_results(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    if args.input:
+        current = load_results(args.input)
+    else:
+        print("运行基准测试:")
+        current = run_benchmarks(args)
+        output = Path(args.output) if args.output else (
+            get_cache_dir() / "benchmarks" / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {output}")
+
+    if args.compare:
+        regressions = compare_results(load_results(args.compare), current, args.threshold)
+        if regressions:
+            print(f"发现 {len(regressions)} 项退化: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,18 @@
 # Components package
-from .combo_input import ComboInput
-from .field_group import FieldGroup
-from .aspect_ratio_selector import AspectRatioSelector
-from .multi_select import MultiSelectInput
+# 界面组件按需导入，使 gemini_client 等非界面模块可以在没有 Qt 的环境中单独使用
+from importlib import import_module
+
+_LAZY_IMPORTS = {
+    "ComboInput": ".combo_input",
+    "FieldGroup": ".field_group",
+    "AspectRatioSelector": ".aspect_ratio_selector",
+    "MultiSelectInput": ".multi_select",
+}
 
 __all__ = ["ComboInput", "FieldGroup", "AspectRatioSelector", "MultiSelectInput"]
 
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        return getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
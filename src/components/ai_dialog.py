@@ -1,7 +1,6 @@
 """AI生成提示词对话框 - 流式输出版"""
 import json
-import os
-from typing import List
+from typing import Callable, List, Optional
 from PyQt6.QtWidgets import (
     QDialog,
     QVBoxLayout,
@@ -17,16 +16,21 @@ from PyQt6.QtWidgets import (
     QStackedWidget,
     QFileDialog,
     QListWidget,
-    QListWidgetItem,
     QCheckBox,
     QScrollArea,
     QComboBox,
 )
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QFont, QIcon, QPixmap
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QFont, QPixmap
 
-from utils.ai_config import AIConfigManager
+from utils.ai_config import get_ai_config_manager
 from utils.ai_service import AIService
+from utils.stream_json import IncrementalJSONParser
+from components.thumbnail_loader import ThumbnailLoader
+
+
+# 流式内容刷新到输出框的间隔（毫秒），约 30 帧/秒
+STREAM_FLUSH_INTERVAL_MS = 33
 
 
 class AIConfigDialog(QDialog):
@@ -36,7 +40,7 @@ class AIConfigDialog(QDialog):
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.config_manager = AIConfigManager()
+        self.config_manager = get_ai_config_manager()
         self._setup_ui()
         self._load_config()
     
@@ -202,7 +206,7 @@ class UnifiedAIConfigDialog(QDialog):
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.config_manager = AIConfigManager()
+        self.config_manager = get_ai_config_manager()
         self._setup_ui()
         self._load_config()
     
@@ -492,7 +496,123 @@ class UnifiedAIConfigDialog(QDialog):
             QMessageBox.critical(self, "错误", "保存配置失败，请重试")
 
 
-class AIGenerateDialog(QDialog):
+class StreamingOutputMixin:
+    """AI 生成/修改对话框共用的流式输出处理
+
+    流式内容先进入缓冲区，由定时器按固定帧率合并写入 output_display，
+    同时交给 IncrementalJSONParser 增量解析；格式错误时立即取消并自动重试一次。
+    使用方需提供 output_display、status_label、ai_service、_is_generating、
+    _set_generating_ui 和 _on_stream_done，并在初始化时传入发起实际请求的函数。
+    """
+
+    # 状态栏中表示进行中的文字
+    STREAM_STATUS_TEXT = "生成中"
+
+    def _init_stream_state(self, request: Callable[[bool], object]):
+        """初始化流式输出状态，需在 __init__ 中调用
+
+        :param request: 按 _stream_request 发起流式请求的函数，参数为 use_cache，返回请求线程
+        """
+        self._stream_request_func = request
+        # 流式输出的增量解析状态；格式错误时自动重试一次
+        self._stream_parser: Optional[IncrementalJSONParser] = None
+        self._stream_thread = None
+        self._stream_request = None
+        self._stream_retried = False
+        # 流式内容先进入缓冲区，由定时器按固定帧率合并写入输出框
+        self._stream_parts: List[str] = []
+        self._pending_chunks: List[str] = []
+        self._stream_flush_timer = QTimer(self)
+        self._stream_flush_timer.setSingleShot(True)
+        self._stream_flush_timer.setInterval(STREAM_FLUSH_INTERVAL_MS)
+        self._stream_flush_timer.timeout.connect(self._flush_stream_buffer)
+
+    def _start_stream(self, use_cache: bool = True):
+        """发起（或重新发起）流式请求"""
+        self._stream_parser = IncrementalJSONParser()
+        self._full_content = ""
+        self._stream_parts = []
+        self._pending_chunks = []
+        self._stream_flush_timer.stop()
+        self.output_display.clear()
+        self._stream_thread = self._stream_request_func(use_cache)
+
+    def _stop_stream(self):
+        """用户点击停止：取消请求，保留已显示的内容"""
+        self.ai_service.cancel()
+        self._stream_flush_timer.stop()
+        self._pending_chunks.clear()
+        self._full_content = "".join(self._stream_parts)
+        self._is_generating = False
+        self._set_generating_ui(False)
+        self.status_label.setText("已取消")
+
+    def _is_current_stream(self) -> bool:
+        """信号是否来自当前请求（重试后，已取消请求的残留信号直接忽略）"""
+        return self.sender() is self._stream_thread
+
+    def _feed_stream_parser(self, chunk: str):
+        """增量解析流式内容：显示已完成的顶层字段，格式错误时立即取消并重试一次"""
+        completed = self._stream_parser.feed(chunk)
+        if completed:
+            names = "、".join(self._stream_parser.fields)
+            self.status_label.setText(f"{self.STREAM_STATUS_TEXT}... 已完成字段：{names}")
+        if self._stream_parser.error:
+            self._on_stream_syntax_error(self._stream_parser.error)
+
+    def _on_stream_syntax_error(self, error: str):
+        self.ai_service.cancel()
+        if not self._stream_retried:
+            self._stream_retried = True
+            self.status_label.setText(f"回复格式有误（{error}），正在重试...")
+            self._start_stream(use_cache=False)
+            return
+        self._is_generating = False
+        self._set_generating_ui(False)
+        self.status_label.setText(f"回复不是有效的 JSON：{error}")
+        self.status_label.setStyleSheet("color: #F44336; font-size: 12px;")
+
+    def _on_stream_chunk(self, chunk: str):
+        """收到流式内容块：先放入缓冲区，等定时器合并刷新"""
+        if not self._is_current_stream() or not self._is_generating:
+            return
+        self._pending_chunks.append(chunk)
+        if not self._stream_flush_timer.isActive():
+            self._stream_flush_timer.start()
+
+    def _flush_stream_buffer(self):
+        """把缓冲区中的内容一次性追加到显示区域"""
+        if not self._pending_chunks:
+            return
+        text = "".join(self._pending_chunks)
+        self._pending_chunks.clear()
+        self._stream_parts.append(text)
+        cursor = self.output_display.textCursor()
+        cursor.movePosition(cursor.MoveOperation.End)
+        cursor.insertText(text)
+        self.output_display.setTextCursor(cursor)
+        # 滚动到底部
+        scrollbar = self.output_display.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+        self._feed_stream_parser(text)
+
+    def _finish_stream_buffer(self) -> bool:
+        """流结束时先写入缓冲区中剩余的内容，返回本次结果是否仍然有效
+
+        剩余内容中发现格式错误时已取消或重试，本次结果作废。
+        """
+        self._stream_flush_timer.stop()
+        self._flush_stream_buffer()
+        return self._is_current_stream() and self._is_generating
+
+    def _stream_result(self):
+        """增量解析已完成时返回解析出的对象，否则返回 None"""
+        if self._stream_parser is not None and self._stream_parser.done:
+            return self._stream_parser.value
+        return None
+
+
+class AIGenerateDialog(StreamingOutputMixin, QDialog):
     """AI生成提示词对话框 - 流式输出版"""
     
     # 生成完成信号，传递生成的数据
@@ -501,9 +621,12 @@ class AIGenerateDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.ai_service = AIService()
-        self.config_manager = AIConfigManager()
+        self.config_manager = get_ai_config_manager()
         self._is_generating = False
         self._full_content = ""
+        # 流式解析完成时得到的结果，应用时无需再次解析
+        self.generated_data: Optional[dict] = None
+        self._init_stream_state(self._request_stream)
         self.selected_images: List[str] = []
         self._setup_ui()
     
@@ -677,6 +800,7 @@ class AIGenerateDialog(QDialog):
         self.image_list.setMinimumHeight(150)
         self.image_list.setViewMode(QListWidget.ViewMode.IconMode)
         self.image_list.setIconSize(QPixmap(120, 120).size())
+        self._thumbnail_loader = ThumbnailLoader(self.image_list)
         self.image_list.setResizeMode(QListWidget.ResizeMode.Adjust)
         self.image_list.setSpacing(10)
         self.image_list.setWordWrap(True)
@@ -843,26 +967,9 @@ class AIGenerateDialog(QDialog):
     
     def _append_image_item(self, path: str):
         """添加图片项到列表"""
-        pixmap = QPixmap(path)
-        if not pixmap.isNull():
-            thumbnail = pixmap.scaled(
-                120, 120,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            icon = QIcon(thumbnail)
-            item = QListWidgetItem(self.image_list)
-            item.setIcon(icon)
-            item.setText(os.path.basename(path))
-            item.setToolTip(path)
-            item.setData(Qt.ItemDataRole.UserRole, path)
-            item.setTextAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignBottom)
-        else:
-            item = QListWidgetItem(os.path.basename(path))
-            item.setToolTip(f"{path} (加载失败)")
-            item.setData(Qt.ItemDataRole.UserRole, path)
-            self.image_list.addItem(item)
-    
+        # 缩略图在后台线程中解码，列表项先行添加
+        self._thumbnail_loader.add_item(path)
+
     def _remove_selected_images(self):
         """移除选中的图片"""
         for item in self.image_list.selectedItems():
@@ -880,10 +987,7 @@ class AIGenerateDialog(QDialog):
         """开始生成"""
         if self._is_generating:
             # 如果正在生成，点击变为取消
-            self.ai_service.cancel()
-            self._is_generating = False
-            self._set_generating_ui(False)
-            self.status_label.setText("已取消")
+            self._stop_stream()
             return
         
         # 检查配置
@@ -907,6 +1011,7 @@ class AIGenerateDialog(QDialog):
         # 清空输出并开始
         self.output_display.clear()
         self._full_content = ""
+        self.generated_data = None
         self._is_generating = True
         self._set_generating_ui(True)
         self.apply_btn.setEnabled(False)
@@ -924,7 +1029,14 @@ class AIGenerateDialog(QDialog):
         # 传递图片路径列表
         image_paths = self.selected_images.copy() if self.selected_images else None
         
-        self.ai_service.generate_async(
+        self._stream_request = (prompt, image_paths)
+        self._stream_retried = False
+        self._start_stream()
+    
+    def _request_stream(self, use_cache: bool):
+        """发起流式生成请求，返回请求线程"""
+        prompt, image_paths = self._stream_request
+        return self.ai_service.generate_async(
             prompt,
             image_paths=image_paths,
             on_finished=self._on_generate_finished,
@@ -932,6 +1044,7 @@ class AIGenerateDialog(QDialog):
             on_progress=self._on_generate_progress,
             on_stream_chunk=self._on_stream_chunk,
             on_stream_done=self._on_stream_done,
+            use_cache=use_cache,
         )
     
     def _set_generating_ui(self, generating: bool):
@@ -951,25 +1064,20 @@ class AIGenerateDialog(QDialog):
     
     def _on_generate_progress(self, message: str):
         """进度更新"""
+        if not self._is_current_stream():
+            return
         self.status_label.setText(message)
     
-    def _on_stream_chunk(self, chunk: str):
-        """收到流式内容块"""
-        self._full_content += chunk
-        # 追加到显示区域
-        cursor = self.output_display.textCursor()
-        cursor.movePosition(cursor.MoveOperation.End)
-        cursor.insertText(chunk)
-        self.output_display.setTextCursor(cursor)
-        # 滚动到底部
-        scrollbar = self.output_display.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
-    
     def _on_stream_done(self, full_content: str):
         """流式完成"""
+        if not self._is_current_stream() or not self._is_generating:
+            return
+        if not self._finish_stream_buffer():
+            return
         self._is_generating = False
         self._set_generating_ui(False)
         self._full_content = full_content
+        self.generated_data = self._stream_result()
         self.status_label.setText("生成完成")
         self.status_label.setStyleSheet("color: #4CAF50; font-size: 12px;")
         self.apply_btn.setEnabled(True)
@@ -1003,6 +1111,8 @@ class AIGenerateDialog(QDialog):
     
     def _on_generate_error(self, error: str):
         """生成错误"""
+        if not self._is_current_stream():
+            return
         self._is_generating = False
         self._set_generating_ui(False)
         self.status_label.setText(f"错误: {error}")
@@ -1010,6 +1120,11 @@ class AIGenerateDialog(QDialog):
     
     def _on_apply(self):
         """应用生成的内容到表单"""
+        if self.generated_data is not None:
+            self.generated.emit(self.generated_data)
+            self.accept()
+            return
+
         content = self._full_content.strip()
         
         if not content:
@@ -1050,8 +1165,10 @@ class AIGenerateDialog(QDialog):
         super().closeEvent(event)
 
 
-class AIModifyDialog(QDialog):
+class AIModifyDialog(StreamingOutputMixin, QDialog):
     """AI修改提示词对话框 - 流式输出版"""
+
+    STREAM_STATUS_TEXT = "修改中"
     
     # 修改完成信号，传递修改后的数据
     modified = pyqtSignal(dict)
@@ -1061,9 +1178,10 @@ class AIModifyDialog(QDialog):
         self.current_data = current_data
         self.modified_data = None
         self.ai_service = AIService()
-        self.config_manager = AIConfigManager()
+        self.config_manager = get_ai_config_manager()
         self._is_generating = False
         self._full_content = ""
+        self._init_stream_state(self._request_stream)
         self.selected_images: List[str] = []
         self.diff_items = []  # 存储差异项信息
         self.diff_checkboxes = {}  # 存储路径到复选框的映射
@@ -1240,6 +1358,7 @@ class AIModifyDialog(QDialog):
         self.image_list.setMinimumHeight(150)
         self.image_list.setViewMode(QListWidget.ViewMode.IconMode)
         self.image_list.setIconSize(QPixmap(120, 120).size())
+        self._thumbnail_loader = ThumbnailLoader(self.image_list)
         self.image_list.setResizeMode(QListWidget.ResizeMode.Adjust)
         self.image_list.setSpacing(10)
         self.image_list.setWordWrap(True)
@@ -1448,26 +1567,9 @@ class AIModifyDialog(QDialog):
     
     def _append_image_item(self, path: str):
         """添加图片项到列表"""
-        pixmap = QPixmap(path)
-        if not pixmap.isNull():
-            thumbnail = pixmap.scaled(
-                120, 120,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            icon = QIcon(thumbnail)
-            item = QListWidgetItem(self.image_list)
-            item.setIcon(icon)
-            item.setText(os.path.basename(path))
-            item.setToolTip(path)
-            item.setData(Qt.ItemDataRole.UserRole, path)
-            item.setTextAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignBottom)
-        else:
-            item = QListWidgetItem(os.path.basename(path))
-            item.setToolTip(f"{path} (加载失败)")
-            item.setData(Qt.ItemDataRole.UserRole, path)
-            self.image_list.addItem(item)
-    
+        # 缩略图在后台线程中解码，列表项先行添加
+        self._thumbnail_loader.add_item(path)
+
     def _remove_selected_images(self):
         """移除选中的图片"""
         for item in self.image_list.selectedItems():
@@ -1485,10 +1587,7 @@ class AIModifyDialog(QDialog):
         """开始生成"""
         if self._is_generating:
             # 如果正在生成，点击变为取消
-            self.ai_service.cancel()
-            self._is_generating = False
-            self._set_generating_ui(False)
-            self.status_label.setText("已取消")
+            self._stop_stream()
             return
         
         # 如果已有生成内容，添加确认提示
@@ -1550,7 +1649,14 @@ class AIModifyDialog(QDialog):
         # 传递图片路径列表
         image_paths = self.selected_images.copy() if self.selected_images else None
         
-        self.ai_service.generate_modify_async(
+        self._stream_request = (current_json, prompt, image_paths)
+        self._stream_retried = False
+        self._start_stream()
+
+    def _request_stream(self, use_cache: bool):
+        """发起流式修改请求，返回请求线程"""
+        current_json, prompt, image_paths = self._stream_request
+        return self.ai_service.generate_modify_async(
             current_json,
             prompt,
             image_paths=image_paths,
@@ -1559,6 +1665,7 @@ class AIModifyDialog(QDialog):
             on_progress=self._on_generate_progress,
             on_stream_chunk=self._on_stream_chunk,
             on_stream_done=self._on_stream_done,
+            use_cache=use_cache,
         )
 
     def _set_generating_ui(self, generating: bool):
@@ -1579,29 +1686,27 @@ class AIModifyDialog(QDialog):
 
     def _on_generate_progress(self, message: str):
         """进度更新"""
+        if not self._is_current_stream():
+            return
         self.status_label.setText(message)
 
-    def _on_stream_chunk(self, chunk: str):
-        """接收流式内容块"""
-        self._full_content += chunk
-        # 在输出显示中追加内容
-        cursor = self.output_display.textCursor()
-        cursor.movePosition(cursor.MoveOperation.End)
-        cursor.insertText(chunk)
-        self.output_display.setTextCursor(cursor)
-        self.output_display.ensureCursorVisible()
-
     def _on_stream_done(self, content: str):
         """流式传输完成"""
+        if not self._is_current_stream() or not self._is_generating:
+            return
+        if not self._finish_stream_buffer():
+            return
         self._full_content = content
         self._is_generating = False
         self._set_generating_ui(False)
         self.status_label.setText("修改完成")
         self.status_label.setStyleSheet("color: #4CAF50; font-size: 12px;")
         
-        # 尝试解析JSON验证有效性
+        # 尝试解析JSON验证有效性（流式解析已完成时直接使用其结果）
         try:
-            self.modified_data = json.loads(self._full_content)
+            self.modified_data = self._stream_result()
+            if self.modified_data is None:
+                self.modified_data = json.loads(self._full_content)
             self.apply_btn.setEnabled(True)
             # 将应用按钮改为蓝色高亮样式
             self.apply_btn.setObjectName("primaryButton")
@@ -1895,6 +2000,8 @@ class AIModifyDialog(QDialog):
 
     def _on_generate_error(self, error_msg: str):
         """生成出错"""
+        if not self._is_current_stream():
+            return
         self._is_generating = False
         self._set_generating_ui(False)
         self.status_label.setText(f"错误: {error_msg}")
@@ -1,12 +1,11 @@
 """AI 生图对话框"""
 
-import os
-from io import BytesIO
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QIcon, QImage, QPixmap
+from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtWidgets import (
+    QCheckBox,
     QComboBox,
     QDialog,
     QFileDialog,
@@ -15,7 +14,6 @@ from PyQt6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QListWidget,
-    QListWidgetItem,
     QMessageBox,
     QPushButton,
     QSizePolicy,
@@ -24,17 +22,102 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
-from utils.ai_config import AIConfigManager
+from utils.ai_config import get_ai_config_manager
+from utils.image_cache import get_image_cache
+from utils.retry import describe_retry
+from components.image_save import ImageSaveThread, default_save_name, save_file_filter
+from components.thumbnail_loader import ThumbnailLoader
 from components.gemini_client import (
     ASPECT_RATIO_LIST,
     IMAGE_SIZE_LIST,
     THINKING_LEVEL_LIST,
-    GeminiClient,
+    get_shared_client,
 )
 
 
+DEFAULT_GEMINI_IMAGE_MODEL = "gemini-3-pro-image-preview"
+
+# 命中生图缓存时的进度提示
+CACHE_HIT_MESSAGE = "已从缓存读取，未调用接口"
+
+
+def request_gemini_image(
+    prompt: str,
+    image_paths: List[str],
+    aspect_ratio: str,
+    image_size: str,
+    gemini_config: Optional[dict] = None,
+    progress: Optional[Callable[[str], None]] = None,
+    use_cache: bool = False,
+    refresh_cache: bool = False,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> Tuple[bytes, str]:
+    """按 Gemini 配置生成一张图片，返回 (原始图片字节, MIME 类型)，失败时抛出异常
+
+    gemini_config 为空时读取当前保存的配置；可在任意线程中调用。
+    use_cache 为 True 时先查生图缓存，命中则不调用接口（进度提示 CACHE_HIT_MESSAGE）；
+    refresh_cache 为 True 时跳过查询、重新生成并覆盖缓存。
+    cancelled 返回 True 时停止重试与等待，抛出 RetryCancelled。
+    """
+    if progress:
+        progress("正在初始化 Gemini 客户端...")
+    if gemini_config is None:
+        gemini_config = get_ai_config_manager().get_gemini_config()
+
+    base_url = (gemini_config.get("base_url") or "").strip()
+    api_key = (gemini_config.get("api_key") or "").strip()
+    model = (gemini_config.get("model") or "").strip() or DEFAULT_GEMINI_IMAGE_MODEL
+
+    if not base_url or not api_key:
+        raise ValueError("请先在配置中填写 Gemini Base URL 和 API Key")
+
+    cache_key = None
+    if use_cache:
+        cache = get_image_cache()
+        cache_key = cache.make_key(prompt, image_paths, aspect_ratio, image_size, model)
+        if not refresh_cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                if progress:
+                    progress(CACHE_HIT_MESSAGE)
+                return cached
+
+    # 复用共享客户端；宽高比等参数按次传入，避免影响其他使用者
+    client = get_shared_client(
+        base_url=base_url,
+        api_key=api_key,
+        image_model=model,
+    )
+
+    def on_retry(attempt, delay, exc):
+        if progress:
+            progress(describe_retry(attempt, client.retry_scheduler.max_attempts, delay, exc))
+
+    if progress:
+        progress("正在生成图片...")
+    result = client.generate_image_bytes(
+        text=prompt,
+        images=image_paths if image_paths else None,
+        aspect_ratio=aspect_ratio,
+        image_size=image_size,
+        on_retry=on_retry,
+        cancelled=cancelled,
+    )
+    if result is None:
+        raise ValueError("未生成图片，请尝试调整提示词或参数")
+    if cache_key:
+        get_image_cache().put(
+            cache_key, result[0], result[1], {"model": model, "aspect_ratio": aspect_ratio, "image_size": image_size}
+        )
+    return result
+
+
 class GeminiImageThread(QThread):
-    """后台线程：调用 Gemini 接口生成图片"""
+    """后台线程：调用 Gemini 接口生成图片
+
+    image_ready 发出接口返回的原始图片字节（不解码、不重新编码），
+    对应的 MIME 类型保存在 mime_type 属性中。
+    """
 
     image_ready = pyqtSignal(bytes)
     error = pyqtSignal(str)
@@ -47,6 +130,8 @@ class GeminiImageThread(QThread):
         aspect_ratio: str,
         image_size: str,
         thinking_level: str,
+        use_cache: bool = False,
+        refresh_cache: bool = False,
     ):
         super().__init__()
         self.prompt = prompt
@@ -54,43 +139,23 @@ class GeminiImageThread(QThread):
         self.aspect_ratio = aspect_ratio
         self.image_size = image_size
         self.thinking_level = thinking_level
+        self.use_cache = use_cache
+        self.refresh_cache = refresh_cache
+        self.mime_type: Optional[str] = None
 
     def run(self):
         try:
-            self.progress.emit("正在初始化 Gemini 客户端...")
-            config_manager = AIConfigManager()
-            gemini_config = config_manager.get_gemini_config()
-
-            base_url = (gemini_config.get("base_url") or "").strip()
-            api_key = (gemini_config.get("api_key") or "").strip()
-            model = (gemini_config.get("model") or "gemini-3-pro-image-preview").strip() or "gemini-3-pro-image-preview"
-
-            if not base_url or not api_key:
-                self.error.emit("请先在配置中填写 Gemini Base URL 和 API Key")
-                return
-
-            client = GeminiClient(
-                base_url=base_url,
-                api_key=api_key,
-                image_model=model,
+            image_bytes, self.mime_type = request_gemini_image(
+                prompt=self.prompt,
+                image_paths=self.image_paths,
+                aspect_ratio=self.aspect_ratio,
+                image_size=self.image_size,
+                progress=self.progress.emit,
+                use_cache=self.use_cache,
+                refresh_cache=self.refresh_cache,
             )
-            client.set_aspect_ratio(self.aspect_ratio)
-            client.set_image_size(self.image_size)
-            client.set_thinking_level(self.thinking_level)
-
-            self.progress.emit("正在生成图片...")
-            image = client.generate_image(
-                text=self.prompt,
-                images=self.image_paths if self.image_paths else None,
-            )
-            if image is None:
-                self.error.emit("未生成图片，请尝试调整提示词或参数")
-                return
-
-            buffer = BytesIO()
-            image.save(buffer, format="PNG")
-            self.image_ready.emit(buffer.getvalue())
-        except Exception as exc:  # noqa: BLE001
+            self.image_ready.emit(image_bytes)
+        except Exception as exc:
             self.error.emit(str(exc))
 
 
@@ -101,7 +166,7 @@ class GeminiImageConfigDialog(QDialog):
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.config_manager = AIConfigManager()
+        self.config_manager = get_ai_config_manager()
         self._setup_ui()
         self._load_config()
 
@@ -270,11 +335,12 @@ class AIImageGenerateDialog(QDialog):
 
     def __init__(self, default_prompt: str, parent=None):
         super().__init__(parent)
-        self.config_manager = AIConfigManager()
+        self.config_manager = get_ai_config_manager()
         self.selected_images: List[str] = []
         self.generated_image_bytes: Optional[bytes] = None
         self.generated_pixmap: Optional[QPixmap] = None
         self.worker_thread: Optional[GeminiImageThread] = None
+        self.save_thread: Optional[ImageSaveThread] = None
         self.prompt_text = (default_prompt or "").strip()
 
         self._setup_ui()
@@ -455,6 +521,13 @@ class AIImageGenerateDialog(QDialog):
         self.thinking_combo = thinking_container.findChild(QComboBox)
         param_layout.addWidget(thinking_container)
 
+        # 生图缓存（默认关闭）：相同请求直接返回上次的结果，不再调用接口
+        self.cache_checkbox = QCheckBox("使用缓存（相同请求不重复调用接口）")
+        self.cache_checkbox.setStyleSheet("font-size: 13px; color: #595959;")
+        self.cache_checkbox.setChecked(self.config_manager.is_image_cache_enabled())
+        self.cache_checkbox.toggled.connect(self.config_manager.set_image_cache_enabled)
+        param_layout.addWidget(self.cache_checkbox)
+
         left_layout.addWidget(param_frame)
 
         # 参考图片区
@@ -488,6 +561,7 @@ class AIImageGenerateDialog(QDialog):
         self.image_list.setMinimumHeight(150)
         self.image_list.setViewMode(QListWidget.ViewMode.IconMode)
         self.image_list.setIconSize(QPixmap(120, 120).size())
+        self._thumbnail_loader = ThumbnailLoader(self.image_list)
         self.image_list.setResizeMode(QListWidget.ResizeMode.Adjust)
         self.image_list.setSpacing(10)
         self.image_list.setWordWrap(True)
@@ -617,9 +691,16 @@ class AIImageGenerateDialog(QDialog):
                 background-color: #d9d9d9;
             }
         """)
-        self.generate_btn.clicked.connect(self._on_generate_clicked)
+        self.generate_btn.clicked.connect(lambda: self._on_generate_clicked())
         footer_layout.addWidget(self.generate_btn)
 
+        # 跳过缓存重新生成，并用新结果覆盖缓存
+        self.regenerate_btn = QPushButton("重新生成")
+        self.regenerate_btn.setStyleSheet(button_style)
+        self.regenerate_btn.setToolTip("忽略缓存，重新调用接口生成")
+        self.regenerate_btn.clicked.connect(lambda: self._on_generate_clicked(refresh_cache=True))
+        footer_layout.addWidget(self.regenerate_btn)
+
         close_btn = QPushButton("关闭")
         close_btn.setStyleSheet(button_style)
         close_btn.clicked.connect(self._handle_close_clicked)
@@ -689,29 +770,8 @@ class AIImageGenerateDialog(QDialog):
                 self._append_image_item(path)
 
     def _append_image_item(self, path: str):
-        # 加载图片并创建缩略图
-        pixmap = QPixmap(path)
-        if not pixmap.isNull():
-            # 创建 120x120 的缩略图，保持宽高比
-            thumbnail = pixmap.scaled(
-                120, 120,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            icon = QIcon(thumbnail)
-            item = QListWidgetItem(self.image_list)
-            item.setIcon(icon)
-            item.setText(os.path.basename(path))
-            item.setToolTip(path)
-            item.setData(Qt.ItemDataRole.UserRole, path)
-            # 设置文本居中显示在图标下方
-            item.setTextAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignBottom)
-        else:
-            # 如果图片加载失败，仍然添加一个文本项
-            item = QListWidgetItem(os.path.basename(path))
-            item.setToolTip(f"{path} (加载失败)")
-            item.setData(Qt.ItemDataRole.UserRole, path)
-            self.image_list.addItem(item)
+        # 缩略图在后台线程中解码，列表项先行添加
+        self._thumbnail_loader.add_item(path)
 
     def _remove_selected_images(self):
         for item in self.image_list.selectedItems():
@@ -724,7 +784,7 @@ class AIImageGenerateDialog(QDialog):
         self.selected_images.clear()
         self.image_list.clear()
 
-    def _on_generate_clicked(self):
+    def _on_generate_clicked(self, refresh_cache: bool = False):
         if self.worker_thread and self.worker_thread.isRunning():
             QMessageBox.information(self, "提示", "已有任务进行中，请稍候")
             return
@@ -760,6 +820,8 @@ class AIImageGenerateDialog(QDialog):
             aspect_ratio=self.aspect_combo.currentText(),
             image_size=self.size_combo.currentText(),
             thinking_level=self.thinking_combo.currentText(),
+            use_cache=self.cache_checkbox.isChecked(),
+            refresh_cache=refresh_cache,
         )
         self.worker_thread.progress.connect(lambda msg: self._set_status(f"⏳ {msg}", "#1890ff"))
         self.worker_thread.image_ready.connect(self._on_image_ready)
@@ -792,27 +854,40 @@ class AIImageGenerateDialog(QDialog):
         self.remove_image_btn.setEnabled(not generating)
         self.clear_image_btn.setEnabled(not generating)
         self.generate_btn.setEnabled(not generating)
+        self.regenerate_btn.setEnabled(not generating)
 
     def _save_image(self):
         if not self.generated_image_bytes:
             return
+        if self.save_thread and self.save_thread.isRunning():
+            return
 
         file_path, _ = QFileDialog.getSaveFileName(
             self,
             "另存为",
-            "generated.png",
-            "PNG 图片 (*.png);;JPEG 图片 (*.jpg *.jpeg)"
+            default_save_name(self.generated_image_bytes),
+            save_file_filter(self.generated_image_bytes),
         )
         if not file_path:
             return
 
-        suffix = os.path.splitext(file_path)[1].lower()
-        format_name = "PNG" if suffix in ("", ".png") else "JPEG"
-        image = QImage.fromData(self.generated_image_bytes)
-        if not image.save(file_path, format_name):
-            QMessageBox.critical(self, "错误", "保存图片失败，请重试")
-        else:
-            self._set_status(f"图片已保存到 {file_path}", "#52c41a")
+        self.save_btn.setEnabled(False)
+        self.save_thread = ImageSaveThread(self.generated_image_bytes, file_path)
+        self.save_thread.progress.connect(
+            lambda percent: self._set_status(f"⏳ 正在保存图片... {percent}%", "#1890ff")
+        )
+        self.save_thread.saved.connect(lambda path: self._set_status(f"图片已保存到 {path}", "#52c41a"))
+        self.save_thread.error.connect(self._on_save_error)
+        self.save_thread.finished.connect(self._on_save_thread_finished)
+        self.save_thread.start()
+
+    def _on_save_error(self, message: str):
+        self._set_status("保存图片失败", "#ff4d4f")
+        QMessageBox.critical(self, "错误", f"保存图片失败，请重试\n{message}")
+
+    def _on_save_thread_finished(self):
+        self.save_thread = None
+        self.save_btn.setEnabled(bool(self.generated_image_bytes))
 
     def _set_status(self, text: str, color: str = "#757575"):
         self.status_label.setText(text)
@@ -845,3 +920,9 @@ class AIImageGenerateDialog(QDialog):
             event.ignore()
             return
         super().closeEvent(event)
+
+    def reject(self):
+        # 等待图片保存完成，避免对话框销毁时线程仍在写文件
+        if self.save_thread and self.save_thread.isRunning():
+            self.save_thread.wait()
+        super().reject()
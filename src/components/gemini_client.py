@@ -7,6 +7,19 @@ Gemini AI 客户端封装模块
 核心类：
     GeminiClient - Gemini客户端管理类
 
+延迟导入：
+    google-genai（约 0.6~0.8 秒）和 Pillow 在首次创建客户端或解码图片时才导入，
+    ASPECT_RATIO_LIST 等常量无需加载 SDK 即可使用；warm_up() 可在界面显示后
+    于后台线程中提前导入，使第一次生成时不再等待。
+
+共享客户端：
+    get_shared_client() 按 (base_url, api_key, model) 复用 GeminiClient，
+    避免每次生成都重新创建连接池和 TLS 握手。
+
+重试与限流：
+    所有 generate_content 调用都经过 utils.retry 的共享调度器：按 API 地址的
+    令牌桶限流，遇到 429 / 5xx / 连接错误时按 Retry-After 或指数退避重试。
+
 使用示例：
     from gemini_client import GeminiClient
     
@@ -20,6 +33,9 @@ Gemini AI 客户端封装模块
     image = client.generate_image("画一只柴犬")
     image.save("output.png")
     
+    # 直接获取接口返回的原始图片数据（不解码、不重新编码）
+    image_bytes, mime_type = client.generate_image_bytes("画一只柴犬")
+    
     # 图片编辑
     image = client.generate_image("把水果换成香蕉", images=["input.jpg"])
     image.save("edited.png")
@@ -27,13 +43,19 @@ Gemini AI 客户端封装模块
 
 import os
 import base64
+import threading
+from collections import OrderedDict
 from io import BytesIO
-from typing import List, Union, Optional, Tuple
-from PIL import Image
+from typing import TYPE_CHECKING, Callable, List, Union, Optional, Tuple
 from loguru import logger
 
-from google import genai
-from google.genai import types
+from utils.image_format import IMAGE_FORMATS, sniff_image_format
+from utils.image_prep import describe_savings, get_image_prep_settings, get_prepared_image_cache
+from utils.retry import RetryScheduler, get_retry_scheduler
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from google.genai import types
 
 os.environ['NO_PROXY'] = '*'
 os.environ['HTTP_PROXY'] = ''
@@ -43,6 +65,28 @@ ASPECT_RATIO_LIST = ["1:1", "2:3", "3:2", "3:4", "4:3", "4:5", "5:4", "9:16", "1
 IMAGE_SIZE_LIST = ["1K", "2K", "4K"]
 THINKING_LEVEL_LIST = ["none", "low", "medium", "high"]
 
+# 共享客户端注册表最多保留的客户端数量
+SHARED_CLIENT_LIMIT = 4
+
+
+def _load_genai():
+    """导入 google-genai，返回 (genai, types)；模块已加载时只是一次字典查找"""
+    from google import genai
+    from google.genai import types
+    return genai, types
+
+
+def warm_up():
+    """在后台线程中预先导入 google-genai 和 Pillow，导入失败时留到实际使用时再报错"""
+    def _import():
+        try:
+            _load_genai()
+            from PIL import Image  # noqa: F401
+        except Exception as e:
+            logger.warning(f"[GeminiClient] 预加载 SDK 失败: {e}")
+
+    threading.Thread(target=_import, name="gemini-warm-up", daemon=True).start()
+
 
 class GeminiClient:
     """Gemini AI 客户端封装类"""
@@ -52,7 +96,9 @@ class GeminiClient:
         base_url: str,
         api_key: str,
         text_model: str = "gemini-3-pro-preview",
-        image_model: str = "gemini-3-pro-image-preview"
+        image_model: str = "gemini-3-pro-image-preview",
+        retry_scheduler: Optional[RetryScheduler] = None,
+        http_pool: Optional[dict] = None
     ):
         """
         初始化 Gemini 客户端
@@ -62,25 +108,51 @@ class GeminiClient:
             api_key: API 密钥
             text_model: 文本模型名称（用于对话，可识图）
             image_model: 图片生成模型名称
+            retry_scheduler: 重试与限流调度器（可选，默认使用进程内共享的调度器）
+            http_pool: HTTP 连接池配置（可选，键同 AIConfigManager.HTTP_POOL_DEFAULTS，默认读取 AI 配置）
         """
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
         self.text_model = text_model
         self.image_model = image_model
+        self.retry_scheduler = retry_scheduler or get_retry_scheduler()
         
         # 图片生成配置
         self.aspect_ratio = "1:1"
         self.image_size = "2K"
         self.thinking_level = "low"
         
-        # 初始化客户端
+        # 初始化客户端（长保活连接池，供多次生成复用；生成间隔常在 30~90 秒，保活时间需长于默认的 5 秒）
+        if http_pool is None:
+            from utils.ai_config import get_ai_config_manager
+            http_pool = get_ai_config_manager().get_http_pool_config()
+        import httpx
+        genai, types = _load_genai()
         self.client = genai.Client(
-            http_options=types.HttpOptions(base_url=self.base_url),
+            http_options=types.HttpOptions(
+                base_url=self.base_url,
+                client_args={
+                    "limits": httpx.Limits(
+                        max_connections=http_pool["http_max_connections"],
+                        max_keepalive_connections=http_pool["http_max_keepalive_connections"],
+                        keepalive_expiry=http_pool["http_keepalive_expiry"],
+                    ),
+                },
+            ),
             api_key=self.api_key
         )
         
         logger.info(f"[GeminiClient] 初始化完成，API地址: {self.base_url}")
     
+    def close(self):
+        """关闭底层 HTTP 连接"""
+        close = getattr(self.client, "close", None)
+        if close:
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"[GeminiClient] 关闭客户端失败: {e}")
+    
     def set_aspect_ratio(self, aspect_ratio: str) -> "GeminiClient":
         """设置图片宽高比"""
         if aspect_ratio not in ASPECT_RATIO_LIST:
@@ -103,33 +175,33 @@ class GeminiClient:
         return self
     
     @staticmethod
-    def _get_mime_type(file_path: str) -> str:
-        """根据文件扩展名获取 MIME 类型"""
-        ext = os.path.splitext(file_path)[1].lower()
-        mime_types = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp',
-            '.bmp': 'image/bmp'
-        }
-        return mime_types.get(ext, 'image/jpeg')
-    
-    @staticmethod
-    def _load_image_as_base64(image_path: str) -> Tuple[str, str]:
+    def _extract_image_bytes(response) -> Optional[Tuple[bytes, str]]:
         """
-        读取图片文件并转为 base64
+        从响应中取出第一张图片的原始数据
         
         Returns:
-            (mime_type, base64_data) 元组
+            (image_bytes, mime_type) 元组，响应中没有图片时返回 None
         """
-        mime_type = GeminiClient._get_mime_type(image_path)
-        with open(image_path, 'rb') as f:
-            base64_data = base64.b64encode(f.read()).decode('utf-8')
-        return mime_type, base64_data
+        image_parts = [part for part in (response.parts or []) if part.inline_data]
+        if not image_parts:
+            return None
+        inline_data = image_parts[0].inline_data
+        # data 可能是 bytes 或 base64 字符串
+        data = inline_data.data
+        if isinstance(data, bytes):
+            image_bytes = data
+        elif isinstance(data, str):
+            image_bytes = base64.b64decode(data)
+        else:
+            # 尝试直接转 bytes
+            image_bytes = bytes(data)
+        mime_type = inline_data.mime_type
+        if not mime_type:
+            sniffed = sniff_image_format(image_bytes)
+            mime_type = IMAGE_FORMATS[sniffed][1] if sniffed else "image/png"
+        return image_bytes, mime_type
     
-    def _build_parts(self, text: str, images: Optional[List[str]] = None) -> List[types.Part]:
+    def _build_parts(self, text: str, images: Optional[List[str]] = None) -> List["types.Part"]:
         """
         构建请求的 parts 列表
         
@@ -140,13 +212,20 @@ class GeminiClient:
         Returns:
             types.Part 列表
         """
+        _, types = _load_genai()
         parts = [types.Part(text=text)]
         
         if images:
+            prep_settings = None
+            prepared_files = []
             for img in images:
                 if os.path.isfile(img):
-                    # 本地文件
-                    mime_type, base64_data = self._load_image_as_base64(img)
+                    # 本地文件：上传前按配置缩小并重新压缩（结果在多次请求间共享缓存）
+                    prep_settings = prep_settings or get_image_prep_settings()
+                    prepared = get_prepared_image_cache().get(img, prep_settings)
+                    prepared_files.append(prepared)
+                    mime_type = prepared.mime_type
+                    base64_data = prepared.base64
                 else:
                     # 假设是 base64 字符串
                     mime_type = "image/jpeg"
@@ -158,9 +237,22 @@ class GeminiClient:
                         data=base64_data
                     )
                 ))
+            if prepared_files:
+                logger.info(f"[GeminiClient] {describe_savings(prepared_files)}")
         
         return parts
     
+    def _generate_content(
+        self,
+        on_retry: Optional[Callable[[int, float, Exception], None]] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+        **kwargs
+    ):
+        """调用 generate_content，限流 (429) 与临时错误按调度器的策略退避重试"""
+        return self.retry_scheduler.call(
+            self.base_url, self.client.models.generate_content, on_retry=on_retry, cancelled=cancelled, **kwargs
+        )
+    
     def chat(
         self,
         text: str,
@@ -187,9 +279,10 @@ class GeminiClient:
         """
         model = model or self.text_model
         parts = self._build_parts(text, images)
+        _, types = _load_genai()
         
         try:
-            response = self.client.models.generate_content(
+            response = self._generate_content(
                 model=model,
                 contents=[types.Content(parts=parts)],
                 config=types.GenerateContentConfig(
@@ -201,67 +294,58 @@ class GeminiClient:
             logger.error(f"[GeminiClient] chat 调用失败: {e}")
             raise
     
-    def generate_image(
+    def generate_image_bytes(
         self,
         text: str,
         images: Optional[List[str]] = None,
-        model: Optional[str] = None
-    ) -> Optional[Image.Image]:
+        model: Optional[str] = None,
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        on_retry: Optional[Callable[[int, float, Exception], None]] = None,
+        cancelled: Optional[Callable[[], bool]] = None
+    ) -> Optional[Tuple[bytes, str]]:
         """
-        图片生成模式（传入文本和可选图片，返回生成的图片）
+        图片生成模式，返回接口给出的原始图片数据
         
-        Args:
-            text: 文本提示（描述要生成或编辑的图片）
-            images: 输入图片列表（可选），用于图片编辑场景
-            model: 指定模型（可选，默认使用 image_model）
+        与 generate_image 参数相同，但不解码图片，适合直接显示或写入文件的场景。
+        on_retry 在每次退避重试前被调用，参数为 (下一次尝试序号, 等待秒数, 异常)；
+        cancelled 返回 True 时不再重试，限流/退避等待中抛出 RetryCancelled（已发出的请求无法中断）。
         
         Returns:
-            PIL.Image.Image 对象，如果没有生成图片则返回 None
+            (image_bytes, mime_type) 元组，如果没有生成图片则返回 None
         
         Examples:
-            >>> # 纯文本生成图片
-            >>> image = client.generate_image("画一只可爱的柴犬")
-            >>> image.save("dog.png")
-            
-            >>> # 图片编辑
-            >>> image = client.generate_image("把水果换成香蕉", images=["fruit.jpg"])
-            >>> image.save("edited.png")
+            >>> result = client.generate_image_bytes("画一只可爱的柴犬")
+            >>> if result:
+            ...     image_bytes, mime_type = result
         """
         model = model or self.image_model
+        aspect_ratio = aspect_ratio or self.aspect_ratio
+        image_size = image_size or self.image_size
+        if aspect_ratio not in ASPECT_RATIO_LIST:
+            raise ValueError(f"宽高比不支持: {aspect_ratio}，可选: {ASPECT_RATIO_LIST}")
+        if image_size not in IMAGE_SIZE_LIST:
+            raise ValueError(f"图片尺寸不支持: {image_size}，可选: {IMAGE_SIZE_LIST}")
         parts = self._build_parts(text, images)
+        _, types = _load_genai()
         
         try:
-            response = self.client.models.generate_content(
+            response = self._generate_content(
+                on_retry=on_retry,
+                cancelled=cancelled,
                 model=model,
                 contents=[types.Content(parts=parts)],
                 config=types.GenerateContentConfig(
                     image_config=types.ImageConfig(
-                        aspect_ratio=self.aspect_ratio,
-                        image_size=self.image_size
+                        aspect_ratio=aspect_ratio,
+                        image_size=image_size
                     )
                 )
             )
             
-            # 提取图片
-            image_parts = [part for part in response.parts if part.inline_data]
-            if image_parts:
-                # 从 inline_data 创建 PIL Image
-                inline_data = image_parts[0].inline_data
-                # logger.debug(f"inline_data type: {type(inline_data)}")
-                # logger.debug(f"inline_data.data type: {type(inline_data.data)}")
-                # logger.debug(f"inline_data.data[:50]: {inline_data.data[:50] if inline_data.data else None}")
-                # logger.debug(f"inline_data.mime_type: {inline_data.mime_type}")
-                
-                # data 可能是 bytes 或 base64 字符串
-                data = inline_data.data
-                if isinstance(data, bytes):
-                    image_bytes = data
-                elif isinstance(data, str):
-                    image_bytes = base64.b64decode(data)
-                else:
-                    # 尝试直接转 bytes
-                    image_bytes = bytes(data)
-                return Image.open(BytesIO(image_bytes))
+            result = self._extract_image_bytes(response)
+            if result:
+                return result
             
             # 没有图片，可能返回了文本
             if response.text:
@@ -269,15 +353,57 @@ class GeminiClient:
             return None
             
         except Exception as e:
-            logger.error(f"[GeminiClient] generate_image 调用失败: {e}")
+            logger.error(f"[GeminiClient] generate_image_bytes 调用失败: {e}")
             raise
     
+    def generate_image(
+        self,
+        text: str,
+        images: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None
+    ) -> Optional["Image.Image"]:
+        """
+        图片生成模式（传入文本和可选图片，返回生成的图片）
+        
+        Args:
+            text: 文本提示（描述要生成或编辑的图片）
+            images: 输入图片列表（可选），用于图片编辑场景
+            model: 指定模型（可选，默认使用 image_model）
+            aspect_ratio: 本次请求的宽高比（可选，默认使用 set_aspect_ratio 的值）
+            image_size: 本次请求的图片尺寸（可选，默认使用 set_image_size 的值）
+        
+        Returns:
+            PIL.Image.Image 对象，如果没有生成图片则返回 None
+        
+        Examples:
+            >>> # 纯文本生成图片
+            >>> image = client.generate_image("画一只可爱的柴犬")
+            >>> image.save("dog.png")
+            
+            >>> # 图片编辑
+            >>> image = client.generate_image("把水果换成香蕉", images=["fruit.jpg"])
+            >>> image.save("edited.png")
+        """
+        result = self.generate_image_bytes(
+            text,
+            images=images,
+            model=model,
+            aspect_ratio=aspect_ratio,
+            image_size=image_size,
+        )
+        if result is None:
+            return None
+        from PIL import Image
+        return Image.open(BytesIO(result[0]))
+    
     def generate_image_with_text(
         self,
         text: str,
         images: Optional[List[str]] = None,
         model: Optional[str] = None
-    ) -> Tuple[Optional[Image.Image], str]:
+    ) -> Tuple[Optional["Image.Image"], str]:
         """
         图片生成模式，同时返回图片和可能的文本响应
         
@@ -291,9 +417,10 @@ class GeminiClient:
         """
         model = model or self.image_model
         parts = self._build_parts(text, images)
+        _, types = _load_genai()
         
         try:
-            response = self.client.models.generate_content(
+            response = self._generate_content(
                 model=model,
                 contents=[types.Content(parts=parts)],
                 config=types.GenerateContentConfig(
@@ -305,16 +432,9 @@ class GeminiClient:
             )
             
             # 提取图片
-            image_parts = [part for part in response.parts if part.inline_data]
-            if image_parts:
-                inline_data = image_parts[0].inline_data
-                if isinstance(inline_data.data, bytes):
-                    image_bytes = inline_data.data
-                else:
-                    image_bytes = base64.b64decode(inline_data.data)
-                image = Image.open(BytesIO(image_bytes))
-            else:
-                image = None
+            result = self._extract_image_bytes(response)
+            from PIL import Image
+            image = Image.open(BytesIO(result[0])) if result else None
             
             # 提取文本
             text_response = response.text or ""
@@ -326,3 +446,43 @@ class GeminiClient:
             raise
 
 
+# ========== 共享客户端注册表 ==========
+
+_shared_clients: "OrderedDict[Tuple[str, str, str], GeminiClient]" = OrderedDict()
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(
+    base_url: str,
+    api_key: str,
+    image_model: str = "gemini-3-pro-image-preview"
+) -> GeminiClient:
+    """
+    获取进程内共享的 GeminiClient
+    
+    以 (base_url, api_key, image_model) 为键复用客户端及其连接池；
+    配置变化时键随之变化，自然会创建新的客户端，旧客户端按最近使用顺序移出注册表。
+    移出时不主动关闭：其他线程可能仍在用它发请求，连接在客户端被回收时释放。
+    共享客户端上的 set_* 方法会影响所有使用者，单次请求的参数请通过
+    generate_image 的关键字参数传入。
+    """
+    key = (base_url.rstrip('/'), api_key, image_model)
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is not None:
+            _shared_clients.move_to_end(key)
+            return client
+        client = GeminiClient(base_url=base_url, api_key=api_key, image_model=image_model)
+        _shared_clients[key] = client
+        while len(_shared_clients) > SHARED_CLIENT_LIMIT:
+            _shared_clients.popitem(last=False)
+    return client
+
+
+def close_shared_clients():
+    """关闭并清空所有共享客户端（应用退出时调用）"""
+    with _shared_clients_lock:
+        clients = list(_shared_clients.values())
+        _shared_clients.clear()
+    for client in clients:
+        client.close()
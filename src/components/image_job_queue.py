@@ -0,0 +1,299 @@
+"""生图任务队列：多个任务在有限大小的线程池中并发执行"""
+import time
+import itertools
+import threading
+from collections import deque
+from typing import List, Optional
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from components.ai_image_dialog import CACHE_HIT_MESSAGE, request_gemini_image
+from utils.retry import RetryCancelled
+
+
+# 任务状态
+JOB_PENDING = "排队中"
+JOB_RUNNING = "生成中"
+JOB_DONE = "完成"
+JOB_FAILED = "失败"
+JOB_CANCELLED = "已取消"
+
+# 退出时等待执行中任务结束的最长时间（毫秒）
+SHUTDOWN_WAIT_MS = 2000
+
+# 最多保留的已结束任务数，更早的任务连同图片字节一起移除，避免长时间使用后内存持续增长
+MAX_FINISHED_JOBS = 20
+
+
+class ImageJob:
+    """一次生图任务及其结果"""
+
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        prompt: str,
+        image_paths: List[str],
+        aspect_ratio: str,
+        image_size: str,
+        gemini_config: dict,
+        use_cache: bool = False,
+        refresh_cache: bool = False,
+    ):
+        self.id = next(self._ids)
+        self.prompt = prompt
+        # 复制一份，避免界面上增删参考图影响排队中的任务
+        self.image_paths = list(image_paths)
+        self.aspect_ratio = aspect_ratio
+        self.image_size = image_size
+        self.gemini_config = dict(gemini_config)
+        self.endpoint = (gemini_config.get("base_url") or "").strip().rstrip("/")
+        self.use_cache = use_cache
+        self.refresh_cache = refresh_cache
+        self.from_cache = False
+        # 执行中的任务被取消时置位，停止后续重试与退避等待
+        self.cancel_event = threading.Event()
+        self.status = JOB_PENDING
+        self.message = ""
+        self.image_bytes: Optional[bytes] = None
+        self.mime_type: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        """执行耗时（秒），未开始时为 None"""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+
+class _JobSignals(QObject):
+    """QRunnable 不能直接定义信号，借助 QObject 把结果送回界面线程"""
+
+    progress = pyqtSignal(int, str)
+    succeeded = pyqtSignal(int, bytes, str)
+    failed = pyqtSignal(int, str)
+
+
+class _JobRunnable(QRunnable):
+    """在线程池中执行单个任务"""
+
+    def __init__(self, job: ImageJob, signals: _JobSignals):
+        super().__init__()
+        self.job = job
+        self.signals = signals
+
+    def run(self):
+        job = self.job
+        # 排队期间或开始前被取消时不再发出请求
+        if job.cancel_event.is_set():
+            self.signals.failed.emit(job.id, JOB_CANCELLED)
+            return
+
+        def report(message: str):
+            if message == CACHE_HIT_MESSAGE:
+                job.from_cache = True
+            self.signals.progress.emit(job.id, message)
+
+        try:
+            image_bytes, mime_type = request_gemini_image(
+                prompt=job.prompt,
+                image_paths=job.image_paths,
+                aspect_ratio=job.aspect_ratio,
+                image_size=job.image_size,
+                gemini_config=job.gemini_config,
+                progress=report,
+                use_cache=job.use_cache,
+                refresh_cache=job.refresh_cache,
+                cancelled=job.cancel_event.is_set,
+            )
+            self.signals.succeeded.emit(job.id, image_bytes, mime_type)
+        except RetryCancelled:
+            self.signals.failed.emit(job.id, JOB_CANCELLED)
+        except Exception as exc:
+            self.signals.failed.emit(job.id, str(exc))
+
+
+class ImageJobQueue(QObject):
+    """生图任务队列
+
+    任务按提交顺序调度：总并发不超过 max_workers，同一 API 地址的并发不超过
+    max_per_endpoint，其余任务排队等待。调度与状态更新都在界面线程中进行，
+    任务状态变化通过 job_updated 信号通知。
+    """
+
+    job_added = pyqtSignal(object)  # ImageJob
+    job_updated = pyqtSignal(object)  # ImageJob
+    job_removed = pyqtSignal(int)  # 超出 MAX_FINISHED_JOBS 被自动移除的任务 id
+
+    def __init__(self, max_workers: int = 3, max_per_endpoint: int = 2, max_finished: int = MAX_FINISHED_JOBS, parent=None):
+        super().__init__(parent)
+        self.max_workers = max(1, max_workers)
+        self.max_per_endpoint = max(1, max_per_endpoint)
+        self.max_finished = max(1, max_finished)
+        self.jobs: dict[int, ImageJob] = {}
+        self._pending: deque = deque()
+        self._finished: deque = deque()  # 已结束任务的 id，按结束顺序
+        self._running_per_endpoint: dict[str, int] = {}
+        self._running = 0
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(self.max_workers)
+
+        self._signals = _JobSignals()
+        self._signals.progress.connect(self._on_job_progress)
+        self._signals.succeeded.connect(self._on_job_succeeded)
+        self._signals.failed.connect(self._on_job_failed)
+
+    # ========== 提交与取消 ==========
+
+    def submit(
+        self,
+        prompt: str,
+        image_paths: List[str],
+        aspect_ratio: str,
+        image_size: str,
+        gemini_config: dict,
+        use_cache: bool = False,
+        refresh_cache: bool = False,
+    ) -> ImageJob:
+        """提交一个任务，返回任务对象"""
+        job = ImageJob(prompt, image_paths, aspect_ratio, image_size, gemini_config, use_cache, refresh_cache)
+        self.jobs[job.id] = job
+        self._pending.append(job)
+        self.job_added.emit(job)
+        self._dispatch()
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """取消任务
+
+        排队中的任务立即取消；执行中的任务置位 cancel_event，不再重试、退避等待立即结束，
+        已发出的请求返回后结果被丢弃，任务随后标记为已取消。
+        """
+        job = self.jobs.get(job_id)
+        if not job:
+            return False
+        if job.status == JOB_PENDING:
+            self._pending.remove(job)
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+            self.job_updated.emit(job)
+            self._track_finished(job)
+            return True
+        if job.status == JOB_RUNNING and not job.cancel_event.is_set():
+            job.cancel_event.set()
+            job.message = "正在取消..."
+            self.job_updated.emit(job)
+            return True
+        return False
+
+    def cancel_pending(self):
+        """取消所有排队中的任务"""
+        for job in list(self._pending):
+            self.cancel(job.id)
+
+    def remove_finished(self) -> List[int]:
+        """移除已结束的任务，返回被移除的任务 id"""
+        removed = [job_id for job_id, job in self.jobs.items() if job.is_finished]
+        for job_id in removed:
+            del self.jobs[job_id]
+        self._finished.clear()
+        return removed
+
+    def _track_finished(self, job: ImageJob):
+        """记录已结束的任务，超出 max_finished 时移除最早结束的任务"""
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished:
+            job_id = self._finished.popleft()
+            if self.jobs.pop(job_id, None) is not None:
+                self.job_removed.emit(job_id)
+
+    @property
+    def active_count(self) -> int:
+        """排队中与执行中的任务数"""
+        return len(self._pending) + self._running
+
+    # ========== 调度 ==========
+
+    def _dispatch(self):
+        """按顺序启动满足并发限制的排队任务"""
+        if self._running >= self.max_workers:
+            return
+        for job in list(self._pending):
+            if self._running >= self.max_workers:
+                break
+            if self._running_per_endpoint.get(job.endpoint, 0) >= self.max_per_endpoint:
+                continue
+            self._pending.remove(job)
+            self._running += 1
+            self._running_per_endpoint[job.endpoint] = self._running_per_endpoint.get(job.endpoint, 0) + 1
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self.job_updated.emit(job)
+            self._pool.start(_JobRunnable(job, self._signals))
+
+    def _release(self, job: ImageJob):
+        self._running -= 1
+        count = self._running_per_endpoint.get(job.endpoint, 1) - 1
+        if count > 0:
+            self._running_per_endpoint[job.endpoint] = count
+        else:
+            self._running_per_endpoint.pop(job.endpoint, None)
+        job.finished_at = time.time()
+
+    def _on_job_progress(self, job_id: int, message: str):
+        job = self.jobs.get(job_id)
+        if job and job.status == JOB_RUNNING and not job.cancel_event.is_set():
+            job.message = message
+            self.job_updated.emit(job)
+
+    def _on_job_succeeded(self, job_id: int, image_bytes: bytes, mime_type: str):
+        job = self._finish(job_id)
+        if job:
+            if job.cancel_event.is_set():
+                job.status = JOB_CANCELLED
+            else:
+                job.status = JOB_DONE
+                job.image_bytes = image_bytes
+                job.mime_type = mime_type
+            self.job_updated.emit(job)
+            self._track_finished(job)
+        self._dispatch()
+
+    def _on_job_failed(self, job_id: int, message: str):
+        job = self._finish(job_id)
+        if job:
+            job.status = JOB_CANCELLED if job.cancel_event.is_set() else JOB_FAILED
+            job.error = message
+            self.job_updated.emit(job)
+            self._track_finished(job)
+        self._dispatch()
+
+    def _finish(self, job_id: int) -> Optional[ImageJob]:
+        """释放任务占用的并发名额"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        self._release(job)
+        return job
+
+    def shutdown(self, wait_ms: int = SHUTDOWN_WAIT_MS) -> bool:
+        """应用退出时调用：丢弃排队任务，取消执行中的任务，最多等待 wait_ms 毫秒
+
+        执行中的任务不再重试、退避等待立即结束；仍在等待接口响应的任务不再等待，
+        由 aboutToQuit 时关闭共享客户端使其请求尽快结束。返回是否所有任务都已结束。
+        """
+        self.cancel_pending()
+        self.max_workers = 0
+        for job in self.jobs.values():
+            if job.status == JOB_RUNNING:
+                job.cancel_event.set()
+        return self._pool.waitForDone(wait_ms)
@@ -0,0 +1,90 @@
+"""后台保存图片，避免在界面线程上解码/编码大图"""
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QThread, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from utils.atomic_write import atomic_write
+from utils.image_format import format_from_suffix, sniff_image_format, suffix_for_format
+
+
+# 另存为对话框的文件类型过滤器
+SAVE_FILE_FILTERS = {
+    "PNG": "PNG 图片 (*.png)",
+    "JPEG": "JPEG 图片 (*.jpg *.jpeg)",
+    "WEBP": "WEBP 图片 (*.webp)",
+}
+
+
+def default_save_name(image_bytes: bytes, stem: str = "generated") -> str:
+    """按原始数据的格式生成默认文件名，使默认保存无需重新编码"""
+    return stem + suffix_for_format(sniff_image_format(image_bytes) or "PNG")
+
+
+def save_file_filter(image_bytes: bytes) -> str:
+    """生成另存为对话框的过滤器，原始格式排在最前"""
+    source = sniff_image_format(image_bytes)
+    names = ["PNG", "JPEG"]
+    if source in SAVE_FILE_FILTERS and source not in names:
+        names.append(source)
+    if source in names:
+        names.remove(source)
+        names.insert(0, source)
+    return ";;".join(SAVE_FILE_FILTERS[name] for name in names)
+
+
+class ImageSaveThread(QThread):
+    """后台线程：保存图片
+
+    目标格式与原始数据格式一致时直接写入原始字节（不重新编码），
+    否则解码后按目标格式重新编码。写入采用临时文件 + 重命名，失败不会留下半个文件。
+    """
+
+    progress = pyqtSignal(int)  # 0-100
+    saved = pyqtSignal(str)  # 保存路径
+    error = pyqtSignal(str)
+
+    def __init__(self, image_bytes: bytes, file_path: str, quality: int = -1):
+        super().__init__()
+        self.image_bytes = image_bytes
+        self.file_path = file_path
+        self.quality = quality
+        # 本次保存是否对图片重新编码
+        self.reencoded = False
+
+    def run(self):
+        try:
+            self.progress.emit(0)
+            target = format_from_suffix(self.file_path)
+            data = self.image_bytes
+            if sniff_image_format(data) != target:
+                data = self._reencode(target)
+                self.reencoded = True
+            self._write(data, 50 if self.reencoded else 0)
+            self.saved.emit(self.file_path)
+        except Exception as exc:
+            self.error.emit(str(exc))
+
+    def _reencode(self, target: str) -> bytes:
+        """解码并按目标格式重新编码"""
+        image = QImage.fromData(self.image_bytes)
+        if image.isNull():
+            raise ValueError("无法解码图片数据")
+        self.progress.emit(20)
+
+        byte_array = QByteArray()
+        buffer = QBuffer(byte_array)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        ok = image.save(buffer, target, self.quality)
+        buffer.close()
+        if not ok:
+            raise ValueError(f"编码 {target} 图片失败")
+        self.progress.emit(50)
+        return bytes(byte_array)
+
+    def _write(self, data: bytes, start: int):
+        """分块写入临时文件后重命名，进度从 start 走到 100"""
+        atomic_write(
+            self.file_path,
+            data,
+            progress=lambda done, total: self.progress.emit(start + (100 - start) * done // total),
+        )
+        self.progress.emit(100)
@@ -0,0 +1,220 @@
+"""参考图缩略图：在后台线程中按缩小尺寸解码，并缓存到磁盘"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QObject, QRunnable, Qt, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QIcon, QImage, QImageReader, QPixmap
+from PyQt6.QtWidgets import QListWidget, QListWidgetItem
+
+from utils.atomic_write import atomic_write
+from utils.resource_path import get_cache_dir
+
+
+# 缩略图最长边（像素）
+THUMBNAIL_SIZE = 120
+
+# 内存中保留的缩略图数量
+MEMORY_CACHE_LIMIT = 64
+
+# 缩略图解码线程数（与生图任务的线程池分开）
+THUMBNAIL_THREADS = 2
+
+# 磁盘缓存超过上限时删到上限的这个比例以下，避免之后每写一张都要扫描目录
+DISK_EVICT_TARGET_RATIO = 0.8
+
+_thread_pool: QThreadPool = None
+_memory_cache: "OrderedDict[str, QImage]" = OrderedDict()
+
+# 各缓存目录已知的磁盘占用（字节），首次写入时扫描目录得到，之后按写入累加
+_disk_usage: dict = {}
+_disk_max_bytes: int = None
+_disk_lock = threading.Lock()
+
+
+def _get_thread_pool() -> QThreadPool:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = QThreadPool()
+        _thread_pool.setMaxThreadCount(THUMBNAIL_THREADS)
+    return _thread_pool
+
+
+def thumbnail_cache_key(path: str, size: int = THUMBNAIL_SIZE) -> str:
+    """按 路径 + mtime + 文件大小 + 缩略图尺寸 计算缓存键，文件变化后自动失效"""
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{size}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _get_disk_max_bytes() -> int:
+    """磁盘缓存的占用上限，取自 AI 配置"""
+    global _disk_max_bytes
+    if _disk_max_bytes is None:
+        from utils.ai_config import get_ai_config_manager
+        config = get_ai_config_manager().get_thumbnail_cache_config()
+        _disk_max_bytes = int(config["thumbnail_cache_max_mb"] * 1024 * 1024)
+    return _disk_max_bytes
+
+
+def _evict_disk_cache(cache_dir: Path, max_bytes: int) -> int:
+    """总大小超过上限时从最久未使用（mtime 最早）的缩略图开始删除，返回剩余占用，调用方需持有锁"""
+    entries = []
+    for cache_path in cache_dir.glob("*.png"):
+        try:
+            stat = cache_path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, cache_path))
+    total = sum(entry[1] for entry in entries)
+    if total <= max_bytes:
+        return total
+    target = int(max_bytes * DISK_EVICT_TARGET_RATIO)
+    for _, size, cache_path in sorted(entries, key=lambda entry: entry[0]):
+        try:
+            cache_path.unlink()
+        except OSError:
+            continue
+        total -= size
+        if total <= target:
+            break
+    return total
+
+
+def _account_disk_write(cache_dir: Path, size: int):
+    """记录一次缓存写入，累计占用超过上限时淘汰旧缩略图"""
+    max_bytes = _get_disk_max_bytes()
+    with _disk_lock:
+        key = str(cache_dir)
+        usage = _disk_usage.get(key)
+        usage = _evict_disk_cache(cache_dir, max_bytes) if usage is None else usage + size
+        if usage > max_bytes:
+            usage = _evict_disk_cache(cache_dir, max_bytes)
+        _disk_usage[key] = usage
+
+
+def load_thumbnail(path: str, size: int = THUMBNAIL_SIZE, cache_dir: Path = None) -> QImage:
+    """读取（必要时生成）缩略图，失败时返回空 QImage；可在任意线程中调用"""
+    cache_dir = Path(cache_dir) if cache_dir else get_cache_dir() / "thumbnails"
+    try:
+        cache_path = cache_dir / f"{thumbnail_cache_key(path, size)}.png"
+    except OSError:
+        return QImage()
+
+    if cache_path.exists():
+        image = QImage(str(cache_path))
+        if not image.isNull():
+            try:
+                # 刷新最近使用时间，淘汰时按 mtime 从旧到新删除
+                os.utime(cache_path)
+            except OSError:
+                pass
+            return image
+
+    reader = QImageReader(path)
+    # 按 EXIF 方向旋转手机照片
+    reader.setAutoTransform(True)
+    source_size = reader.size()
+    if source_size.isValid():
+        # 只解码到目标尺寸，JPEG 等格式无需先解码整张大图
+        reader.setScaledSize(source_size.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return image
+    if max(image.width(), image.height()) > size:
+        image = image.scaled(
+            size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
+        )
+
+    try:
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        ok = image.save(buffer, "PNG")
+        buffer.close()
+        if ok:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write(cache_path, bytes(data))
+            _account_disk_write(cache_dir, data.size())
+    except Exception as e:
+        print(f"保存缩略图缓存失败: {e}")
+    return image
+
+
+class _ThumbnailSignals(QObject):
+    """QRunnable 不能直接定义信号，借助 QObject 把结果送回界面线程"""
+
+    loaded = pyqtSignal(str, str, QImage)  # 路径, 缓存键, 缩略图
+
+
+class _ThumbnailTask(QRunnable):
+    def __init__(self, path: str, key: str, signals: _ThumbnailSignals):
+        super().__init__()
+        self.path = path
+        self.key = key
+        self.signals = signals
+
+    def run(self):
+        image = load_thumbnail(self.path)
+        try:
+            self.signals.loaded.emit(self.path, self.key, image)
+        except RuntimeError:
+            # 列表所在的对话框已关闭
+            pass
+
+
+class ThumbnailLoader(QObject):
+    """为参考图列表异步填充缩略图
+
+    add_item 立即添加列表项，缩略图在后台线程中解码（或从磁盘缓存读取）后再设置图标，
+    添加多张大图时界面不会卡顿。
+    """
+
+    def __init__(self, list_widget: QListWidget):
+        super().__init__(list_widget)
+        self.list_widget = list_widget
+        self._signals = _ThumbnailSignals(self)
+        self._signals.loaded.connect(self._on_loaded)
+
+    def add_item(self, path: str) -> QListWidgetItem:
+        """添加一张图片，返回列表项"""
+        item = QListWidgetItem(self.list_widget)
+        item.setText(os.path.basename(path))
+        item.setToolTip(path)
+        item.setData(Qt.ItemDataRole.UserRole, path)
+        # 设置文本居中显示在图标下方
+        item.setTextAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignBottom)
+
+        try:
+            key = thumbnail_cache_key(path)
+        except OSError:
+            key = ""
+        image = _memory_cache.get(key)
+        if image is not None:
+            _memory_cache.move_to_end(key)
+            self._apply(path, image)
+        else:
+            _get_thread_pool().start(_ThumbnailTask(path, key, self._signals))
+        return item
+
+    def _on_loaded(self, path: str, key: str, image: QImage):
+        if key and not image.isNull():
+            _memory_cache[key] = image
+            _memory_cache.move_to_end(key)
+            while len(_memory_cache) > MEMORY_CACHE_LIMIT:
+                _memory_cache.popitem(last=False)
+        self._apply(path, image)
+
+    def _apply(self, path: str, image: QImage):
+        """给列表中对应的项设置图标；图片无法解码时在提示中标注"""
+        icon = QIcon(QPixmap.fromImage(image)) if not image.isNull() else None
+        for row in range(self.list_widget.count()):
+            item = self.list_widget.item(row)
+            if item.data(Qt.ItemDataRole.UserRole) != path:
+                continue
+            if icon is not None:
+                item.setIcon(icon)
+            else:
+                item.setToolTip(f"{path} (加载失败)")
@@ -4,18 +4,48 @@ AI绘画提示词可视化编辑工具
 
 使用方法:
     python main.py
+    python main.py --profile-startup[=路径]   # 记录启动时间线，默认写入 cache/startup_profile.json
 """
 import sys
 import os
+import time
+
+# 进程开始时间，用于统计从启动到主窗口首次绘制的耗时
+_START_TIME = time.perf_counter()
+
+# 冷启动目标（秒）：SDK 延迟导入后，主窗口应在此时间内显示
+STARTUP_TARGET_SECONDS = 1.0
 
 # 确保src目录在路径中
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from utils.resource_path import get_cache_dir
+from utils.startup_profiler import get_startup_profiler
+
+PROFILE_STARTUP_FLAG = "--profile-startup"
+
+
+def _parse_profile_startup_arg() -> str:
+    """从命令行取出 --profile-startup[=路径]，返回时间线保存路径（未指定时为空字符串）"""
+    for arg in sys.argv[1:]:
+        if arg == PROFILE_STARTUP_FLAG or arg.startswith(PROFILE_STARTUP_FLAG + "="):
+            sys.argv.remove(arg)
+            return arg.partition("=")[2] or str(get_cache_dir() / "startup_profile.json")
+    return ""
+
+
+# 需在导入界面模块之前开始记录，才能统计到各模块的导入耗时
+PROFILE_STARTUP_PATH = _parse_profile_startup_arg()
+if PROFILE_STARTUP_PATH:
+    get_startup_profiler().start(_START_TIME)
+
 from PyQt6.QtWidgets import QApplication, QStyleFactory
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont, QPalette, QColor
 
 from app import PromptGeneratorApp
+from components.gemini_client import close_shared_clients, warm_up
+from utils.ai_service import AIService
 
 
 def setup_light_palette(app: QApplication):
@@ -81,19 +111,40 @@ def setup_light_palette(app: QApplication):
     app.setPalette(palette)
 
 
+def on_first_paint():
+    """主窗口显示后：记录启动耗时，并在后台预加载生图 SDK"""
+    elapsed = time.perf_counter() - _START_TIME
+    if elapsed > STARTUP_TARGET_SECONDS:
+        print(f"启动耗时 {elapsed:.2f} 秒，超过目标 {STARTUP_TARGET_SECONDS:.1f} 秒")
+
+    profiler = get_startup_profiler()
+    if profiler.enabled:
+        profiler.mark("首次绘制", "paint")
+        summary = profiler.finish(
+            PROFILE_STARTUP_PATH,
+            meta={"app_version": QApplication.applicationVersion(), "target_ms": STARTUP_TARGET_SECONDS * 1000},
+        )
+        print(summary)
+        print(f"启动时间线已保存: {PROFILE_STARTUP_PATH}")
+    warm_up()
+
+
 def main():
+    profiler = get_startup_profiler()
     # 高DPI支持
     if hasattr(Qt, "AA_EnableHighDpiScaling"):
         QApplication.setAttribute(Qt.ApplicationAttribute.AA_EnableHighDpiScaling, True)
     if hasattr(Qt, "AA_UseHighDpiPixmaps"):
         QApplication.setAttribute(Qt.ApplicationAttribute.AA_UseHighDpiPixmaps, True)
 
-    app = QApplication(sys.argv)
+    with profiler.section("QApplication", "init"):
+        app = QApplication(sys.argv)
 
-    app.setStyle(QStyleFactory.create("Fusion"))
-    
-    # ===== 应用自定义浅色调色板 =====
-    setup_light_palette(app)
+    with profiler.section("Fusion 样式与调色板", "style"):
+        app.setStyle(QStyleFactory.create("Fusion"))
+
+        # ===== 应用自定义浅色调色板 =====
+        setup_light_palette(app)
 
     # 设置应用信息
     app.setApplicationName("Nano Banana 生图工具")
@@ -105,8 +156,17 @@ def main():
     app.setFont(font)
 
     # 创建并显示主窗口
-    window = PromptGeneratorApp()
-    window.show()
+    with profiler.section("PromptGeneratorApp", "init"):
+        window = PromptGeneratorApp()
+    with profiler.section("window.show", "paint"):
+        window.show()
+    # 事件循环处理完首次绘制后再执行
+    QTimer.singleShot(0, on_first_paint)
+
+    # 退出时写回未落盘的选项修改，并释放共享的 HTTP 连接
+    app.aboutToQuit.connect(window.yaml_handler.flush)
+    app.aboutToQuit.connect(close_shared_clients)
+    app.aboutToQuit.connect(AIService.close_client_pool)
 
     sys.exit(app.exec())
 
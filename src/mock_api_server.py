@@ -0,0 +1,371 @@
+"""
+Nano Banana 本地模拟 API 服务（离线压测 / 基准测试用）
+
+在本机模拟两类接口，返回固定的 JSON 提示词和图片：
+    - OpenAI 兼容的 chat/completions（AI 生成 / AI 修改对话框使用，支持 stream=true 的 SSE）
+    - Gemini 的 models/<model>:generateContent（GeminiClient 的对话与生图使用）
+可配置首字节延迟、流式输出速率、500 / 429 注入、按每分钟请求数限流、损坏 JSON 注入和返回图片尺寸，
+GET /stats 返回各类请求的计数。
+
+使用方法:
+    python mock_api_server.py --port 8765 --latency 0.5 --token-rate 40
+    python mock_api_server.py --error-rate 0.1 --rate-limit-rate 0.2 --retry-after 2
+
+然后把 AI 配置中的地址指向它：
+    OpenAI 兼容接口 Base URL: http://127.0.0.1:8765/v1
+    Gemini Base URL:          http://127.0.0.1:8765
+API Key 可以随意填写。
+"""
+import sys
+import os
+import json
+import math
+import time
+import random
+import base64
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Optional, Tuple
+
+# 确保src目录在路径中
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.prompt_builder import FIELD_PATHS, NEGATIVE_FIELDS, build_prompt_data
+
+
+# 生图尺寸档位对应的基准边长（宽高比 1:1 时的边长，其他比例保持面积不变）
+IMAGE_SIZE_BASE = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+# 生成的图片边长取整到该倍数
+IMAGE_DIM_STEP = 16
+
+# 429 / 5xx 对应的 Gemini 错误状态名
+GEMINI_ERROR_STATUS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="本地模拟 OpenAI 兼容接口与 Gemini 接口")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口（默认 8765）")
+    parser.add_argument("--latency", type=float, default=0.3, help="每个请求返回首字节前的延迟（秒）")
+    parser.add_argument("--image-latency", type=float, default=1.0, help="生图请求额外的处理时间（秒）")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="流式输出速率（块/秒，0 表示不限速）")
+    parser.add_argument("--token-chars", type=int, default=2, help="每个流式块包含的字符数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 500 的概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="随机返回 429 的概率")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应中 Retry-After 的秒数（0 表示不返回）")
+    parser.add_argument("--rpm", type=int, default=0, help="每分钟最多接受的请求数，超出返回 429（0 表示不限制）")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="返回损坏 JSON 提示词的概率")
+    parser.add_argument("--image-size", default="", help="固定返回图片的像素尺寸，如 1024x1024（默认按请求的宽高比和尺寸计算）")
+    parser.add_argument("--image-format", default="png", choices=("png", "jpeg"), help="返回图片的格式")
+    parser.add_argument("--reply-file", default="", help="用作 AI 回复的 JSON 文件（默认按表单字段生成示例）")
+    parser.add_argument("--seed", type=int, default=None, help="随机注入使用的种子，便于复现")
+    parser.add_argument("--quiet", action="store_true", help="不打印每个请求的日志")
+    return parser.parse_args(argv)
+
+
+def build_sample_reply() -> dict:
+    """按表单字段生成示例提示词，字段结构与界面/预设一致"""
+    form_values = {
+        name: [f"示例{name}"] if name in NEGATIVE_FIELDS else f"示例{name}"
+        for name in FIELD_PATHS
+    }
+    return build_prompt_data(form_values, negative_enabled=True)
+
+
+def image_dimensions(aspect_ratio: str, image_size: str) -> Tuple[int, int]:
+    """按宽高比和尺寸档位计算图片像素尺寸（面积与同档位的正方形相同）"""
+    base = IMAGE_SIZE_BASE.get(image_size, IMAGE_SIZE_BASE["1K"])
+    try:
+        w_ratio, h_ratio = (float(part) for part in aspect_ratio.split(":"))
+        ratio = w_ratio / h_ratio
+    except (ValueError, ZeroDivisionError):
+        ratio = 1.0
+    width = base * math.sqrt(ratio)
+    height = base / math.sqrt(ratio)
+    return (
+        max(IMAGE_DIM_STEP, round(width / IMAGE_DIM_STEP) * IMAGE_DIM_STEP),
+        max(IMAGE_DIM_STEP, round(height / IMAGE_DIM_STEP) * IMAGE_DIM_STEP),
+    )
+
+
+class MockState:
+    """服务端共享状态：回复内容、生成过的图片和请求计数"""
+
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+        if args.reply_file:
+            with open(args.reply_file, "r", encoding="utf-8") as f:
+                reply = json.load(f)
+        else:
+            reply = build_sample_reply()
+        self.reply_text = json.dumps(reply, ensure_ascii=False, indent=2)
+        self.stats = {
+            "openai_requests": 0,
+            "gemini_text_requests": 0,
+            "gemini_image_requests": 0,
+            "injected_errors": 0,
+            "rate_limited": 0,
+            "malformed_replies": 0,
+        }
+        self._images: dict = {}
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def pick_failure(self) -> Optional[int]:
+        """按配置决定本次请求是否失败，返回要返回的状态码"""
+        args = self.args
+        with self._lock:
+            now = time.monotonic()
+            if args.rpm > 0:
+                while self._recent and now - self._recent[0] > 60:
+                    self._recent.popleft()
+                if len(self._recent) >= args.rpm:
+                    self.stats["rate_limited"] += 1
+                    return 429
+                self._recent.append(now)
+            roll = self.random.random()
+            if roll < args.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return 429
+            if roll < args.rate_limit_rate + args.error_rate:
+                self.stats["injected_errors"] += 1
+                return 500
+        return None
+
+    def reply_for_request(self) -> str:
+        """取得本次的回复文本，按 malformed-rate 随机截断并混入非法字符"""
+        with self._lock:
+            malformed = self.random.random() < self.args.malformed_rate
+            if malformed:
+                self.stats["malformed_replies"] += 1
+        if malformed:
+            return self.reply_text[: len(self.reply_text) // 3] + "\n<模拟的损坏输出>"
+        return self.reply_text
+
+    def image(self, width: int, height: int) -> Tuple[bytes, str]:
+        """取得指定尺寸的图片（首次生成后缓存），返回 (图片字节, MIME 类型)"""
+        fmt = self.args.image_format
+        key = (width, height, fmt)
+        with self._lock:
+            cached = self._images.get(key)
+        if cached is None:
+            from PIL import Image
+
+            # 带噪点的渐变图，压缩后的大小接近真实照片，而不是纯色图的几 KB
+            gradient = Image.linear_gradient("L").resize((width, height))
+            noise = Image.effect_noise((width, height), 48)
+            image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+            buffer = BytesIO()
+            if fmt == "jpeg":
+                image.save(buffer, "JPEG", quality=90)
+                cached = (buffer.getvalue(), "image/jpeg")
+            else:
+                image.save(buffer, "PNG")
+                cached = (buffer.getvalue(), "image/png")
+            with self._lock:
+                self._images[key] = cached
+        return cached
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    """按路径分发到 OpenAI / Gemini 的模拟实现"""
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.state.args.quiet:
+            return
+        print(f"[{self.log_date_time_string()}] {self.address_string()} {format % args}")
+
+    # ========== 请求分发 ==========
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.state.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": f"未知路径: {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "请求体不是合法的 JSON"}})
+            return
+
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/chat/completions"):
+            self._handle_openai(body)
+        elif path.endswith(":generateContent"):
+            self._handle_gemini(path, body)
+        else:
+            self._send_json(404, {"error": {"message": f"未知路径: {self.path}"}})
+
+    # ========== OpenAI 兼容接口 ==========
+
+    def _handle_openai(self, body: dict):
+        self.state.count("openai_requests")
+        time.sleep(self.state.args.latency)
+        status = self.state.pick_failure()
+        if status:
+            self._send_error_status(status, {"error": {"message": "模拟的错误", "type": "mock_error", "code": status}})
+            return
+
+        model = body.get("model", "mock-model")
+        reply = self.state.reply_for_request()
+        created = int(time.time())
+        completion_id = f"chatcmpl-mock-{created}-{threading.get_ident()}"
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+            })
+            return
+
+        def chunk(delta: dict, finish_reason=None) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        args = self.state.args
+        step = max(1, args.token_chars)
+        interval = 1.0 / args.token_rate if args.token_rate > 0 else 0.0
+        try:
+            self._write_chunk(chunk({"role": "assistant", "content": ""}))
+            for start in range(0, len(reply), step):
+                if interval:
+                    time.sleep(interval)
+                self._write_chunk(chunk({"content": reply[start:start + step]}))
+            self._write_chunk(chunk({}, "stop"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端取消了请求
+            self.close_connection = True
+
+    # ========== Gemini 接口 ==========
+
+    def _handle_gemini(self, path: str, body: dict):
+        model = path.rsplit("/", 1)[-1].split(":", 1)[0]
+        config = body.get("generationConfig") or body.get("generation_config") or {}
+        image_config = config.get("imageConfig") or config.get("image_config")
+        is_image = image_config is not None or "image" in model
+        self.state.count("gemini_image_requests" if is_image else "gemini_text_requests")
+
+        args = self.state.args
+        time.sleep(args.latency + (args.image_latency if is_image else 0.0))
+        status = self.state.pick_failure()
+        if status:
+            self._send_error_status(status, {"error": {
+                "code": status,
+                "message": "模拟的错误",
+                "status": GEMINI_ERROR_STATUS.get(status, "UNKNOWN"),
+            }})
+            return
+
+        if is_image:
+            image_config = image_config or {}
+            if args.image_size:
+                width, height = (int(part) for part in args.image_size.lower().split("x"))
+            else:
+                width, height = image_dimensions(
+                    image_config.get("aspectRatio") or image_config.get("aspect_ratio") or "1:1",
+                    image_config.get("imageSize") or image_config.get("image_size") or "1K",
+                )
+            image_bytes, mime_type = self.state.image(width, height)
+            parts = [{"inlineData": {"mimeType": mime_type, "data": base64.b64encode(image_bytes).decode("ascii")}}]
+        else:
+            parts = [{"text": self.state.reply_for_request()}]
+
+        self._send_json(200, {
+            "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}],
+            "modelVersion": model,
+        })
+
+    # ========== 响应 ==========
+
+    def _write_chunk(self, data: bytes):
+        """按 chunked 编码写出一块，空数据表示结束"""
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error_status(self, status: int, payload: dict):
+        headers = {}
+        if status == 429 and self.state.args.retry_after > 0:
+            headers["Retry-After"] = f"{self.state.args.retry_after:g}"
+        self._send_json(status, payload, headers)
+
+
+def make_server(args) -> ThreadingHTTPServer:
+    """创建模拟服务（未启动），端口为 0 时由系统分配，实际地址见 server.server_address"""
+    server = ThreadingHTTPServer((args.host, args.port), MockAPIHandler)
+    server.daemon_threads = True
+    server.state = MockState(args)
+    return server
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    server = make_server(args)
+    host, port = server.server_address[:2]
+    print(f"模拟 API 已启动: http://{host}:{port}")
+    print(f"  OpenAI 兼容接口 Base URL: http://{host}:{port}/v1")
+    print(f"  Gemini Base URL:          http://{host}:{port}")
+    print(f"  请求统计:                 http://{host}:{port}/stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"请求统计: {json.dumps(server.state.snapshot(), ensure_ascii=False)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
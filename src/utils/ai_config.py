@@ -1,6 +1,9 @@
 """AI API 配置管理"""
+import threading
 import yaml
 from pathlib import Path
+from typing import Optional
+from utils.atomic_write import atomic_write
 from utils.resource_path import get_resource_path
 
 
@@ -16,51 +19,118 @@ class AIConfigManager:
         "gemini_model": "gemini-3-pro-image-preview",
     }
     
+    # HTTP 连接池配置（可在 ai_config.yaml 中按同名键覆盖）
+    HTTP_POOL_DEFAULTS = {
+        "http_max_connections": 10,
+        "http_max_keepalive_connections": 5,
+        "http_keepalive_expiry": 300.0,
+    }
+    
+    # 生图任务队列配置：总并发数与同一 API 地址的并发上限
+    IMAGE_QUEUE_DEFAULTS = {
+        "image_max_workers": 3,
+        "image_max_per_endpoint": 2,
+    }
+    
+    # 接口重试与限流配置：最多尝试次数、退避基数/上限（秒）、每个 API 地址每分钟请求数与突发数
+    RETRY_DEFAULTS = {
+        "retry_max_attempts": 4,
+        "retry_base_delay": 1.0,
+        "retry_max_delay": 30.0,
+        "rate_limit_per_minute": 60.0,
+        "rate_limit_burst": 10.0,
+    }
+    
+    # AI 回复缓存：有效期（小时）与最多保留的条目数
+    RESPONSE_CACHE_DEFAULTS = {
+        "ai_response_cache_ttl_hours": 168.0,
+        "ai_response_cache_max_entries": 200,
+    }
+    
+    # 参考图上传前的预处理：最长边（像素）、JPEG/WEBP 压缩质量，以及预处理结果缓存的内存上限（MB）
+    IMAGE_PREP_DEFAULTS = {
+        "image_upload_max_edge": 2048,
+        "image_upload_quality": 90,
+        "image_payload_cache_mb": 64.0,
+    }
+    
+    # 生图结果缓存的磁盘占用上限（MB）
+    IMAGE_CACHE_DEFAULTS = {
+        "image_cache_max_mb": 500.0,
+    }
+    
+    # 参考图缩略图磁盘缓存的占用上限（MB）
+    THUMBNAIL_CACHE_DEFAULTS = {
+        "thumbnail_cache_max_mb": 100.0,
+    }
+    
     def __init__(self):
         self.config_path = get_resource_path("config/ai_config.yaml")
+        # 配置快照缓存：仅在文件的 (mtime, size) 变化时重新解析
+        self._cache_data: dict = {}
+        self._cache_stamp: Optional[tuple] = None
+        self._cache_lock = threading.Lock()
         self._ensure_config_exists()
     
     def _ensure_config_exists(self):
         """确保配置文件目录存在"""
         self.config_path.parent.mkdir(parents=True, exist_ok=True)
     
-    def load_config(self) -> dict:
-        """加载AI配置"""
+    def _file_stamp(self) -> Optional[tuple]:
+        """获取配置文件的 (mtime, size)，文件不存在时返回 None"""
         try:
-            if self.config_path.exists():
+            stat = self.config_path.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _read_file(self) -> dict:
+        """读取配置文件的原始内容（文件未变化时直接返回缓存快照，调用方不应修改）"""
+        with self._cache_lock:
+            stamp = self._file_stamp()
+            if stamp is None:
+                self._cache_data, self._cache_stamp = {}, None
+                return self._cache_data
+            if stamp == self._cache_stamp:
+                return self._cache_data
+            data = {}
+            try:
                 with open(self.config_path, "r", encoding="utf-8") as f:
-                    data = yaml.safe_load(f)
-                    if data:
-                        # 直接返回配置文件中的值，不合并默认值
-                        # 确保所有字段都存在，但使用空字符串作为默认值
-                        result = {}
-                        for key in self.DEFAULT_CONFIG.keys():
-                            result[key] = data.get(key, "")
-                        return result
-        except Exception as e:
-            print(f"加载AI配置失败: {e}")
-        # 如果配置文件不存在或加载失败，返回所有字段为空字符串
-        return {key: "" for key in self.DEFAULT_CONFIG.keys()}
+                    loaded = yaml.safe_load(f)
+                    if isinstance(loaded, dict):
+                        data = loaded
+            except Exception as e:
+                print(f"加载AI配置失败: {e}")
+                return {}
+            self._cache_data, self._cache_stamp = data, stamp
+            return data
+
+    def load_config(self) -> dict:
+        """加载AI配置"""
+        data = self._read_file()
+        # 直接返回配置文件中的值，不合并默认值
+        # 确保所有字段都存在，但使用空字符串作为默认值；文件不存在或加载失败时全部为空字符串
+        return {key: data.get(key, "") for key in self.DEFAULT_CONFIG.keys()}
     
     def save_config(self, config: dict, merge_existing: bool = True) -> bool:
         """保存AI配置，默认保留已有字段"""
         try:
             data_to_save = {}
-            if merge_existing and self.config_path.exists():
-                with open(self.config_path, "r", encoding="utf-8") as f:
-                    existing = yaml.safe_load(f) or {}
-                    if isinstance(existing, dict):
-                        data_to_save.update(existing)
+            if merge_existing:
+                data_to_save.update(self._read_file())
             data_to_save.update(config)
 
-            with open(self.config_path, "w", encoding="utf-8") as f:
-                yaml.dump(
-                    data_to_save,
-                    f,
-                    allow_unicode=True,
-                    default_flow_style=False,
-                    sort_keys=False,
-                )
+            text = yaml.dump(
+                data_to_save,
+                allow_unicode=True,
+                default_flow_style=False,
+                sort_keys=False,
+            )
+            with self._cache_lock:
+                # 先写临时文件再重命名，保存中途崩溃不会留下截断的配置
+                atomic_write(self.config_path, text, fsync=True)
+                # 写入后直接刷新缓存，避免下次读取再解析一遍
+                self._cache_data, self._cache_stamp = data_to_save, self._file_stamp()
             return True
         except Exception as e:
             print(f"保存AI配置失败: {e}")
@@ -97,3 +167,65 @@ class AIConfigManager:
     def get_gemini_model(self) -> str:
         return self.get_gemini_config().get("model", "")
 
+    def get_http_pool_config(self) -> dict:
+        """获取HTTP连接池配置，未配置或配置无效时使用默认值"""
+        return self._get_numeric_config(self.HTTP_POOL_DEFAULTS)
+
+    def get_image_queue_config(self) -> dict:
+        """获取生图任务队列配置，未配置或配置无效时使用默认值"""
+        return self._get_numeric_config(self.IMAGE_QUEUE_DEFAULTS)
+
+    def get_retry_config(self) -> dict:
+        """获取接口重试与限流配置，未配置或配置无效时使用默认值"""
+        return self._get_numeric_config(self.RETRY_DEFAULTS)
+
+    def get_response_cache_config(self) -> dict:
+        """获取AI回复缓存配置，未配置或配置无效时使用默认值"""
+        return self._get_numeric_config(self.RESPONSE_CACHE_DEFAULTS)
+
+    def get_image_prep_config(self) -> dict:
+        """获取参考图预处理配置；image_upload_format 可选 auto / jpeg / webp / png"""
+        config = self._get_numeric_config(self.IMAGE_PREP_DEFAULTS)
+        upload_format = str(self._read_file().get("image_upload_format", "auto")).lower()
+        config["image_upload_format"] = upload_format
+        return config
+
+    def get_image_cache_config(self) -> dict:
+        """获取生图缓存配置，未配置或配置无效时使用默认值"""
+        return self._get_numeric_config(self.IMAGE_CACHE_DEFAULTS)
+
+    def get_thumbnail_cache_config(self) -> dict:
+        """获取缩略图缓存配置，未配置或配置无效时使用默认值"""
+        return self._get_numeric_config(self.THUMBNAIL_CACHE_DEFAULTS)
+
+    def is_image_cache_enabled(self) -> bool:
+        """是否启用生图结果缓存（默认关闭）"""
+        return bool(self._read_file().get("image_cache_enabled", False))
+
+    def set_image_cache_enabled(self, enabled: bool) -> bool:
+        return self.save_config({"image_cache_enabled": bool(enabled)})
+
+    def _get_numeric_config(self, defaults: dict) -> dict:
+        """读取一组正数配置项，缺失或无效的项使用默认值"""
+        data = self._read_file()
+        result = {}
+        for key, default in defaults.items():
+            try:
+                value = type(default)(data.get(key, default))
+                result[key] = value if value > 0 else default
+            except (TypeError, ValueError):
+                result[key] = default
+        return result
+
+
+_shared_manager: Optional[AIConfigManager] = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_ai_config_manager() -> AIConfigManager:
+    """获取进程内共享的 AIConfigManager，所有窗口与线程共用同一份配置缓存"""
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = AIConfigManager()
+        return _shared_manager
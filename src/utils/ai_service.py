@@ -1,12 +1,22 @@
 """AI 提示词生成服务 - 使用 OpenAI SDK（流式输出）"""
 import json
-import base64
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import Callable, Optional, List
 from PyQt6.QtCore import QThread, pyqtSignal
 
-from utils.ai_config import AIConfigManager
+from utils.atomic_write import atomic_write
+from utils.ai_config import AIConfigManager, get_ai_config_manager
+from utils.image_prep import describe_savings, get_image_prep_settings, get_prepared_image_cache
+from utils.resource_path import get_cache_dir
+from utils.retry import RetryCancelled, describe_retry, get_retry_scheduler
 
 
+# 流式内容块的最短发送间隔（秒），期间收到的内容合并后一次发送
+STREAM_EMIT_INTERVAL = 0.033
+
 # 系统提示词，指导AI生成符合格式的提示词
 SYSTEM_PROMPT = """你是一个专业的AI绘画提示词生成助手。用户会描述他们想要的画面，或者提供参考图片，你需要根据描述和图片内容生成一个结构化的JSON提示词。
 
@@ -131,6 +141,189 @@ MODIFY_SYSTEM_PROMPT = """
 }
 """
 
+class OpenAIClientPool:
+    """OpenAI 客户端池 - 按 (base_url, api_key) 复用客户端及其 HTTP 连接"""
+    
+    # 池中最多保留的客户端数量，超出时移出最久未使用的
+    # （不主动关闭：其他线程可能仍在用它流式读取，连接在客户端被回收时释放）
+    MAX_CLIENTS = 4
+    
+    def __init__(
+        self,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 5,
+        keepalive_expiry: float = 300.0,
+        timeout: float = 180,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_client(self, base_url: str, api_key: str):
+        """获取（必要时创建）对应配置的 OpenAI 客户端，可跨线程复用"""
+        key = (base_url, api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+            
+            # 延迟导入
+            from openai import OpenAI
+            import httpx
+            
+            # 禁用 http2 避免 cffi/pycparser 问题
+            http_client = httpx.Client(
+                http2=False,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            # 重试由 utils.retry 的共享调度器统一处理（遵循 Retry-After、按地址限流），
+            # 关闭 SDK 自带的重试，避免两层重试叠加
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=self.timeout,
+                max_retries=0,
+                http_client=http_client,
+            )
+            self._clients[key] = client
+            while len(self._clients) > self.MAX_CLIENTS:
+                self._clients.popitem(last=False)
+        return client
+    
+    def close(self):
+        """关闭池中所有客户端及其连接"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            self._close_client(client)
+    
+    @staticmethod
+    def _close_client(client):
+        try:
+            client.close()
+        except Exception as e:
+            print(f"关闭AI客户端失败: {e}")
+
+
+class ResponseCache:
+    """AI 回复缓存 - 按完整请求（API 地址、模型、消息）的哈希保存完整回复文本
+
+    缓存持久化到 cache/ai_responses.json；条目超过 ttl_seconds 即失效，
+    数量超过 max_entries 时淘汰最久未使用的条目。只缓存能解析为 JSON 的回复。
+    """
+    
+    # 缓存文件格式版本，结构变化时递增，旧缓存会被丢弃
+    VERSION = 1
+    
+    def __init__(self, cache_path=None, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 200):
+        self.cache_path = cache_path or get_cache_dir() / "ai_responses.json"
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: dict = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(base_url: str, model: str, messages: list) -> str:
+        """计算请求的缓存键（图片以 base64 形式包含在消息中，内容变化即不命中）"""
+        payload = json.dumps(
+            {"base_url": base_url, "model": model, "messages": messages},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def is_cacheable(content: str) -> bool:
+        """只缓存能解析为 JSON 的回复（允许 markdown 代码块包裹），避免重放错误输出"""
+        content = (content or "").strip()
+        if content.startswith("```"):
+            content = content.split("\n", 1)[1] if "\n" in content else ""
+        if content.endswith("```"):
+            content = content[:-3]
+        try:
+            json.loads(content)
+            return True
+        except ValueError:
+            return False
+    
+    def _load(self):
+        """从磁盘读取缓存（仅首次调用时执行），调用方需持有锁"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self._entries = data.get("entries", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"加载AI回复缓存失败: {e}")
+    
+    def _save(self):
+        """原子写入缓存文件，调用方需持有锁"""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(
+                self.cache_path,
+                json.dumps({"version": self.VERSION, "entries": self._entries}, ensure_ascii=False),
+            )
+        except Exception as e:
+            print(f"保存AI回复缓存失败: {e}")
+    
+    def _prune(self, now: float):
+        """删除过期条目，并按最近使用时间淘汰超出数量上限的条目，调用方需持有锁"""
+        self._entries = {
+            key: entry for key, entry in self._entries.items()
+            if now - entry.get("created_at", 0) <= self.ttl_seconds
+        }
+        if len(self._entries) > self.max_entries:
+            keep = sorted(self._entries.items(), key=lambda item: item[1].get("used_at", 0), reverse=True)
+            self._entries = dict(keep[:self.max_entries])
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的缓存回复，未命中时返回 None"""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            now = time.time()
+            if now - entry.get("created_at", 0) > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            # 最近使用时间只在内存中更新，下次写入时一并保存
+            entry["used_at"] = now
+            return entry.get("content")
+    
+    def put(self, key: str, content: str):
+        """写入一条回复并持久化"""
+        with self._lock:
+            self._load()
+            now = time.time()
+            self._entries[key] = {"content": content, "created_at": now, "used_at": now}
+            self._prune(now)
+            self._save()
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries = {}
+            self._loaded = True
+            self._save()
+
+
 class AIGenerateThread(QThread):
     """AI生成线程 - 流式输出"""
     
@@ -141,37 +334,64 @@ class AIGenerateThread(QThread):
     stream_chunk = pyqtSignal(str)   # 流式内容块
     stream_done = pyqtSignal(str)    # 流式完成，发送完整内容
     
-    def __init__(self, user_prompt: str, config_manager: AIConfigManager, image_paths: Optional[List[str]] = None):
+    def __init__(
+        self,
+        user_prompt: str,
+        config_manager: AIConfigManager,
+        image_paths: Optional[List[str]] = None,
+        client_pool: Optional[OpenAIClientPool] = None,
+        response_cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+    ):
         super().__init__()
         self.user_prompt = user_prompt
         self.config_manager = config_manager
         self.image_paths = image_paths or []
+        self.client_pool = client_pool or AIService.get_client_pool()
+        self.retry_scheduler = get_retry_scheduler()
+        self.response_cache = (response_cache or AIService.get_response_cache()) if use_cache else None
+        self._prep_settings = get_image_prep_settings()
         self._cancelled = False
     
-    def _encode_image(self, image_path: str) -> str:
-        """将图片编码为base64"""
-        try:
-            with open(image_path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode('utf-8')
-        except Exception as e:
-            raise Exception(f"读取图片失败 {image_path}: {str(e)}")
-    
-    def _get_image_mime_type(self, image_path: str) -> str:
-        """根据文件扩展名获取MIME类型"""
-        ext = image_path.lower().split('.')[-1]
-        mime_types = {
-            'png': 'image/png',
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'webp': 'image/webp',
-            'bmp': 'image/bmp',
-        }
-        return mime_types.get(ext, 'image/png')
+    def _encode_images(self) -> list:
+        """预处理参考图（缩小、去除元数据、重新压缩）并编码为 data URL 消息块"""
+        # 同一张参考图的预处理与 base64 结果在多次请求间共享缓存
+        cache = get_prepared_image_cache()
+        prepared_images = []
+        for image_path in self.image_paths:
+            try:
+                prepared_images.append(cache.get(image_path, self._prep_settings))
+            except Exception as e:
+                raise Exception(f"读取图片失败 {image_path}: {str(e)}")
+        self.progress.emit(describe_savings(prepared_images))
+        return [
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{prepared.mime_type};base64,{prepared.base64}"
+                }
+            }
+            for prepared in prepared_images
+        ]
     
     def cancel(self):
         """取消生成"""
         self._cancelled = True
     
+    def _on_retry(self, attempt: int, delay: float, exc: Exception):
+        """退避重试前更新进度提示"""
+        self.progress.emit(describe_retry(attempt, self.retry_scheduler.max_attempts, delay, exc))
+    
+    def _replay_cached(self, cache_key: str) -> bool:
+        """命中缓存时通过流式信号重放回复，返回是否命中"""
+        content = self.response_cache.get(cache_key)
+        if content is None:
+            return False
+        self.progress.emit("已使用缓存的回复")
+        self.stream_chunk.emit(content)
+        self.stream_done.emit(content)
+        return True
+    
     def run(self):
         try:
             self.progress.emit("正在连接AI服务...")
@@ -185,9 +405,9 @@ class AIGenerateThread(QThread):
                 self.error.emit("请先配置API密钥")
                 return
             
-            # 延迟导入
+            # 从客户端池获取（复用已建立的连接）
             try:
-                from openai import OpenAI
+                client = self.client_pool.get_client(base_url, api_key)
             except ImportError as e:
                 self.error.emit(f"openai 导入失败: {e}")
                 return
@@ -195,16 +415,6 @@ class AIGenerateThread(QThread):
                 self.error.emit(f"openai 加载异常: {type(e).__name__}: {e}")
                 return
             
-            # 创建客户端（禁用 http2 避免 cffi/pycparser 问题）
-            import httpx
-            http_client = httpx.Client(http2=False)
-            client = OpenAI(
-                api_key=api_key,
-                base_url=base_url,
-                timeout=180,
-                http_client=http_client,
-            )
-            
             self.progress.emit("正在生成提示词...")
             
             # 构建消息
@@ -212,19 +422,11 @@ class AIGenerateThread(QThread):
             
             # 如果有图片，添加图片到消息中
             if self.image_paths:
-                for image_path in self.image_paths:
-                    try:
-                        base64_image = self._encode_image(image_path)
-                        mime_type = self._get_image_mime_type(image_path)
-                        user_content.append({
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{mime_type};base64,{base64_image}"
-                            }
-                        })
-                    except Exception as e:
-                        self.error.emit(f"处理图片失败: {str(e)}")
-                        return
+                try:
+                    user_content.extend(self._encode_images())
+                except Exception as e:
+                    self.error.emit(f"处理图片失败: {str(e)}")
+                    return
             
             # 添加文本内容
             if self.user_prompt:
@@ -253,15 +455,29 @@ class AIGenerateThread(QThread):
                 {"role": "user", "content": user_content}
             ]
             
+            # 相同请求直接重放缓存的回复
+            cache_key = None
+            if self.response_cache is not None:
+                cache_key = self.response_cache.make_key(base_url, model, messages)
+                if self._replay_cached(cache_key):
+                    return
+            
             # 流式调用API
             try:
-                stream = client.chat.completions.create(
+                # 建立流式连接时遇到限流或临时错误会退避重试；已开始输出后不再重试
+                stream = self.retry_scheduler.call(
+                    base_url,
+                    client.chat.completions.create,
                     model=model,
                     messages=messages,
                     stream=True,
+                    on_retry=self._on_retry,
+                    cancelled=lambda: self._cancelled,
                 )
                 
-                full_content = ""
+                full_parts = []
+                pending = []
+                last_emit = 0.0
                 for chunk in stream:
                     if self._cancelled:
                         self.progress.emit("已取消")
@@ -270,14 +486,26 @@ class AIGenerateThread(QThread):
                     if chunk.choices and len(chunk.choices) > 0:
                         delta = chunk.choices[0].delta
                         if delta and delta.content:
-                            content_piece = delta.content
-                            full_content += content_piece
-                            # 发送流式块
-                            self.stream_chunk.emit(content_piece)
+                            full_parts.append(delta.content)
+                            pending.append(delta.content)
+                            # 合并发送流式块，限制跨线程信号的频率
+                            now = time.monotonic()
+                            if now - last_emit >= STREAM_EMIT_INTERVAL:
+                                self.stream_chunk.emit("".join(pending))
+                                pending.clear()
+                                last_emit = now
                 
+                if pending:
+                    self.stream_chunk.emit("".join(pending))
+                full_content = "".join(full_parts)
                 # 流式完成
                 self.stream_done.emit(full_content)
+                if cache_key and self.response_cache.is_cacheable(full_content):
+                    self.response_cache.put(cache_key, full_content)
                 
+            except RetryCancelled:
+                self.progress.emit("已取消")
+                return
             except Exception as e:
                 error_msg = str(e)
                 if "401" in error_msg or "Unauthorized" in error_msg:
@@ -307,38 +535,66 @@ class AIModifyThread(QThread):
     stream_chunk = pyqtSignal(str)   # 流式内容块
     stream_done = pyqtSignal(str)    # 流式完成，发送完整内容
     
-    def __init__(self, current_data: str, modify_request: str, config_manager: AIConfigManager, image_paths: Optional[List[str]] = None):
+    def __init__(
+        self,
+        current_data: str,
+        modify_request: str,
+        config_manager: AIConfigManager,
+        image_paths: Optional[List[str]] = None,
+        client_pool: Optional[OpenAIClientPool] = None,
+        response_cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+    ):
         super().__init__()
         self.current_data = current_data
         self.modify_request = modify_request
         self.config_manager = config_manager
         self.image_paths = image_paths or []
+        self.client_pool = client_pool or AIService.get_client_pool()
+        self.retry_scheduler = get_retry_scheduler()
+        self.response_cache = (response_cache or AIService.get_response_cache()) if use_cache else None
+        self._prep_settings = get_image_prep_settings()
         self._cancelled = False
     
-    def _encode_image(self, image_path: str) -> str:
-        """将图片编码为base64"""
-        try:
-            with open(image_path, "rb") as image_file:
-                return base64.b64encode(image_file.read()).decode('utf-8')
-        except Exception as e:
-            raise Exception(f"读取图片失败 {image_path}: {str(e)}")
-    
-    def _get_image_mime_type(self, image_path: str) -> str:
-        """根据文件扩展名获取MIME类型"""
-        ext = image_path.lower().split('.')[-1]
-        mime_types = {
-            'png': 'image/png',
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'webp': 'image/webp',
-            'bmp': 'image/bmp',
-        }
-        return mime_types.get(ext, 'image/png')
+    def _encode_images(self) -> list:
+        """预处理参考图（缩小、去除元数据、重新压缩）并编码为 data URL 消息块"""
+        # 同一张参考图的预处理与 base64 结果在多次请求间共享缓存
+        cache = get_prepared_image_cache()
+        prepared_images = []
+        for image_path in self.image_paths:
+            try:
+                prepared_images.append(cache.get(image_path, self._prep_settings))
+            except Exception as e:
+                raise Exception(f"读取图片失败 {image_path}: {str(e)}")
+        self.progress.emit(describe_savings(prepared_images))
+        return [
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{prepared.mime_type};base64,{prepared.base64}"
+                }
+            }
+            for prepared in prepared_images
+        ]
     
     def cancel(self):
         """取消生成"""
         self._cancelled = True
     
+    def _on_retry(self, attempt: int, delay: float, exc: Exception):
+        """退避重试前更新进度提示"""
+        self.progress.emit(describe_retry(attempt, self.retry_scheduler.max_attempts, delay, exc))
+    
+    def _replay_cached(self, cache_key: str) -> bool:
+        """命中缓存时通过流式信号重放回复，返回是否命中"""
+        content = self.response_cache.get(cache_key)
+        if content is None:
+            return False
+        self.progress.emit("已使用缓存的回复")
+        self.stream_chunk.emit(content)
+        self.stream_done.emit(content)
+        return True
+    
     def run(self):
         try:
             self.progress.emit("正在连接AI服务...")
@@ -360,9 +616,9 @@ class AIModifyThread(QThread):
                 self.error.emit("请先配置模型名称")
                 return
             
-            # 延迟导入
+            # 从客户端池获取（复用已建立的连接）
             try:
-                from openai import OpenAI
+                client = self.client_pool.get_client(base_url, api_key)
             except ImportError as e:
                 self.error.emit(f"openai 导入失败: {e}")
                 return
@@ -370,16 +626,6 @@ class AIModifyThread(QThread):
                 self.error.emit(f"openai 加载异常: {type(e).__name__}: {e}")
                 return
             
-            # 创建客户端（禁用 http2 避免 cffi/pycparser 问题）
-            import httpx
-            http_client = httpx.Client(http2=False)
-            client = OpenAI(
-                api_key=api_key,
-                base_url=base_url,
-                timeout=180,
-                http_client=http_client,
-            )
-            
             self.progress.emit("正在修改提示词...")
             
             # 构建消息
@@ -387,19 +633,11 @@ class AIModifyThread(QThread):
             
             # 如果有图片，添加图片到消息中
             if self.image_paths:
-                for image_path in self.image_paths:
-                    try:
-                        base64_image = self._encode_image(image_path)
-                        mime_type = self._get_image_mime_type(image_path)
-                        user_content.append({
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{mime_type};base64,{base64_image}"
-                            }
-                        })
-                    except Exception as e:
-                        self.error.emit(f"处理图片失败: {str(e)}")
-                        return
+                try:
+                    user_content.extend(self._encode_images())
+                except Exception as e:
+                    self.error.emit(f"处理图片失败: {str(e)}")
+                    return
             
             # 添加文本内容
             text_content = f"当前提示词：\n{self.current_data}\n\n修改要求：{self.modify_request}\n\n请返回修改后的JSON提示词:"
@@ -420,15 +658,29 @@ class AIModifyThread(QThread):
                 {"role": "user", "content": user_message_content}
             ]
             
+            # 相同请求直接重放缓存的回复
+            cache_key = None
+            if self.response_cache is not None:
+                cache_key = self.response_cache.make_key(base_url, model, messages)
+                if self._replay_cached(cache_key):
+                    return
+            
             # 流式调用API
             try:
-                stream = client.chat.completions.create(
+                # 建立流式连接时遇到限流或临时错误会退避重试；已开始输出后不再重试
+                stream = self.retry_scheduler.call(
+                    base_url,
+                    client.chat.completions.create,
                     model=model,
                     messages=messages,
                     stream=True,
+                    on_retry=self._on_retry,
+                    cancelled=lambda: self._cancelled,
                 )
                 
-                full_content = ""
+                full_parts = []
+                pending = []
+                last_emit = 0.0
                 for chunk in stream:
                     if self._cancelled:
                         self.progress.emit("已取消")
@@ -437,14 +689,26 @@ class AIModifyThread(QThread):
                     if chunk.choices and len(chunk.choices) > 0:
                         delta = chunk.choices[0].delta
                         if delta and delta.content:
-                            content_piece = delta.content
-                            full_content += content_piece
-                            # 发送流式块
-                            self.stream_chunk.emit(content_piece)
+                            full_parts.append(delta.content)
+                            pending.append(delta.content)
+                            # 合并发送流式块，限制跨线程信号的频率
+                            now = time.monotonic()
+                            if now - last_emit >= STREAM_EMIT_INTERVAL:
+                                self.stream_chunk.emit("".join(pending))
+                                pending.clear()
+                                last_emit = now
                 
+                if pending:
+                    self.stream_chunk.emit("".join(pending))
+                full_content = "".join(full_parts)
                 # 流式完成
                 self.stream_done.emit(full_content)
+                if cache_key and self.response_cache.is_cacheable(full_content):
+                    self.response_cache.put(cache_key, full_content)
                 
+            except RetryCancelled:
+                self.progress.emit("已取消")
+                return
             except Exception as e:
                 error_msg = str(e)
                 if "401" in error_msg or "Unauthorized" in error_msg:
@@ -467,10 +731,51 @@ class AIModifyThread(QThread):
 class AIService:
     """AI服务封装类"""
     
+    # 进程内共享的客户端池，所有 AIService 实例共用
+    _client_pool: Optional[OpenAIClientPool] = None
+    _client_pool_lock = threading.Lock()
+    
+    # 进程内共享的回复缓存
+    _response_cache: Optional[ResponseCache] = None
+    
     def __init__(self):
-        self.config_manager = AIConfigManager()
+        self.config_manager = get_ai_config_manager()
         self._current_thread: Optional[AIGenerateThread] = None
     
+    @classmethod
+    def get_client_pool(cls) -> OpenAIClientPool:
+        """获取共享客户端池，首次调用时按配置创建"""
+        with cls._client_pool_lock:
+            if cls._client_pool is None:
+                pool_config = get_ai_config_manager().get_http_pool_config()
+                cls._client_pool = OpenAIClientPool(
+                    max_connections=pool_config["http_max_connections"],
+                    max_keepalive_connections=pool_config["http_max_keepalive_connections"],
+                    keepalive_expiry=pool_config["http_keepalive_expiry"],
+                )
+            return cls._client_pool
+    
+    @classmethod
+    def get_response_cache(cls) -> ResponseCache:
+        """获取共享回复缓存，首次调用时按配置创建"""
+        with cls._client_pool_lock:
+            if cls._response_cache is None:
+                cache_config = get_ai_config_manager().get_response_cache_config()
+                cls._response_cache = ResponseCache(
+                    ttl_seconds=cache_config["ai_response_cache_ttl_hours"] * 3600,
+                    max_entries=int(cache_config["ai_response_cache_max_entries"]),
+                )
+            return cls._response_cache
+    
+    @classmethod
+    def close_client_pool(cls):
+        """关闭共享客户端池（应用退出时调用）"""
+        with cls._client_pool_lock:
+            pool = cls._client_pool
+            cls._client_pool = None
+        if pool:
+            pool.close()
+    
     def is_configured(self) -> bool:
         """检查是否已配置"""
         return self.config_manager.is_configured()
@@ -484,6 +789,7 @@ class AIService:
         on_stream_chunk: Callable[[str], None] = None,
         on_stream_done: Callable[[str], None] = None,
         image_paths: Optional[List[str]] = None,
+        use_cache: bool = True,
     ) -> AIGenerateThread:
         """
         异步流式生成提示词
@@ -495,6 +801,7 @@ class AIService:
         :param on_stream_chunk: 流式内容块回调
         :param on_stream_done: 流式完成回调，参数为完整文本
         :param image_paths: 参考图片路径列表（可选）
+        :param use_cache: 是否使用回复缓存（相同请求直接重放上次的回复）
         :return: 线程对象
         """
         # 如果有正在运行的线程，先停止
@@ -502,7 +809,10 @@ class AIService:
             self._current_thread.cancel()
             self._current_thread.wait(1000)
         
-        thread = AIGenerateThread(user_prompt, self.config_manager, image_paths)
+        thread = AIGenerateThread(
+            user_prompt, self.config_manager, image_paths,
+            client_pool=self.get_client_pool(), use_cache=use_cache,
+        )
         thread.finished.connect(on_finished)
         thread.error.connect(on_error)
         if on_progress:
@@ -526,6 +836,7 @@ class AIService:
         on_stream_chunk: Callable[[str], None] = None,
         on_stream_done: Callable[[str], None] = None,
         image_paths: Optional[List[str]] = None,
+        use_cache: bool = True,
     ) -> AIModifyThread:
         """
         异步流式修改提示词
@@ -538,6 +849,7 @@ class AIService:
         :param on_stream_chunk: 流式内容块回调
         :param on_stream_done: 流式完成回调，参数为完整文本
         :param image_paths: 参考图片路径列表（可选）
+        :param use_cache: 是否使用回复缓存（相同请求直接重放上次的回复）
         :return: 线程对象
         """
         # 如果有正在运行的线程，先停止
@@ -545,7 +857,10 @@ class AIService:
             self._current_thread.cancel()
             self._current_thread.wait(1000)
         
-        thread = AIModifyThread(current_data, modify_request, self.config_manager, image_paths)
+        thread = AIModifyThread(
+            current_data, modify_request, self.config_manager, image_paths,
+            client_pool=self.get_client_pool(), use_cache=use_cache,
+        )
         thread.finished.connect(on_finished)
         thread.error.connect(on_error)
         if on_progress:
@@ -0,0 +1,65 @@
+"""原子写文件：先写入同目录下的临时文件，再用 os.replace 覆盖目标文件"""
+import os
+import stat
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+
+# 分块写入的块大小，带进度回调时每写完一块回调一次
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+def _read_umask() -> int:
+    # os.umask 只能“设置并返回旧值”，在导入时读取一次，避免之后在多线程中来回修改
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _read_umask()
+
+
+def _target_mode(path: Path) -> int:
+    """目标文件已存在时沿用其权限，否则按 umask 取普通新文件的默认权限"""
+    try:
+        return stat.S_IMODE(path.stat().st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write(
+    path: Union[str, Path],
+    data: Union[bytes, str],
+    encoding: str = "utf-8",
+    fsync: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+):
+    """原子写入 data（str 按 encoding 编码），写入失败时目标文件保持原样，临时文件会被删除
+
+    mkstemp 创建的临时文件只对当前用户可读写，替换前改为 _target_mode 的权限。
+    :param fsync: 替换前把数据刷到磁盘，防止断电后留下空文件
+    :param progress: 每写完一块回调 (已写入字节数, 总字节数)
+    """
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode(encoding)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if progress is None:
+                f.write(data)
+            else:
+                total = len(data)
+                for offset in range(0, total, WRITE_CHUNK_SIZE):
+                    f.write(data[offset:offset + WRITE_CHUNK_SIZE])
+                    progress(min(offset + WRITE_CHUNK_SIZE, total), total)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, _target_mode(path))
+        os.replace(tmp_path, path)
+        tmp_path = None
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
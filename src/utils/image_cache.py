@@ -0,0 +1,167 @@
+"""生图结果缓存：按请求内容寻址，原样保存接口返回的图片数据，按总大小做 LRU 淘汰"""
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from utils.atomic_write import atomic_write
+from utils.image_format import format_from_mime, suffix_for_format
+from utils.resource_path import get_cache_dir
+
+
+# 缓存键格式版本，键的组成变化时递增，旧缓存自然失效
+CACHE_KEY_VERSION = 1
+
+# 计算参考图哈希时的读取块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ImageCache:
+    """内容寻址的生图缓存
+
+    键为完整请求（提示词、参考图内容哈希、宽高比、尺寸、模型）的 sha256；
+    每个条目保存为 <key><扩展名> 图片文件和 <key>.json 元数据。
+    命中时刷新图片文件的 mtime 作为最近使用时间，写入后总大小超过上限时
+    从最久未使用的条目开始删除。
+    """
+
+    def __init__(self, cache_dir: Path = None, max_bytes: int = 500 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir) if cache_dir else get_cache_dir() / "images"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 参考图哈希缓存：(path, mtime_ns, size) -> sha256，避免重复读取大图
+        self._file_hashes: dict = {}
+
+    # ========== 缓存键 ==========
+
+    def _file_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        stamp = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        digest = self._file_hashes.get(stamp)
+        if digest is None:
+            hasher = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+            self._file_hashes[stamp] = digest
+        return digest
+
+    def make_key(
+        self,
+        prompt: str,
+        image_paths: Optional[List[str]],
+        aspect_ratio: str,
+        image_size: str,
+        model: str,
+    ) -> str:
+        """计算请求的缓存键；参考图按内容计算哈希，文件改名或移动不影响命中"""
+        request = {
+            "version": CACHE_KEY_VERSION,
+            "prompt": prompt,
+            "images": [self._file_hash(path) for path in image_paths or []],
+            "aspect_ratio": aspect_ratio,
+            "image_size": image_size,
+            "model": model,
+        }
+        payload = json.dumps(request, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    # ========== 读写 ==========
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """读取缓存，返回 (图片字节, MIME 类型)，未命中时返回 None"""
+        with self._lock:
+            try:
+                with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                image_path = self.cache_dir / meta["file"]
+                image_bytes = image_path.read_bytes()
+                # 刷新最近使用时间
+                os.utime(image_path)
+                return image_bytes, meta["mime_type"]
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                print(f"读取图片缓存失败: {e}")
+                return None
+
+    def put(self, key: str, image_bytes: bytes, mime_type: str, meta: dict = None):
+        """写入缓存（图片原样保存），随后按大小上限淘汰旧条目"""
+        file_name = key + suffix_for_format(format_from_mime(mime_type))
+        with self._lock:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                atomic_write(self.cache_dir / file_name, image_bytes)
+                record = dict(meta or {})
+                record.update(file=file_name, mime_type=mime_type, size=len(image_bytes), created_at=time.time())
+                atomic_write(self._meta_path(key), json.dumps(record, ensure_ascii=False))
+                self._evict()
+            except Exception as e:
+                print(f"写入图片缓存失败: {e}")
+
+    # ========== 淘汰 ==========
+
+    def _entries(self) -> list:
+        """列出所有条目 (最近使用时间, 大小, 元数据路径, 图片路径)，调用方需持有锁"""
+        entries = []
+        for meta_path in self.cache_dir.glob("*.json"):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    image_path = self.cache_dir / json.load(f)["file"]
+                stat = image_path.stat()
+                entries.append((stat.st_mtime, stat.st_size, meta_path, image_path))
+            except Exception:
+                # 元数据损坏或图片缺失的条目直接清理
+                meta_path.unlink(missing_ok=True)
+        return entries
+
+    def _evict(self):
+        """总大小超过上限时删除最久未使用的条目，调用方需持有锁"""
+        entries = self._entries()
+        total = sum(entry[1] for entry in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, meta_path, image_path in sorted(entries, key=lambda entry: entry[0]):
+            meta_path.unlink(missing_ok=True)
+            image_path.unlink(missing_ok=True)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def total_size(self) -> int:
+        """缓存占用的字节数"""
+        with self._lock:
+            if not self.cache_dir.exists():
+                return 0
+            return sum(entry[1] for entry in self._entries())
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            if not self.cache_dir.exists():
+                return
+            for _, _, meta_path, image_path in self._entries():
+                meta_path.unlink(missing_ok=True)
+                image_path.unlink(missing_ok=True)
+
+
+_shared_cache: Optional[ImageCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    """获取进程内共享的生图缓存，大小上限取自 AI 配置"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            from utils.ai_config import get_ai_config_manager
+            config = get_ai_config_manager().get_image_cache_config()
+            _shared_cache = ImageCache(max_bytes=int(config["image_cache_max_mb"] * 1024 * 1024))
+        return _shared_cache
@@ -0,0 +1,59 @@
+"""图片格式识别工具"""
+import os
+
+
+# 格式名 -> (常用扩展名, MIME 类型)
+IMAGE_FORMATS = {
+    "PNG": (".png", "image/png"),
+    "JPEG": (".jpg", "image/jpeg"),
+    "WEBP": (".webp", "image/webp"),
+    "GIF": (".gif", "image/gif"),
+    "BMP": (".bmp", "image/bmp"),
+}
+
+# 扩展名 -> 格式名
+_SUFFIX_FORMATS = {
+    ".png": "PNG",
+    ".jpg": "JPEG",
+    ".jpeg": "JPEG",
+    ".webp": "WEBP",
+    ".gif": "GIF",
+    ".bmp": "BMP",
+}
+
+
+def sniff_image_format(data: bytes) -> str | None:
+    """根据文件头识别图片格式，无法识别时返回 None"""
+    if not data:
+        return None
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if data[:2] == b"BM":
+        return "BMP"
+    return None
+
+
+def format_from_suffix(path: str, default: str = "PNG") -> str:
+    """根据保存路径的扩展名推断目标格式"""
+    suffix = os.path.splitext(path)[1].lower()
+    return _SUFFIX_FORMATS.get(suffix, default)
+
+
+def format_from_mime(mime_type: str) -> str | None:
+    """根据 MIME 类型获取格式名"""
+    mime_type = (mime_type or "").split(";")[0].strip().lower()
+    for name, (_, mime) in IMAGE_FORMATS.items():
+        if mime == mime_type:
+            return name
+    return None
+
+
+def suffix_for_format(format_name: str, default: str = ".png") -> str:
+    """获取格式对应的扩展名"""
+    return IMAGE_FORMATS.get(format_name, (default, None))[0]
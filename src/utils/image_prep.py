@@ -0,0 +1,183 @@
+"""参考图上传前的预处理：按最长边缩小、按 EXIF 方向旋转、去除元数据并重新压缩"""
+import os
+import base64
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import List, Optional
+
+from utils.image_format import IMAGE_FORMATS, format_from_suffix, sniff_image_format
+
+
+# 可选的上传格式；auto 表示有透明通道时用 PNG，否则用 JPEG
+UPLOAD_FORMATS = ("auto", "jpeg", "webp", "png")
+
+# 影响预处理结果的配置项，作为缓存键的一部分
+PREP_SETTING_KEYS = ("image_upload_max_edge", "image_upload_quality", "image_upload_format")
+
+
+class PreparedImage:
+    """预处理后的图片数据"""
+
+    def __init__(self, data: bytes, mime_type: str, original_size: int, reencoded: bool):
+        self.data = data
+        self.mime_type = mime_type
+        self.original_size = original_size
+        self.reencoded = reencoded
+        self._base64: Optional[str] = None
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_size - len(self.data)
+
+    @property
+    def base64(self) -> str:
+        """base64 编码后的数据（首次访问时编码，之后复用）"""
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode("utf-8")
+        return self._base64
+
+    @property
+    def memory_size(self) -> int:
+        """占用的内存字节数（原始数据 + 已生成的 base64）"""
+        return len(self.data) + len(self._base64 or "")
+
+
+def get_image_prep_settings() -> dict:
+    """读取当前配置中的预处理参数"""
+    from utils.ai_config import get_ai_config_manager
+    return get_ai_config_manager().get_image_prep_config()
+
+
+def _raw_image(data: bytes, path: str) -> PreparedImage:
+    """无法处理时原样上传，MIME 类型按文件头或扩展名判断"""
+    format_name = sniff_image_format(data) or format_from_suffix(path, default="JPEG")
+    mime_type = IMAGE_FORMATS.get(format_name, (None, "image/jpeg"))[1]
+    return PreparedImage(data, mime_type, len(data), reencoded=False)
+
+
+def prepare_image(path: str, settings: Optional[dict] = None) -> PreparedImage:
+    """
+    读取并预处理一张参考图
+
+    settings 包含 image_upload_max_edge（最长边像素）、image_upload_quality（JPEG/WEBP 质量）
+    和 image_upload_format（UPLOAD_FORMATS 之一），为空时读取 AI 配置。
+    重新编码后不比原图小、且原图无需缩放/旋转/去除元数据时，直接使用原图。
+    """
+    settings = settings or get_image_prep_settings()
+    with open(path, "rb") as f:
+        data = f.read()
+
+    try:
+        from PIL import Image, ImageOps
+
+        with Image.open(BytesIO(data)) as image:
+            source_format = image.format
+            max_edge = int(settings["image_upload_max_edge"])
+            needs_resize = max(image.size) > max_edge
+            needs_rotate = image.getexif().get(0x0112, 1) != 1
+            has_metadata = bool(image.info.get("exif") or image.info.get("icc_profile") or image.info.get("xmp"))
+
+            image = ImageOps.exif_transpose(image)
+            if needs_resize:
+                image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            target = settings.get("image_upload_format", "auto")
+            if target not in UPLOAD_FORMATS or target == "auto":
+                target = "png" if has_alpha else "jpeg"
+
+            quality = int(settings["image_upload_quality"])
+            buffer = BytesIO()
+            if target == "jpeg":
+                image.convert("RGB").save(buffer, "JPEG", quality=quality, optimize=True)
+            elif target == "webp":
+                image.convert("RGBA" if has_alpha else "RGB").save(buffer, "WEBP", quality=quality)
+            else:
+                if image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                    image = image.convert("RGBA" if has_alpha else "RGB")
+                image.save(buffer, "PNG", optimize=True)
+    except Exception as e:
+        print(f"参考图预处理失败，使用原图上传: {os.path.basename(path)}: {e}")
+        return _raw_image(data, path)
+
+    encoded = buffer.getvalue()
+    keep_original = (
+        len(encoded) >= len(data)
+        and not (needs_resize or needs_rotate or has_metadata)
+        and source_format in IMAGE_FORMATS
+    )
+    if keep_original:
+        return _raw_image(data, path)
+    return PreparedImage(encoded, IMAGE_FORMATS[target.upper()][1], len(data), reencoded=True)
+
+
+class PreparedImageCache:
+    """预处理结果缓存，OpenAI 与 Gemini 请求共用
+
+    以 (路径, mtime, 文件大小, 预处理参数) 为键，同一张参考图在多次请求中只读取、
+    压缩和 base64 编码一次；总占用超过 max_bytes 时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, PreparedImage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: str, settings: dict) -> tuple:
+        stat = os.stat(path)
+        prep = tuple(settings.get(name) for name in PREP_SETTING_KEYS)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, prep)
+
+    def get(self, path: str, settings: Optional[dict] = None) -> PreparedImage:
+        """取得预处理后的图片，未缓存时处理并加入缓存"""
+        settings = settings or get_image_prep_settings()
+        key = self._key(path, settings)
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+                return prepared
+        # 在锁外处理，避免大图阻塞其他线程的缓存命中
+        prepared = prepare_image(path, settings)
+        # 提前编码，使缓存中的条目可以直接用于请求
+        prepared.base64
+        with self._lock:
+            self._entries[key] = prepared
+            self._entries.move_to_end(key)
+            self._evict()
+        return prepared
+
+    def _evict(self):
+        """总占用超过上限时删除最久未使用的条目（至少保留最新的一条），调用方需持有锁"""
+        total = sum(item.memory_size for item in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, item = self._entries.popitem(last=False)
+            total -= item.memory_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_shared_cache: Optional[PreparedImageCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_prepared_image_cache() -> PreparedImageCache:
+    """获取进程内共享的预处理结果缓存，内存上限取自 AI 配置"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            from utils.ai_config import get_ai_config_manager
+            config = get_ai_config_manager().get_image_prep_config()
+            _shared_cache = PreparedImageCache(int(config["image_payload_cache_mb"] * 1024 * 1024))
+        return _shared_cache
+
+
+def describe_savings(prepared: List[PreparedImage]) -> str:
+    """汇总一次请求中参考图的压缩效果，例如 “参考图 3 张：12.4 MB → 1.1 MB” """
+    original = sum(item.original_size for item in prepared)
+    uploaded = sum(len(item.data) for item in prepared)
+    return f"参考图 {len(prepared)} 张：{original / 1024 / 1024:.1f} MB → {uploaded / 1024 / 1024:.1f} MB"
@@ -0,0 +1,237 @@
+"""预设索引：缓存预设文件的元数据，避免每次刷新都遍历并 stat 整个目录"""
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from utils.atomic_write import atomic_write
+from utils.resource_path import get_cache_dir
+
+
+# 索引格式版本，结构变化时递增，旧索引会被丢弃重建
+INDEX_VERSION = 1
+
+# 写入索引摘要的顶层字段
+SUMMARY_FIELDS = ("风格模式", "画面气质")
+
+# 目录未变化时，两次逐个 stat 校验全部条目的最短间隔（秒）
+SWEEP_INTERVAL = 600
+
+
+class PresetIndex:
+    """持久化的预设元数据索引
+
+    每个条目记录 name、path、mtime、size、hash 和顶层摘要字段。
+    保存/删除/重命名时由 PresetManager 增量更新。列出预设时只比较目录的 mtime，
+    目录未变化就直接使用索引；目录变化（新增或删除了文件）、force=True 或距上次校验
+    超过 SWEEP_INTERVAL 时才重新遍历目录，并只重新读取 (mtime, size) 变了的文件。
+    原地编辑不会改变目录 mtime，由 get() 在读取单个预设时按需校验。
+    PresetManager 自身的写入包在 own_write() 里，写入前索引与目录一致时直接推进
+    记录的目录 mtime，不会引发下一次的目录遍历。
+    """
+
+    def __init__(self, presets_dir: Path, index_path: Path = None):
+        self.presets_dir = Path(presets_dir)
+        self.index_path = index_path or self._default_index_path()
+        self._lock = threading.RLock()
+        self._entries: dict = {}
+        self._dir_mtime = None
+        self._last_sweep = time.monotonic()
+        self._loaded = False
+
+    def _default_index_path(self) -> Path:
+        """按预设目录区分索引文件，多个目录互不干扰"""
+        key = hashlib.sha1(str(self.presets_dir.resolve()).encode("utf-8")).hexdigest()[:12]
+        return get_cache_dir() / f"preset_index_{key}.json"
+
+    # ========== 持久化 ==========
+
+    def _load(self):
+        """从磁盘读取索引（仅首次调用时执行），调用方需持有锁"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION and data.get("presets_dir") == str(self.presets_dir):
+                self._entries = data.get("entries", {})
+                self._dir_mtime = data.get("dir_mtime")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"加载预设索引失败: {e}")
+
+    def _save(self):
+        """原子写入索引文件，调用方需持有锁"""
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(
+                self.index_path,
+                json.dumps(
+                    {
+                        "version": INDEX_VERSION,
+                        "presets_dir": str(self.presets_dir),
+                        "dir_mtime": self._dir_mtime,
+                        "entries": self._entries,
+                    },
+                    ensure_ascii=False,
+                ),
+            )
+        except Exception as e:
+            print(f"保存预设索引失败: {e}")
+
+    def _current_dir_mtime(self):
+        try:
+            return self.presets_dir.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    # ========== 条目构建 ==========
+
+    @staticmethod
+    def _summarize(data) -> dict:
+        """提取顶层摘要字段"""
+        if not isinstance(data, dict):
+            return {}
+        return {key: data[key] for key in SUMMARY_FIELDS if isinstance(data.get(key), str)}
+
+    def _build_entry(self, path: Path, st: os.stat_result, content: bytes = None, data=None) -> dict:
+        """根据文件内容构建索引条目；content/data 已知时不再重复读取解析"""
+        if content is None:
+            with open(path, "rb") as f:
+                content = f.read()
+        if data is None:
+            try:
+                data = json.loads(content.decode("utf-8"))
+            except Exception:
+                data = None
+        return {
+            "name": path.stem,
+            "path": str(path),
+            "mtime": st.st_mtime,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "hash": hashlib.sha1(content).hexdigest(),
+            "summary": self._summarize(data),
+        }
+
+    def _rescan(self) -> bool:
+        """目录有变化时重新对齐索引，只读取新增或 (mtime, size) 变化的文件；返回是否有改动"""
+        changed = False
+        seen = set()
+        with os.scandir(self.presets_dir) as it:
+            for item in it:
+                if not item.name.endswith(".json") or not item.is_file():
+                    continue
+                name = item.name[:-5]
+                seen.add(name)
+                try:
+                    st = item.stat()
+                    entry = self._entries.get(name)
+                    if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                        continue
+                    self._entries[name] = self._build_entry(Path(item.path), st)
+                    changed = True
+                except Exception:
+                    continue
+        for name in list(self._entries):
+            if name not in seen:
+                del self._entries[name]
+                changed = True
+        return changed
+
+    # ========== 对外接口 ==========
+
+    def entries(self, force: bool = False) -> list[dict]:
+        """获取所有条目；目录 mtime 未变化时直接返回缓存，force=True 时强制逐个校验"""
+        with self._lock:
+            self._load()
+            dir_mtime = self._current_dir_mtime()
+            if dir_mtime is None:
+                return []
+            now = time.monotonic()
+            if force or dir_mtime != self._dir_mtime or now - self._last_sweep >= SWEEP_INTERVAL:
+                self._last_sweep = now
+                changed = self._rescan()
+                if changed or dir_mtime != self._dir_mtime:
+                    self._dir_mtime = dir_mtime
+                    self._save()
+            return [dict(entry) for entry in self._entries.values()]
+
+    def get(self, name: str) -> dict | None:
+        """获取单个条目，并顺带校验该文件是否被外部修改"""
+        with self._lock:
+            self._load()
+            path = self.presets_dir / f"{name}.json"
+            try:
+                st = path.stat()
+            except OSError:
+                if self._entries.pop(name, None) is not None:
+                    self._save()
+                return None
+            entry = self._entries.get(name)
+            if not entry or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+                entry = self._build_entry(path, st)
+                self._entries[name] = entry
+                self._save()
+            return dict(entry)
+
+    @contextmanager
+    def own_write(self):
+        """包裹 PresetManager 自身对预设目录的写入
+
+        写入前记录的目录 mtime 与实际一致（索引已对齐）时，写入造成的目录变化都来自这次操作，
+        配合 update/remove/rename 的增量更新后可以直接推进记录的目录 mtime。
+        """
+        with self._lock:
+            self._load()
+            before = self._current_dir_mtime()
+            yield
+            after = self._current_dir_mtime()
+            if before is not None and before == self._dir_mtime and after != self._dir_mtime:
+                self._dir_mtime = after
+                self._save()
+
+    def update(self, path: Path, content: bytes = None, data=None):
+        """文件被写入后更新对应条目"""
+        path = Path(path)
+        with self._lock:
+            self._load()
+            try:
+                st = path.stat()
+                self._entries[path.stem] = self._build_entry(path, st, content, data)
+            except Exception as e:
+                print(f"更新预设索引失败: {e}")
+                return
+            self._save()
+
+    def remove(self, name: str):
+        """文件被删除后移除对应条目"""
+        with self._lock:
+            self._load()
+            self._entries.pop(name, None)
+            self._save()
+
+    def rename(self, old_name: str, new_name: str):
+        """文件被重命名后迁移对应条目（内容未变，无需重新读取）"""
+        with self._lock:
+            self._load()
+            entry = self._entries.pop(old_name, None)
+            new_path = self.presets_dir / f"{new_name}.json"
+            if entry is not None:
+                try:
+                    st = new_path.stat()
+                    entry.update(
+                        name=new_name,
+                        path=str(new_path),
+                        mtime=st.st_mtime,
+                        mtime_ns=st.st_mtime_ns,
+                        size=st.st_size,
+                    )
+                    self._entries[new_name] = entry
+                except OSError:
+                    pass
+            self._save()
@@ -1,35 +1,49 @@
 """预设管理器"""
 import os
 import json
+import hashlib
 from pathlib import Path
 from datetime import datetime
 from utils.resource_path import get_presets_dir
+from utils.preset_index import PresetIndex
+from utils.preset_search import PresetSearchIndex
 
 
 class PresetManager:
     """管理提示词预设的保存和加载"""
 
-    def __init__(self):
-        self.presets_dir = get_presets_dir()
+    def __init__(self, presets_dir: Path = None):
+        self.presets_dir = Path(presets_dir) if presets_dir else get_presets_dir()
         self._ensure_dir_exists()
+        self.index = PresetIndex(self.presets_dir)
+        self.search_index = PresetSearchIndex(self.presets_dir)
+        # 搜索索引随保存/删除/重命名增量更新，只在首次列出和强制刷新时与预设索引整体对齐
+        self._search_synced = False
 
     def _ensure_dir_exists(self):
         """确保预设目录存在"""
         self.presets_dir.mkdir(parents=True, exist_ok=True)
 
-    def get_all_presets(self) -> list[dict]:
-        """获取所有预设列表，返回 [{name, path, modified_time}, ...]"""
+    def get_all_presets(self, refresh: bool = False) -> list[dict]:
+        """获取所有预设列表，返回 [{name, path, modified_time, size, summary}, ...]
+
+        列表来自预设索引，目录未变化时不会逐个 stat 文件；refresh=True 时强制重新校验。
+        首次调用和 refresh=True 时顺带用同一份条目对齐搜索索引。
+        """
+        entries = self.index.entries(force=refresh)
+        if refresh or not self._search_synced:
+            # 只有新增或内容变化的预设需要重新分词
+            self.search_index.sync(entries)
+            self._search_synced = True
         presets = []
-        for file in self.presets_dir.glob("*.json"):
-            try:
-                stat = file.stat()
-                presets.append({
-                    "name": file.stem,
-                    "path": str(file),
-                    "modified_time": datetime.fromtimestamp(stat.st_mtime),
-                })
-            except Exception:
-                continue
+        for entry in entries:
+            presets.append({
+                "name": entry["name"],
+                "path": entry["path"],
+                "modified_time": datetime.fromtimestamp(entry["mtime"]),
+                "size": entry["size"],
+                "summary": entry["summary"],
+            })
         # 按修改时间倒序排列
         presets.sort(key=lambda x: x["modified_time"], reverse=True)
         return presets
@@ -43,18 +57,33 @@ class PresetManager:
                 safe_name = f"preset_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             
             file_path = self.presets_dir / f"{safe_name}.json"
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            content = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+            with self.index.own_write():
+                with open(file_path, "wb") as f:
+                    f.write(content)
+                self.index.update(file_path, content=content, data=data)
+            self.search_index.update(file_path.stem, hashlib.sha1(content).hexdigest(), data)
             return True
         except Exception as e:
             print(f"保存预设失败: {e}")
             return False
 
+    def search_presets(self, query: str, field: str = None) -> list[dict]:
+        """按字段内容搜索预设，返回 [{name, fields: {字段路径: 值}}, ...]
+
+        :param query: 查询文本，子串匹配
+        :param field: 可选的字段路径过滤，如 "场景.环境.地点设定"
+        """
+        if not self._search_synced:
+            self.get_all_presets()
+        return self.search_index.search(query, field)
+
     def load_preset(self, name: str) -> dict | None:
         """加载预设"""
         try:
             file_path = self.presets_dir / f"{name}.json"
-            if file_path.exists():
+            # 顺带校验索引条目，外部修改过的预设在这里被重新索引
+            if self.index.get(name) is not None:
                 with open(file_path, "r", encoding="utf-8") as f:
                     return json.load(f)
         except Exception as e:
@@ -66,7 +95,10 @@ class PresetManager:
         try:
             file_path = self.presets_dir / f"{name}.json"
             if file_path.exists():
-                file_path.unlink()
+                with self.index.own_write():
+                    file_path.unlink()
+                    self.index.remove(name)
+                self.search_index.remove(name)
                 return True
         except Exception as e:
             print(f"删除预设失败: {e}")
@@ -78,7 +110,10 @@ class PresetManager:
             old_path = self.presets_dir / f"{old_name}.json"
             new_path = self.presets_dir / f"{new_name}.json"
             if old_path.exists() and not new_path.exists():
-                old_path.rename(new_path)
+                with self.index.own_write():
+                    old_path.rename(new_path)
+                    self.index.rename(old_name, new_name)
+                self.search_index.rename(old_name, new_name)
                 return True
         except Exception as e:
             print(f"重命名预设失败: {e}")
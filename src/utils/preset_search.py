@@ -0,0 +1,270 @@
+"""预设全文搜索：基于 n-gram 倒排索引，支持中英文混合内容"""
+import json
+import atexit
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from utils.atomic_write import atomic_write
+from utils.resource_path import get_cache_dir
+
+
+# 索引格式版本，结构或分词规则变化时递增，旧索引会被丢弃重建
+SEARCH_INDEX_VERSION = 1
+
+
+def normalize_text(text: str) -> str:
+    """统一全角/半角与大小写，便于匹配"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text: str) -> set[str]:
+    """把文本切成单字和相邻二元组
+
+    中文没有空格分词，按字符 n-gram 切分即可覆盖任意子串查询；
+    标点和空白作为分隔符，不跨越它们生成二元组。
+    """
+    tokens = set()
+    run = []
+    for ch in normalize_text(text) + " ":
+        if ch.isalnum():
+            run.append(ch)
+            continue
+        tokens.update(run)
+        tokens.update(run[i] + run[i + 1] for i in range(len(run) - 1))
+        run = []
+    return tokens
+
+
+def query_tokens(query: str) -> set[str]:
+    """查询分词：能用二元组就不用单字，候选集更小"""
+    tokens = tokenize(query)
+    bigrams = {t for t in tokens if len(t) == 2}
+    return bigrams or tokens
+
+
+def flatten_fields(data, prefix: str = "") -> dict:
+    """把嵌套的预设数据展平为 {"场景.环境.地点设定": "文本"}"""
+    fields = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            path = f"{prefix}.{key}" if prefix else str(key)
+            fields.update(flatten_fields(value, path))
+    elif isinstance(data, list):
+        text = ", ".join(str(item) for item in data if item not in (None, ""))
+        if text:
+            fields[prefix] = text
+    elif data not in (None, ""):
+        fields[prefix] = str(data)
+    return fields
+
+
+class PresetSearchIndex:
+    """持久化的预设倒排索引
+
+    postings: token -> 包含该 token 的预设名集合；docs 保存每个预设展平后的字段，
+    用于对候选结果做子串校验并返回命中的字段路径。以内容 hash 判断是否需要重建条目。
+    修改只更新内存，在 SAVE_DELAY 秒内合并后由后台线程写回，不阻塞界面线程；
+    需要立即落盘时调用 flush()。
+    """
+
+    # 写回延迟（秒）：连续保存多个预设只写一次磁盘
+    SAVE_DELAY = 1.0
+
+    def __init__(self, presets_dir: Path, index_path: Path = None):
+        self.presets_dir = Path(presets_dir)
+        self.index_path = index_path or self._default_index_path()
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._save_timer: threading.Timer | None = None
+        self._dirty = False
+        self._docs: dict = {}
+        self._postings: dict[str, set] = {}
+        self._loaded = False
+        # 进程退出前写回尚未落盘的修改
+        atexit.register(self.flush)
+
+    def _default_index_path(self) -> Path:
+        key = hashlib.sha1(str(self.presets_dir.resolve()).encode("utf-8")).hexdigest()[:12]
+        return get_cache_dir() / f"preset_search_{key}.json"
+
+    # ========== 持久化 ==========
+
+    def _load(self):
+        """从磁盘读取索引（仅首次调用时执行），调用方需持有锁"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == SEARCH_INDEX_VERSION and data.get("presets_dir") == str(self.presets_dir):
+                self._docs = data.get("docs", {})
+                self._postings = {token: set(names) for token, names in data.get("postings", {}).items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"加载预设搜索索引失败: {e}")
+
+    def _schedule_save(self):
+        """标记为待写回，并重新开始延迟计时，调用方需持有锁"""
+        self._dirty = True
+        if self._save_timer:
+            self._save_timer.cancel()
+        self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def flush(self):
+        """立即写回尚未落盘的修改
+
+        与 YamlHandler.flush 相同，快照和写盘在同一次 _write_lock 内完成，
+        避免较早的快照覆盖较晚的修改。
+        """
+        with self._write_lock:
+            with self._lock:
+                if self._save_timer:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                text = json.dumps(
+                    {
+                        "version": SEARCH_INDEX_VERSION,
+                        "presets_dir": str(self.presets_dir),
+                        "docs": self._docs,
+                        "postings": {token: sorted(names) for token, names in self._postings.items()},
+                    },
+                    ensure_ascii=False,
+                )
+                self._dirty = False
+            try:
+                self.index_path.parent.mkdir(parents=True, exist_ok=True)
+                atomic_write(self.index_path, text)
+            except Exception as e:
+                print(f"保存预设搜索索引失败: {e}")
+
+    # ========== 条目维护 ==========
+
+    def _add_doc(self, name: str, content_hash: str, data):
+        """建立单个预设的索引，调用方需持有锁"""
+        fields = flatten_fields(data)
+        self._docs[name] = {"hash": content_hash, "fields": fields}
+        tokens = set()
+        for value in fields.values():
+            tokens |= tokenize(value)
+        for token in tokens:
+            self._postings.setdefault(token, set()).add(name)
+
+    def _remove_doc(self, name: str):
+        """移除单个预设的索引，调用方需持有锁"""
+        doc = self._docs.pop(name, None)
+        if not doc:
+            return
+        tokens = set()
+        for value in doc["fields"].values():
+            tokens |= tokenize(value)
+        for token in tokens:
+            names = self._postings.get(token)
+            if names:
+                names.discard(name)
+                if not names:
+                    del self._postings[token]
+
+    def _read_preset(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def sync(self, entries: list[dict]):
+        """按 PresetIndex 的条目对齐：只重建 hash 变化或新增的预设，移除已删除的预设"""
+        with self._lock:
+            self._load()
+            changed = False
+            current = {}
+            for entry in entries:
+                current[entry["name"]] = entry
+            for name in list(self._docs):
+                if name not in current:
+                    self._remove_doc(name)
+                    changed = True
+            for name, entry in current.items():
+                doc = self._docs.get(name)
+                if doc and doc["hash"] == entry["hash"]:
+                    continue
+                self._remove_doc(name)
+                self._add_doc(name, entry["hash"], self._read_preset(entry["path"]))
+                changed = True
+            if changed:
+                self._schedule_save()
+
+    def update(self, name: str, content_hash: str, data):
+        """预设被保存后更新对应条目"""
+        with self._lock:
+            self._load()
+            self._remove_doc(name)
+            self._add_doc(name, content_hash, data)
+            self._schedule_save()
+
+    def remove(self, name: str):
+        """预设被删除后移除对应条目"""
+        with self._lock:
+            self._load()
+            self._remove_doc(name)
+            self._schedule_save()
+
+    def rename(self, old_name: str, new_name: str):
+        """预设被重命名后迁移对应条目"""
+        with self._lock:
+            self._load()
+            doc = self._docs.get(old_name)
+            if doc is None:
+                return
+            self._remove_doc(old_name)
+            self._remove_doc(new_name)
+            self._docs[new_name] = doc
+            for value in doc["fields"].values():
+                for token in tokenize(value):
+                    self._postings.setdefault(token, set()).add(new_name)
+            self._schedule_save()
+
+    # ========== 查询 ==========
+
+    def search(self, query: str, field: str = None) -> list[dict]:
+        """搜索预设，返回 [{name, fields: {字段路径: 值}}, ...]
+
+        :param query: 查询文本，按子串匹配（忽略大小写与全半角差异）
+        :param field: 可选的字段路径，如 "场景.环境.地点设定"，也可只写前缀 "场景"
+        """
+        needle = normalize_text(query).strip()
+        if not needle:
+            return []
+        tokens = query_tokens(needle)
+        with self._lock:
+            self._load()
+            if tokens:
+                # 从最短的倒排列表开始求交集
+                postings = sorted((self._postings.get(t, set()) for t in tokens), key=len)
+                candidates = set(postings[0])
+                for names in postings[1:]:
+                    candidates &= names
+                    if not candidates:
+                        break
+            else:
+                # 查询中只有标点等不入索引的字符，退化为逐个校验
+                candidates = set(self._docs)
+
+            results = []
+            for name in candidates:
+                matched = {}
+                for path, value in self._docs[name]["fields"].items():
+                    if field and path != field and not path.startswith(field + "."):
+                        continue
+                    if needle in normalize_text(value):
+                        matched[path] = value
+                if matched:
+                    results.append({"name": name, "fields": matched})
+        results.sort(key=lambda r: (-len(r["fields"]), r["name"]))
+        return results
@@ -0,0 +1,148 @@
+"""提示词构建：表单字段与 JSON 提示词之间的转换（不依赖 Qt，可在命令行中使用）"""
+import json
+
+
+# 表单字段 -> JSON 中的键路径（顺序即生成 JSON 的键顺序）
+FIELD_PATHS = {
+    # 1. 基础设置
+    "风格模式": ("风格模式",),
+    "画面气质": ("画面气质",),
+    # 2. 场景设置
+    "地点设定": ("场景", "环境", "地点设定"),
+    "光线": ("场景", "环境", "光线"),
+    "天气氛围": ("场景", "环境", "天气氛围"),
+    "整体描述": ("场景", "主体", "整体描述"),
+    "身材": ("场景", "主体", "外形特征", "身材"),
+    "面部": ("场景", "主体", "外形特征", "面部"),
+    "头发": ("场景", "主体", "外形特征", "头发"),
+    "眼睛": ("场景", "主体", "外形特征", "眼睛"),
+    "情绪": ("场景", "主体", "表情与动作", "情绪"),
+    "动作": ("场景", "主体", "表情与动作", "动作"),
+    "穿着": ("场景", "主体", "服装", "穿着"),
+    "服装细节": ("场景", "主体", "服装", "细节"),
+    "配饰": ("场景", "主体", "配饰"),
+    "背景描述": ("场景", "背景", "描述"),
+    "景深": ("场景", "背景", "景深"),
+    # 3. 相机与构图
+    "机位角度": ("相机", "机位角度"),
+    "构图": ("相机", "构图"),
+    "镜头特性": ("相机", "镜头特性"),
+    "传感器画质": ("相机", "传感器画质"),
+    # 4. 审美控制
+    "呈现意图": ("审美控制", "呈现意图"),
+    "材质真实度": ("审美控制", "材质真实度"),
+    "整体色调": ("审美控制", "色彩风格", "整体色调"),
+    "对比度": ("审美控制", "色彩风格", "对比度"),
+    "特殊效果": ("审美控制", "色彩风格", "特殊效果"),
+    # 5. 反向提示词（仅启用时输出）
+    "禁止元素": ("反向提示词", "禁止元素"),
+    "禁止风格": ("反向提示词", "禁止风格"),
+}
+
+# 只有启用反向提示词时才写入 JSON 的字段（多选，值为列表）
+NEGATIVE_FIELDS = ("禁止元素", "禁止风格")
+
+# 预设中以列表保存、表单中以逗号分隔文本编辑的字段
+LIST_TEXT_FIELDS = ("材质真实度",)
+
+# 预设中缺失某个键时的标记，表示“不覆盖表单当前值”
+MISSING = object()
+
+
+def list_to_str(value) -> str:
+    """列表转逗号分隔的字符串"""
+    if isinstance(value, list):
+        return ", ".join(str(item) for item in value if item)
+    return str(value) if value else ""
+
+
+def get_path(data, path):
+    """按键路径取值，缺失时返回 MISSING"""
+    cur = data
+    for key in path:
+        if not isinstance(cur, dict) or key not in cur:
+            return MISSING
+        cur = cur[key]
+    return cur
+
+
+def field_json_value(field_name: str, raw_value):
+    """把表单控件中的值转换为 JSON 中的值"""
+    if field_name in NEGATIVE_FIELDS:
+        # 多选字段直接使用列表
+        return list(raw_value) if raw_value else []
+    value = raw_value or ""
+    if field_name in LIST_TEXT_FIELDS:
+        # 材质真实度按逗号拆分为列表
+        items = [m.strip() for m in value.split(",") if m.strip()] if value else []
+        return items if items else [value]
+    return value
+
+
+def build_prompt_data(form_values: dict, negative_enabled: bool) -> dict:
+    """根据表单值组织成目标 JSON 结构
+
+    :param form_values: 字段名 -> 表单中的值（文本或多选列表），缺失的字段按空值处理
+    :param negative_enabled: 是否启用反向提示词
+    """
+    data = {}
+    # 按 FIELD_PATHS 的顺序组织数据
+    for field_name, path in FIELD_PATHS.items():
+        # 仅当启用反向提示词时才添加
+        if field_name in NEGATIVE_FIELDS and not negative_enabled:
+            continue
+        node = data
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = field_json_value(field_name, form_values.get(field_name))
+    return data
+
+
+def form_values_from_preset(data: dict, multi_select_options: dict = None) -> dict:
+    """从预设数据中取出要填入表单的值；预设里不存在的键不出现在结果中
+
+    :param multi_select_options: 多选字段的可选项（字段名 -> 列表）。提供时按表单的行为
+        只保留可选项中存在的值，并按可选项的顺序排列
+    """
+    values = {}
+    for field_name, path in FIELD_PATHS.items():
+        value = get_path(data, path)
+        if value is MISSING:
+            continue
+        if field_name in NEGATIVE_FIELDS:
+            value = list(value) if isinstance(value, list) else []
+            if multi_select_options and field_name in multi_select_options:
+                value = [opt for opt in multi_select_options[field_name] if opt in value]
+            values[field_name] = value
+        elif field_name in LIST_TEXT_FIELDS:
+            values[field_name] = list_to_str(value)
+        else:
+            # 与输入框一致：取值时去掉首尾空白
+            values[field_name] = "" if value is None else str(value).strip()
+    return values
+
+
+def negative_enabled_from_preset(data: dict):
+    """预设提供反向提示词块时返回是否启用，未提供时返回 None（保持表单原状态）"""
+    negative_data = data.get("反向提示词", MISSING)
+    if negative_data is MISSING or not isinstance(negative_data, dict):
+        return None
+    return bool(negative_data.get("禁止元素") or negative_data.get("禁止风格"))
+
+
+def build_prompt_text(prompt_data: dict, special_requirement: str = "") -> str:
+    """把 JSON 提示词序列化，并追加特别要求"""
+    prompt_text = json.dumps(prompt_data, ensure_ascii=False, indent=2)
+    special_requirement = (special_requirement or "").strip()
+    if special_requirement:
+        prompt_text = prompt_text + "\n\n特别要求：" + special_requirement
+    return prompt_text
+
+
+def build_prompt_from_preset(
+    data: dict, special_requirement: str = "", multi_select_options: dict = None
+) -> str:
+    """按“空白表单加载预设后点击生成”的方式构建提示词文本"""
+    values = form_values_from_preset(data, multi_select_options)
+    negative_enabled = bool(negative_enabled_from_preset(data))
+    return build_prompt_text(build_prompt_data(values, negative_enabled), special_requirement)
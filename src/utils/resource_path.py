@@ -37,6 +37,11 @@ def get_presets_dir() -> Path:
     return get_resource_path("presets")
 
 
+def get_cache_dir() -> Path:
+    """获取本地缓存目录路径（索引等可重建的数据）"""
+    return get_resource_path("cache")
+
+
 def get_images_dir() -> Path:
     """获取图片目录路径"""
     if getattr(sys, 'frozen', False):
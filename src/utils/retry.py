@@ -0,0 +1,241 @@
+"""接口调用的重试与限流：指数退避 + 抖动、遵循 Retry-After、按 API 地址的令牌桶"""
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+
+# 可重试的 HTTP 状态码：超时、冲突、限流和服务端临时错误
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Retry-After 允许的最长等待（秒），超过时按该值等待
+MAX_RETRY_AFTER = 120.0
+
+
+def get_status_code(exc: Exception) -> Optional[int]:
+    """从 openai / google-genai / httpx 的异常中取出 HTTP 状态码"""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """判断异常是否值得重试：限流、服务端临时错误、连接失败或超时"""
+    status = get_status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    # openai.APIConnectionError / APITimeoutError、httpx.ConnectError / ReadTimeout 等
+    name = type(exc).__name__
+    return any(key in name for key in ("Connection", "Connect", "Timeout", "RemoteProtocol"))
+
+
+def get_retry_after(exc: Exception) -> Optional[float]:
+    """读取响应头中的 Retry-After（秒数或 HTTP 日期），没有时返回 None"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value:
+            return max(0.0, float(value) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def describe_retry(attempt: int, max_attempts: int, delay: float, exc: Exception) -> str:
+    """生成重试提示文字，用于界面进度显示"""
+    reason = "请求过于频繁" if get_status_code(exc) == 429 else "请求失败"
+    return f"{reason}，{delay:.0f} 秒后重试 ({attempt}/{max_attempts})..."
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，最多允许 capacity 个突发请求"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """预留一个令牌，返回需要等待的秒数（0 表示可立即执行）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def penalize(self, seconds: float):
+        """收到限流响应时清空令牌，让同一地址的其他请求也一起等待"""
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class RetryMetrics:
+    """重试统计：调用次数、重试次数、最终失败次数和因限流/退避等待的总时间"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict[str, dict] = {}
+
+    def _entry(self, endpoint: str) -> dict:
+        return self._data.setdefault(
+            endpoint,
+            {"calls": 0, "retries": 0, "failures": 0, "rate_limited": 0, "throttled_seconds": 0.0},
+        )
+
+    def record(self, endpoint: str, **increments):
+        with self._lock:
+            entry = self._entry(endpoint)
+            for key, value in increments.items():
+                entry[key] += value
+
+    def snapshot(self) -> dict:
+        """返回 {endpoint: {...}} 的副本，另含汇总项 "total" """
+        with self._lock:
+            result = {endpoint: dict(entry) for endpoint, entry in self._data.items()}
+        total = {"calls": 0, "retries": 0, "failures": 0, "rate_limited": 0, "throttled_seconds": 0.0}
+        for entry in result.values():
+            for key in total:
+                total[key] += entry[key]
+        result["total"] = total
+        return result
+
+
+class RetryCancelled(Exception):
+    """等待重试期间被取消"""
+
+
+class RetryScheduler:
+    """带限流的重试调度器，Gemini 与 OpenAI 调用共用
+
+    每次调用前先从对应 API 地址的令牌桶取令牌；失败时若可重试，
+    按 Retry-After 或指数退避（full jitter）等待后再试。
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        rate_per_minute: float = 60,
+        burst: float = 10,
+    ):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.metrics = RetryMetrics()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(endpoint)
+            if bucket is None:
+                bucket = TokenBucket(self.rate_per_minute / 60.0, self.burst)
+                self._buckets[endpoint] = bucket
+            return bucket
+
+    def backoff_delay(self, attempt: int) -> float:
+        """第 attempt 次重试的退避时间（full jitter）"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    @staticmethod
+    def _sleep(seconds: float, cancelled: Optional[Callable[[], bool]]):
+        """分段等待，期间可被取消"""
+        deadline = time.monotonic() + seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if cancelled and cancelled():
+                raise RetryCancelled("已取消")
+            time.sleep(min(remaining, 0.2))
+
+    def call(
+        self,
+        endpoint: str,
+        func: Callable,
+        *args,
+        on_retry: Optional[Callable[[int, float, Exception], None]] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+        **kwargs,
+    ):
+        """
+        调用 func(*args, **kwargs)，失败时按策略重试
+
+        :param endpoint: API 地址，用于区分令牌桶与统计
+        :param on_retry: 每次重试前回调 (下一次尝试序号, 等待秒数, 异常)
+        :param cancelled: 返回 True 时停止等待并抛出 RetryCancelled
+        """
+        endpoint = (endpoint or "").rstrip("/")
+        bucket = self._bucket(endpoint)
+        attempt = 1
+        while True:
+            wait = bucket.reserve()
+            if wait > 0:
+                self.metrics.record(endpoint, throttled_seconds=wait)
+                self._sleep(wait, cancelled)
+            self.metrics.record(endpoint, calls=1)
+            try:
+                return func(*args, **kwargs)
+            except Exception as exc:
+                if attempt >= self.max_attempts or not is_retryable(exc):
+                    self.metrics.record(endpoint, failures=1)
+                    raise
+                retry_after = get_retry_after(exc)
+                if get_status_code(exc) == 429:
+                    self.metrics.record(endpoint, rate_limited=1)
+                if retry_after is not None:
+                    delay = min(retry_after, MAX_RETRY_AFTER)
+                    bucket.penalize(delay)
+                else:
+                    delay = self.backoff_delay(attempt)
+                attempt += 1
+                self.metrics.record(endpoint, retries=1, throttled_seconds=delay)
+                if on_retry:
+                    on_retry(attempt, delay, exc)
+                self._sleep(delay, cancelled)
+
+
+_shared_scheduler: Optional[RetryScheduler] = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_retry_scheduler() -> RetryScheduler:
+    """获取进程内共享的重试调度器，首次调用时按 AI 配置创建"""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            from utils.ai_config import get_ai_config_manager
+            config = get_ai_config_manager().get_retry_config()
+            _shared_scheduler = RetryScheduler(
+                max_attempts=config["retry_max_attempts"],
+                base_delay=config["retry_base_delay"],
+                max_delay=config["retry_max_delay"],
+                rate_per_minute=config["rate_limit_per_minute"],
+                burst=config["rate_limit_burst"],
+            )
+        return _shared_scheduler
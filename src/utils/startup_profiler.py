@@ -0,0 +1,172 @@
+"""启动耗时分析：记录模块导入、各构建阶段和首次绘制的时间线（python main.py --profile-startup）"""
+import sys
+import json
+import time
+import builtins
+import platform
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+
+# 时间线文件格式版本，字段变化时递增
+TIMELINE_VERSION = 1
+
+# 摘要中列出的最慢模块数量
+SUMMARY_TOP_IMPORTS = 15
+
+
+class StartupProfiler:
+    """启动时间线记录器
+
+    默认不启用，section / mark 均为空操作；start() 后替换 builtins.__import__，
+    记录主线程中每个模块首次导入的耗时（含其子模块，嵌套深度记在 depth 中），
+    并记录 section() 包裹的构建阶段。finish() 恢复导入函数并写出 JSON 时间线和文字摘要。
+    所有时间均为相对 start 时刻的毫秒数。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events: list = []
+        self._origin = 0.0
+        self._thread_id = None
+        self._original_import = None
+        self._import_hook = None
+        self._import_depth = 0
+
+    def start(self, origin: Optional[float] = None):
+        """开始记录；origin 为 time.perf_counter() 表示的进程起点，早于此刻的耗时记为一个整体"""
+        if self.enabled:
+            return
+        now = time.perf_counter()
+        self._origin = origin if origin is not None else now
+        self._thread_id = threading.get_ident()
+        self.enabled = True
+        if now > self._origin:
+            self._add("启动分析器之前", "setup", self._origin, now)
+        self._original_import = builtins.__import__
+        # 绑定方法每次取属性都是新对象，保存一份以便 stop() 时判断是否仍是本分析器的钩子
+        self._import_hook = self._timed_import
+        builtins.__import__ = self._import_hook
+
+    def _add(self, name: str, category: str, start: float, end: float, depth: int = 0):
+        self.events.append({
+            "name": name,
+            "category": category,
+            "start_ms": round((start - self._origin) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+            "depth": depth,
+        })
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        # 只统计主线程中的首次绝对导入，已加载的模块只是一次字典查找
+        if level or name in sys.modules or threading.get_ident() != self._thread_id:
+            return original(name, globals, locals, fromlist, level)
+        depth = self._import_depth
+        self._import_depth += 1
+        index = len(self.events)
+        self.events.append(None)  # 占位，保证父模块排在子模块之前
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            end = time.perf_counter()
+            self._import_depth = depth
+            self._add(name, "import", start, end, depth)
+            self.events[index] = self.events.pop()
+
+    @contextmanager
+    def section(self, name: str, category: str = "ui"):
+        """记录一个构建阶段的耗时；未启用时不做任何事"""
+        if not self.enabled:
+            yield
+            return
+        index = len(self.events)
+        self.events.append(None)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, category, start, time.perf_counter())
+            self.events[index] = self.events.pop()
+
+    def mark(self, name: str, category: str = "mark"):
+        """记录一个时间点（如首次绘制）"""
+        if self.enabled:
+            now = time.perf_counter()
+            self._add(name, category, now, now)
+
+    def stop(self):
+        """停止记录并恢复原来的导入函数"""
+        if self._import_hook is not None and builtins.__import__ is self._import_hook:
+            builtins.__import__ = self._original_import
+        self._import_hook = None
+        self.enabled = False
+
+    # ========== 输出 ==========
+
+    def timeline(self, meta: dict = None) -> dict:
+        """生成可保存的时间线数据"""
+        events = [event for event in self.events if event is not None]
+        total = max((event["start_ms"] + event["duration_ms"] for event in events), default=0.0)
+        imports = [event for event in events if event["category"] == "import" and event["depth"] == 0]
+        return {
+            "version": TIMELINE_VERSION,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            **(meta or {}),
+            "total_ms": round(total, 3),
+            "import_ms": round(sum(event["duration_ms"] for event in imports), 3),
+            "events": events,
+        }
+
+    def summary(self, timeline: dict = None) -> str:
+        """生成文字摘要：总耗时、各构建阶段和最慢的模块导入"""
+        timeline = timeline or self.timeline()
+        events = timeline["events"]
+        lines = [
+            f"启动总耗时: {timeline['total_ms']:.0f} ms（顶层模块导入合计 {timeline['import_ms']:.0f} ms）",
+            "",
+            "阶段:",
+        ]
+        for event in events:
+            if event["category"] != "import":
+                lines.append(
+                    f"  {event['start_ms']:8.1f} ms  +{event['duration_ms']:7.1f} ms  {event['name']}"
+                )
+        slowest = sorted(
+            (event for event in events if event["category"] == "import"),
+            key=lambda event: event["duration_ms"],
+            reverse=True,
+        )[:SUMMARY_TOP_IMPORTS]
+        lines += ["", f"最慢的 {len(slowest)} 个模块导入（含子模块）:"]
+        for event in slowest:
+            lines.append(f"  {event['duration_ms']:8.1f} ms  {'  ' * event['depth']}{event['name']}")
+        return "\n".join(lines)
+
+    def finish(self, path: Path, meta: dict = None) -> str:
+        """停止记录，将时间线写入 path（JSON）并在同名 .txt 中写入摘要，返回摘要"""
+        self.stop()
+        path = Path(path)
+        timeline = self.timeline(meta)
+        text = self.summary(timeline)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(timeline, f, ensure_ascii=False, indent=2)
+            path.with_suffix(".txt").write_text(text + "\n", encoding="utf-8")
+        except Exception as e:
+            print(f"写入启动分析结果失败: {e}")
+        return text
+
+
+_profiler = StartupProfiler()
+
+
+def get_startup_profiler() -> StartupProfiler:
+    """获取进程内共享的启动分析器（未启用时所有记录均为空操作）"""
+    return _profiler
@@ -0,0 +1,202 @@
+"""增量 JSON 解析：边接收流式输出边检查语法，并在顶层字段结束时立即给出其值"""
+import json
+from typing import Any, List, Optional, Tuple
+
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_CHARS = set("0123456789+-.eEtrufalsn")
+
+
+class StreamJSONError(ValueError):
+    """流式输出中出现了无法恢复的语法错误"""
+
+
+class IncrementalJSONParser:
+    """
+    增量 JSON 对象解析器
+
+    每次 feed 一段文本，返回这段文本中新完成的顶层字段 [(键, 值), ...]。
+    解析器按字符维护语法状态（容器栈、字符串/转义、期待的下一个记号），
+    一旦出现不可能构成合法 JSON 的字符即记录 error，调用方可以立刻取消并重试，
+    无需等整个流结束。允许 AI 常见的 ```json 代码块包裹。
+
+    用法：
+        parser = IncrementalJSONParser()
+        for key, value in parser.feed(chunk):
+            ...
+        if parser.error: ...
+        if parser.done: data = parser.value
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields: dict = {}
+        self.error: Optional[str] = None
+        self.done = False
+        self._pos = 0
+        # 容器栈，每项为 [类型 "{" 或 "[", 期待的记号]
+        self._stack: List[list] = []
+        self._started = False
+        self._in_fence_header = False
+        self._in_string = False
+        self._escape = False
+        self._unicode_left = 0
+        self._string_is_key = False
+        self._scalar_start: Optional[int] = None
+        self._top_key: Optional[str] = None
+        self._key_start = 0
+        self._value_start = 0
+
+    @property
+    def value(self) -> Any:
+        """解析完成后的完整对象（未完成时为 None）"""
+        return dict(self.fields) if self.done else None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """追加一段文本，返回新完成的顶层字段；出错后不再解析"""
+        if self.error:
+            return []
+        start = len(self.text)
+        self.text += chunk
+        completed: List[Tuple[str, Any]] = []
+        try:
+            for index in range(start, len(self.text)):
+                self._pos = index
+                self._step(self.text[index], completed)
+        except StreamJSONError as e:
+            self.error = f"第 {self._pos + 1} 个字符处: {e}"
+        return completed
+
+    # ========== 状态机 ==========
+
+    def _fail(self, message: str):
+        raise StreamJSONError(message)
+
+    def _step(self, ch: str, completed: list):
+        if self._in_fence_header:
+            # 跳过 ```json 所在行
+            if ch == "\n":
+                self._in_fence_header = False
+            return
+        if not self._started:
+            if ch in _WHITESPACE:
+                return
+            if ch == "`":
+                self._in_fence_header = True
+                return
+            if ch != "{":
+                self._fail("回复不是以 { 开头的 JSON 对象")
+            self._started = True
+            self._stack.append(["{", "key_or_end"])
+            return
+        if self.done:
+            # 结束后只允许空白和代码块结尾的 ```
+            if ch not in _WHITESPACE and ch != "`":
+                self._fail("JSON 结束后出现多余内容")
+            return
+        if self._in_string:
+            self._step_string(ch, completed)
+            return
+        if self._scalar_start is not None:
+            if ch in _SCALAR_CHARS:
+                return
+            self._finish_scalar(completed)
+        self._step_token(ch, completed)
+
+    def _step_string(self, ch: str, completed: list):
+        if self._unicode_left:
+            if ch not in "0123456789abcdefABCDEF":
+                self._fail("\\u 转义后需要 4 位十六进制数")
+            self._unicode_left -= 1
+        elif self._escape:
+            if ch == "u":
+                self._unicode_left = 4
+            elif ch not in '"\\/bfnrt':
+                self._fail(f"无效的转义字符 \\{ch}")
+            self._escape = False
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            if self._string_is_key:
+                if len(self._stack) == 1:
+                    self._top_key = self._decode(self._key_start, self._pos + 1)
+                self._stack[-1][1] = "colon"
+            else:
+                self._value_done(completed, self._pos + 1)
+        elif ch < " ":
+            # 字符串中不允许出现未转义的换行、制表符等控制字符
+            self._fail(f"字符串中出现未转义的控制字符 {ch!r}")
+
+    def _step_token(self, ch: str, completed: list):
+        if ch in _WHITESPACE:
+            return
+        container, expect = self._stack[-1]
+        if expect in ("key_or_end", "key"):
+            if ch == '"':
+                self._in_string, self._string_is_key = True, True
+                self._key_start = self._pos
+            elif ch == "}" and expect == "key_or_end":
+                self._close(completed)
+            else:
+                self._fail("此处应为字段名")
+        elif expect == "colon":
+            if ch != ":":
+                self._fail("字段名后应为冒号")
+            self._stack[-1][1] = "value"
+        elif expect in ("value", "value_or_end"):
+            if ch == "]" and expect == "value_or_end":
+                self._close(completed)
+            else:
+                self._start_value(ch)
+        elif expect == "comma_or_end":
+            if ch == ",":
+                self._stack[-1][1] = "key" if container == "{" else "value"
+            elif (ch == "}" and container == "{") or (ch == "]" and container == "["):
+                self._close(completed)
+            else:
+                self._fail("此处应为逗号或结束括号")
+
+    def _start_value(self, ch: str):
+        if len(self._stack) == 1:
+            self._value_start = self._pos
+        if ch == '"':
+            self._in_string, self._string_is_key = True, False
+        elif ch == "{":
+            self._stack.append(["{", "key_or_end"])
+        elif ch == "[":
+            self._stack.append(["[", "value_or_end"])
+        elif ch in _SCALAR_CHARS:
+            self._scalar_start = self._pos
+        else:
+            self._fail(f"无效的值起始字符 {ch!r}")
+
+    def _finish_scalar(self, completed: list):
+        start = self._scalar_start
+        self._scalar_start = None
+        self._decode(start, self._pos)
+        self._value_done(completed, self._pos)
+
+    def _decode(self, start: int, end: int) -> Any:
+        """解析 text[start:end]，任何解析错误都转换为 StreamJSONError，不会抛出到调用方"""
+        token = self.text[start:end]
+        try:
+            return json.loads(token)
+        except ValueError as e:
+            self._fail(f"无效的值 {token[:40]!r}: {e}")
+
+    def _close(self, completed: list):
+        self._stack.pop()
+        if not self._stack:
+            self.done = True
+            return
+        self._value_done(completed, self._pos + 1)
+
+    def _value_done(self, completed: list, end: int):
+        """当前容器中的一个值结束（值文本截止到 end）；若位于顶层对象中，解析并给出该字段"""
+        self._stack[-1][1] = "comma_or_end"
+        if len(self._stack) == 1 and self._top_key is not None:
+            value = self._decode(self._value_start, end)
+            self.fields[self._top_key] = value
+            completed.append((self._top_key, value))
+            self._top_key = None
@@ -1,83 +1,145 @@
 """YAML配置文件处理工具"""
-import os
+import copy
+import atexit
+import threading
 import yaml
 from pathlib import Path
+from typing import Optional
+from utils.atomic_write import atomic_write
 from utils.resource_path import get_config_path
 
 
 class YamlHandler:
-    """处理YAML配置文件的读写操作"""
+    """处理YAML配置文件的读写操作
+
+    选项在首次访问时整体加载到内存，之后的读取都直接走内存；
+    修改会在 SAVE_DELAY 秒内合并，由后台线程以“临时文件 + 重命名”的方式原子写回，
+    不阻塞界面线程。需要立即落盘时调用 flush()。
+    """
+
+    # 写回延迟（秒）：短时间内的多次修改只写一次磁盘
+    SAVE_DELAY = 0.5
 
     def __init__(self):
         self.config_path = get_config_path()
+        self._options: Optional[dict] = None
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._dirty = False
         self._ensure_config_exists()
+        # 进程退出前写回尚未落盘的修改
+        atexit.register(self.flush)
 
     def _ensure_config_exists(self):
         """确保配置文件存在"""
         if not self.config_path.exists():
             self.config_path.parent.mkdir(parents=True, exist_ok=True)
-            self.save_options({})
+            self._options = {}
+            with self._write_lock:
+                self._write_file({})
+
+    def _get_options(self) -> dict:
+        """获取内存中的选项（首次调用时从文件加载），调用方需持有锁"""
+        if self._options is None:
+            try:
+                with open(self.config_path, "r", encoding="utf-8") as f:
+                    data = yaml.safe_load(f)
+                    self._options = data if isinstance(data, dict) else {}
+            except Exception as e:
+                print(f"加载配置文件失败: {e}")
+                self._options = {}
+        return self._options
 
     def load_options(self) -> dict:
-        """加载所有选项配置"""
-        try:
-            with open(self.config_path, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f)
-                return data if data else {}
-        except Exception as e:
-            print(f"加载配置文件失败: {e}")
-            return {}
+        """加载所有选项配置（返回副本）"""
+        with self._lock:
+            return copy.deepcopy(self._get_options())
 
     def save_options(self, options: dict):
         """保存所有选项配置"""
+        with self._lock:
+            self._options = copy.deepcopy(options)
+            self._schedule_save()
+
+    def _schedule_save(self):
+        """标记为待写回，并重新开始延迟计时，调用方需持有锁"""
+        self._dirty = True
+        if self._save_timer:
+            self._save_timer.cancel()
+        self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def flush(self):
+        """立即写回尚未落盘的修改
+
+        先取 _write_lock 再取 _lock 拍快照，快照和写盘在同一次 _write_lock 内完成，
+        避免较早的快照在较晚的快照之后落盘、覆盖掉新的修改。
+        """
+        with self._write_lock:
+            with self._lock:
+                if self._save_timer:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                snapshot = copy.deepcopy(self._options)
+                self._dirty = False
+            self._write_file(snapshot)
+
+    def _write_file(self, options: dict):
+        """原子写入：先写临时文件，再重命名覆盖目标文件，调用方需持有 _write_lock"""
         try:
-            with open(self.config_path, "w", encoding="utf-8") as f:
-                yaml.dump(
-                    options,
-                    f,
-                    allow_unicode=True,
-                    default_flow_style=False,
-                    sort_keys=False,
-                )
+            text = yaml.dump(
+                options,
+                allow_unicode=True,
+                default_flow_style=False,
+                sort_keys=False,
+            )
+            atomic_write(self.config_path, text, fsync=True)
         except Exception as e:
             print(f"保存配置文件失败: {e}")
 
     def get_field_options(self, field_name: str) -> list:
-        """获取指定字段的选项列表"""
-        options = self.load_options()
-        return options.get(field_name, [])
+        """获取指定字段的选项列表（返回副本，调用方可自由修改）"""
+        with self._lock:
+            return list(self._get_options().get(field_name, []) or [])
 
     def add_option(self, field_name: str, value: str):
         """为指定字段添加一个选项"""
-        options = self.load_options()
-        if field_name not in options:
-            options[field_name] = []
-        if value and value not in options[field_name]:
-            options[field_name].append(value)
-            self.save_options(options)
+        with self._lock:
+            options = self._get_options()
+            if field_name not in options or options[field_name] is None:
+                options[field_name] = []
+            if value and value not in options[field_name]:
+                options[field_name].append(value)
+                self._schedule_save()
 
     def remove_option(self, field_name: str, value: str):
         """从指定字段删除一个选项"""
-        options = self.load_options()
-        if field_name in options and value in options[field_name]:
-            options[field_name].remove(value)
-            self.save_options(options)
+        with self._lock:
+            options = self._get_options()
+            if field_name in options and value in (options[field_name] or []):
+                options[field_name].remove(value)
+                self._schedule_save()
 
     def update_option(self, field_name: str, old_value: str, new_value: str):
         """更新指定字段的某个选项"""
-        options = self.load_options()
-        if field_name in options and old_value in options[field_name]:
-            idx = options[field_name].index(old_value)
-            options[field_name][idx] = new_value
-            self.save_options(options)
+        with self._lock:
+            options = self._get_options()
+            if field_name in options and old_value in (options[field_name] or []):
+                idx = options[field_name].index(old_value)
+                options[field_name][idx] = new_value
+                self._schedule_save()
 
     def get_line_art_prompt(self) -> str:
         """获取角色线稿生成的提示词"""
-        options = self.load_options()
-        return options.get("角色线稿提示词", "")
+        with self._lock:
+            return self._get_options().get("角色线稿提示词", "")
 
     def save_line_art_prompt(self, prompt: str):
         """保存角色线稿生成的提示词"""
-        options = self.load_options()
-        options["角色线稿提示词"] = prompt
-        self.save_options(options)
+        with self._lock:
+            self._get_options()["角色线稿提示词"] = prompt
+            self._schedule_save()
@@ -0,0 +1,55 @@
+"""atomic_write：替换后的权限与原文件一致，失败时不留下临时文件"""
+import os
+import sys
+import stat
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.atomic_write import atomic_write
+
+
+def mode_of(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_file_gets_umask_default_mode(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        atomic_write(tmp_path / "a.json", "{}")
+    finally:
+        os.umask(umask)
+    assert (tmp_path / "a.json").read_text(encoding="utf-8") == "{}"
+    # mkstemp 创建的临时文件是 0600，替换后不应再是
+    assert mode_of(tmp_path / "a.json") == 0o666 & ~umask
+
+
+def test_existing_file_keeps_its_mode(tmp_path):
+    path = tmp_path / "options.yaml"
+    path.write_text("old", encoding="utf-8")
+    os.chmod(path, 0o640)
+    atomic_write(path, "新内容", fsync=True)
+    assert path.read_text(encoding="utf-8") == "新内容"
+    assert mode_of(path) == 0o640
+
+
+def test_progress_reports_every_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.atomic_write.WRITE_CHUNK_SIZE", 4)
+    calls = []
+    atomic_write(tmp_path / "a.bin", b"0123456789", progress=lambda done, total: calls.append((done, total)))
+    assert calls == [(4, 10), (8, 10), (10, 10)]
+    assert (tmp_path / "a.bin").read_bytes() == b"0123456789"
+
+
+def test_failed_write_keeps_target_and_removes_temp_file(tmp_path):
+    path = tmp_path / "a.json"
+    path.write_bytes(b"old")
+
+    def fail(done, total):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        atomic_write(path, b"new", progress=fail)
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["a.json"]
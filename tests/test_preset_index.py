@@ -0,0 +1,81 @@
+"""PresetIndex：原地编辑的预设能被发现，自身的写入不会引发目录遍历"""
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.preset_index import PresetIndex
+from utils.preset_manager import PresetManager
+
+
+def write_preset(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def test_listing_uses_cache_and_get_revalidates(tmp_path):
+    presets = tmp_path / "presets"
+    presets.mkdir()
+    write_preset(presets / "a.json", {"风格模式": "写实"})
+    index = PresetIndex(presets, tmp_path / "index.json")
+    assert index.entries()[0]["summary"] == {"风格模式": "写实"}
+
+    # 原地改写不会改变目录 mtime：列表直接使用缓存，读取单个预设时才校验
+    dir_mtime = os.stat(presets).st_mtime_ns
+    write_preset(presets / "a.json", {"风格模式": "动漫插画"})
+    os.utime(presets, ns=(dir_mtime, dir_mtime))
+    assert index.entries()[0]["summary"] == {"风格模式": "写实"}
+    assert index.get("a")["summary"] == {"风格模式": "动漫插画"}
+
+    # 强制刷新时逐个校验，新进程读取持久化的索引时同样如此
+    write_preset(presets / "a.json", {"风格模式": "水彩"})
+    os.utime(presets, ns=(dir_mtime, dir_mtime))
+    assert PresetIndex(presets, tmp_path / "index.json").entries(force=True)[0]["summary"] == {"风格模式": "水彩"}
+
+
+def test_own_writes_do_not_rescan_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.preset_index.get_cache_dir", lambda: tmp_path / "cache")
+    monkeypatch.setattr("utils.preset_search.get_cache_dir", lambda: tmp_path / "cache")
+    manager = PresetManager(tmp_path / "presets")
+    manager.get_all_presets()
+
+    def fail():
+        raise AssertionError("unexpected rescan")
+
+    monkeypatch.setattr(manager.index, "_rescan", fail)
+    assert manager.save_preset("a", {"风格模式": "写实"})
+    assert manager.rename_preset("a", "b")
+    assert [p["name"] for p in manager.get_all_presets()] == ["b"]
+    assert manager.delete_preset("b")
+    assert manager.get_all_presets() == []
+
+
+def test_search_sees_external_edit_after_refresh(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.preset_index.get_cache_dir", lambda: tmp_path / "cache")
+    monkeypatch.setattr("utils.preset_search.get_cache_dir", lambda: tmp_path / "cache")
+    manager = PresetManager(tmp_path / "presets")
+    manager.save_preset("a", {"场景": {"地点": "雪山"}})
+    assert manager.search_presets("海边") == []
+
+    path = tmp_path / "presets" / "a.json"
+    dir_mtime = os.stat(path.parent).st_mtime_ns
+    write_preset(path, {"场景": {"地点": "海边小镇"}})
+    os.utime(path.parent, ns=(dir_mtime, dir_mtime))
+    manager.get_all_presets(refresh=True)
+    assert [r["name"] for r in manager.search_presets("海边")] == ["a"]
+
+
+def test_search_does_not_list_presets(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.preset_index.get_cache_dir", lambda: tmp_path / "cache")
+    monkeypatch.setattr("utils.preset_search.get_cache_dir", lambda: tmp_path / "cache")
+    manager = PresetManager(tmp_path / "presets")
+    manager.save_preset("a", {"场景": {"地点": "海边小镇"}})
+    manager.get_all_presets()
+
+    def fail(force=False):
+        raise AssertionError("unexpected listing")
+
+    monkeypatch.setattr(manager.index, "entries", fail)
+    assert [r["name"] for r in manager.search_presets("海边")] == ["a"]
+    manager.save_preset("b", {"场景": {"地点": "海边"}})
+    assert [r["name"] for r in manager.search_presets("海边")] == ["a", "b"]
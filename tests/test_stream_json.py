@@ -0,0 +1,52 @@
+"""IncrementalJSONParser：格式错误只记录在 error 中，不会从 feed() 抛出"""
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.stream_json import IncrementalJSONParser
+
+
+def feed_in_chunks(text: str, seed: int = 0) -> IncrementalJSONParser:
+    parser = IncrementalJSONParser()
+    rng = random.Random(seed)
+    pos = 0
+    while pos < len(text):
+        step = rng.randint(1, 5)
+        parser.feed(text[pos:pos + step])
+        pos += step
+    return parser
+
+
+def test_raw_control_character_in_string_is_reported_not_raised():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"a": "x\ty"}') == []
+    assert parser.error and "控制字符" in parser.error
+    assert not parser.done
+
+
+def test_raw_control_character_in_key_is_reported_not_raised():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a\x01": 1}')
+    assert parser.error
+
+
+def test_invalid_scalar_is_reported_not_raised():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a": 1.2.3}')
+    assert parser.error
+
+
+def test_escaped_control_characters_are_accepted():
+    parser = feed_in_chunks('```json\n{"a": "x\\ty\\n", "b": [1, {"c": null}], "d": -1e3}\n```')
+    assert parser.error is None
+    assert parser.value == {"a": "x\ty\n", "b": [1, {"c": None}], "d": -1000.0}
+
+
+def test_random_garbage_never_raises():
+    rng = random.Random(42)
+    alphabet = '{}[]:,"\\ \t\n\x00\x1f0123456789.eE+-truefalsnu`ab'
+    for seed in range(300):
+        text = '{"k": ' + "".join(rng.choice(alphabet) for _ in range(40))
+        feed_in_chunks(text, seed)